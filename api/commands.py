@@ -12,6 +12,7 @@ from configs import dify_config
 from constants.languages import languages
 from core.rag.datasource.vdb.vector_factory import Vector
 from core.rag.datasource.vdb.vector_type import VectorType
+from core.rag.embedding.embedding_codec import is_encoded_embedding
 from core.rag.index_processor.constant.built_in_field import BuiltInField
 from core.rag.models.document import Document
 from events.app_event import app_was_created
@@ -21,7 +22,14 @@ from libs.helper import email as email_validate
 from libs.password import hash_password, password_pattern, valid_password
 from libs.rsa import generate_key_pair
 from models import Tenant
-from models.dataset import Dataset, DatasetCollectionBinding, DatasetMetadata, DatasetMetadataBinding, DocumentSegment
+from models.dataset import (
+    Dataset,
+    DatasetCollectionBinding,
+    DatasetMetadata,
+    DatasetMetadataBinding,
+    DocumentSegment,
+    Embedding,
+)
 from models.dataset import Document as DatasetDocument
 from models.model import Account, App, AppAnnotationSetting, AppMode, Conversation, MessageAnnotation
 from models.provider import Provider, ProviderModel
@@ -425,6 +433,37 @@ def migrate_knowledge_vector_database():
     )
 
 
+@click.command("migrate-embedding-format", help="Convert cached embeddings to the binary embedding format.")
+@click.option("--batch-size", default=500, prompt=False, help="The number of embeddings converted per transaction.")
+def migrate_embedding_format(batch_size: int):
+    """
+    Re-encode pickled rows of the embeddings table with the binary embedding format.
+    """
+    click.echo(click.style("Starting embedding format migration.", fg="green"))
+    converted_count = 0
+    last_id = None
+    while True:
+        query = db.session.query(Embedding)
+        if last_id is not None:
+            query = query.filter(Embedding.id > last_id)
+        embeddings = query.order_by(Embedding.id).limit(batch_size).all()
+        if not embeddings:
+            break
+        for embedding in embeddings:
+            if is_encoded_embedding(embedding.embedding):
+                continue
+            try:
+                embedding.set_embedding(embedding.get_embedding_array())
+                converted_count += 1
+            except Exception as e:
+                click.echo(click.style(f"Failed to convert embedding {embedding.id}: {str(e)}", fg="red"))
+        last_id = embeddings[-1].id
+        db.session.commit()
+        click.echo(f"Converted {converted_count} embeddings so far.")
+
+    click.echo(click.style(f"Embedding format migration completed, {converted_count} converted.", fg="green"))
+
+
 @click.command("convert-to-agent-apps", help="Convert Agent Assistant to Agent App.")
 def convert_to_agent_apps():
     """
@@ -538,6 +577,29 @@ def add_qdrant_index(field: str):
     click.echo(click.style(f"Index creation complete. Created {create_count} collection indexes.", fg="green"))
 
 
+@click.command(
+    "add-pgvector-document-id-column", help="Add the indexed document_id column to PGVector collection tables."
+)
+def add_pgvector_document_id_column():
+    """
+    Add the document_id column to the collection tables created before it existed, each table is locked while
+    its column is filled.
+    """
+    click.echo(click.style("Starting PGVector document_id column migration.", fg="green"))
+    from core.rag.datasource.vdb.pgvector.pgvector import PGVector, PGVectorFactory
+
+    config = PGVectorFactory.get_config()
+    migrated_count = 0
+    for collection_name in PGVector.get_collection_names(config):
+        try:
+            PGVector(collection_name=collection_name, config=config).add_document_id_column()
+            migrated_count += 1
+        except Exception as e:
+            click.echo(click.style(f"Failed to migrate collection {collection_name}: {str(e)}", fg="red"))
+
+    click.echo(click.style(f"Migration complete. Migrated {migrated_count} collection tables.", fg="green"))
+
+
 @click.command("old-metadata-migration", help="Old metadata migration.")
 def old_metadata_migration():
     """
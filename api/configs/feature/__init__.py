@@ -57,6 +57,19 @@ class AppExecutionConfig(BaseSettings):
         description="Maximum allowed execution time for the application in seconds",
         default=1200,
     )
+
+    APP_QUEUE_EVENT_CHECK_SAMPLE_RATE: float = Field(
+        description="Fraction of queued app events checked for SQLAlchemy model instances, 1.0 checks every event",
+        default=1.0,
+        ge=0.0,
+        le=1.0,
+    )
+
+    APP_STOP_FLAG_POLL_INTERVAL: PositiveFloat = Field(
+        description="Minimum interval in seconds between polls of a task's stop flag in Redis,"
+        " used as a fallback when the stop signal published over Redis pub/sub is missed",
+        default=1.0,
+    )
     APP_MAX_ACTIVE_REQUESTS: NonNegativeInt = Field(
         description="Maximum number of concurrent active requests per app (0 for unlimited)",
         default=0,
@@ -137,6 +150,32 @@ class CodeExecutionSandboxConfig(BaseSettings):
         default=1000,
     )
 
+    TEMPLATE_TRANSFORM_IN_PROCESS_ENABLED: bool = Field(
+        description="Render Template Transform nodes in local worker processes with a sandboxed Jinja2 environment"
+        " instead of the code execution service, only for deployments that trust their templates",
+        default=False,
+    )
+
+    TEMPLATE_TRANSFORM_IN_PROCESS_TIME_LIMIT: PositiveFloat = Field(
+        description="Maximum time in seconds of a local template render, the worker process is killed past it",
+        default=1.0,
+    )
+
+    TEMPLATE_TRANSFORM_IN_PROCESS_MEMORY_LIMIT: PositiveInt = Field(
+        description="Maximum memory in MB a local template rendering worker process may allocate",
+        default=256,
+    )
+
+    TEMPLATE_TRANSFORM_IN_PROCESS_MAX_WORKERS: PositiveInt = Field(
+        description="Maximum number of local template rendering worker processes per API process",
+        default=4,
+    )
+
+    TEMPLATE_TRANSFORM_TEMPLATE_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of compiled templates cached by each local rendering worker, 0 to disable",
+        default=256,
+    )
+
 
 class PluginConfig(BaseSettings):
     """
@@ -175,6 +214,28 @@ class PluginConfig(BaseSettings):
         default=15728640 * 12,
     )
 
+    PLUGIN_DAEMON_MAX_CONNECTIONS: PositiveInt = Field(
+        description="Maximum number of keep-alive connections to the plugin daemon per process",
+        default=100,
+    )
+
+    PLUGIN_DAEMON_POOL_BLOCK: bool = Field(
+        description="Wait for a free pooled connection instead of opening an extra short-lived one"
+        " when all connections to the plugin daemon are in use",
+        default=False,
+    )
+
+    PLUGIN_DAEMON_POOL_TIMEOUT: PositiveFloat = Field(
+        description="Maximum time in seconds to wait for a free connection to the plugin daemon",
+        default=30.0,
+    )
+
+    PLUGIN_DAEMON_KEEPALIVE_EXPIRY: PositiveFloat = Field(
+        description="Idle time in seconds after which keep-alive connections of the async plugin daemon client"
+        " are closed",
+        default=60.0,
+    )
+
 
 class MarketplaceConfig(BaseSettings):
     """
@@ -381,6 +442,42 @@ class HttpConfig(BaseSettings):
         default=5,
     )
 
+    SSRF_POOL_MAX_CONNECTIONS: PositiveInt = Field(
+        description="Maximum number of concurrent connections of the pooled client for network requests (SSRF)",
+        default=100,
+    )
+
+    SSRF_POOL_MAX_KEEPALIVE_CONNECTIONS: NonNegativeInt = Field(
+        description="Maximum number of idle keep-alive connections kept by the pooled client (SSRF)",
+        default=20,
+    )
+
+    SSRF_POOL_KEEPALIVE_EXPIRY: PositiveFloat = Field(
+        description="Idle time in seconds after which keep-alive connections are closed (SSRF)",
+        default=5.0,
+    )
+
+    SSRF_POOL_MAX_CONNECTIONS_PER_HOST: NonNegativeInt = Field(
+        description="Maximum number of concurrent requests to a single host (SSRF), a streamed response counts"
+        " until it is closed, 0 means no per-host limit",
+        default=0,
+    )
+
+    SSRF_HTTP2_ENABLED: bool = Field(
+        description="Enable HTTP/2 for network requests (SSRF), requires the h2 package",
+        default=False,
+    )
+
+    SSRF_DNS_CACHE_TTL: NonNegativeInt = Field(
+        description="Time in seconds to cache resolved host addresses for network requests (SSRF), 0 disables caching",
+        default=0,
+    )
+
+    SSRF_HOST_CACHE_SIZE: PositiveInt = Field(
+        description="Maximum number of hosts whose resolved addresses and connection limits are kept (SSRF)",
+        default=1024,
+    )
+
     RESPECT_XFORWARD_HEADERS_ENABLED: bool = Field(
         description="Enable handling of X-Forwarded-For, X-Forwarded-Proto, and X-Forwarded-Port headers"
         " when the app is behind a single trusted reverse proxy.",
@@ -451,6 +548,23 @@ class ModelLoadBalanceConfig(BaseSettings):
     )
 
 
+class ProviderConfigurationsCacheConfig(BaseSettings):
+    """
+    Configuration for the per-process cache of tenant model provider configurations
+    """
+
+    PROVIDER_CONFIGURATIONS_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of tenants whose provider configurations are cached per process,"
+        " 0 disables the cache",
+        default=1000,
+    )
+
+    PROVIDER_CONFIGURATIONS_CACHE_TTL: PositiveInt = Field(
+        description="Maximum time in seconds cached provider configurations are used before being rebuilt",
+        default=60,
+    )
+
+
 class BillingConfig(BaseSettings):
     """
     Configuration for platform billing features
@@ -503,6 +617,11 @@ class WorkflowConfig(BaseSettings):
         default=200 * 1024,
     )
 
+    WORKFLOW_GRAPH_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of parsed workflow graphs cached per process, 0 disables the cache",
+        default=128,
+    )
+
 
 class WorkflowNodeExecutionConfig(BaseSettings):
     """
@@ -514,6 +633,31 @@ class WorkflowNodeExecutionConfig(BaseSettings):
         default=100,
     )
 
+    WORKFLOW_SCHEDULER_MAX_WORKERS: PositiveInt = Field(
+        description="Maximum number of parallel branches and iterations running at once in a process",
+        default=100,
+    )
+
+    WORKFLOW_SCHEDULER_MAX_WORKERS_PER_TENANT: PositiveInt = Field(
+        description="Maximum number of parallel branches and iterations running at once for one tenant",
+        default=50,
+    )
+
+    WORKFLOW_SCHEDULER_MAX_WORKERS_PER_RUN: PositiveInt = Field(
+        description="Maximum number of parallel branches and iterations running at once for one workflow run",
+        default=20,
+    )
+
+    WORKFLOW_NODE_EXECUTION_FLUSH_BATCH_SIZE: PositiveInt = Field(
+        description="Number of buffered node execution records that triggers a write to the database",
+        default=50,
+    )
+
+    WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL: PositiveFloat = Field(
+        description="Maximum time in seconds node execution records stay buffered before being written to the database",
+        default=1.0,
+    )
+
 
 class AuthConfig(BaseSettings):
     """
@@ -666,6 +810,27 @@ class RagEtlConfig(BaseSettings):
         default="database",
     )
 
+    KEYWORD_INDEX_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of dataset keyword indexes cached per process for keyword search (0 to disable)",
+        default=64,
+    )
+
+    KEYWORD_INDEX_VERSION_TTL: PositiveInt = Field(
+        description="Time in seconds the version token of a cached dataset keyword index is kept in Redis",
+        default=86400,
+    )
+
+    KEYWORD_TABLE_COMPACTION_THRESHOLD: PositiveInt = Field(
+        description="Number of pending keyword table changes after which they are folded into the stored keyword table",
+        default=1000,
+    )
+
+    KEYWORD_SCORE_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of segments whose extracted keywords are cached per process for keyword scoring"
+        " (0 to disable)",
+        default=10000,
+    )
+
     UNSTRUCTURED_API_URL: Optional[str] = Field(
         description="API URL for Unstructured.io service",
         default=None,
@@ -717,6 +882,17 @@ class DataSetConfig(BaseSettings):
         default=30,
     )
 
+    DATASET_RETRIEVAL_MAX_WORKERS: PositiveInt = Field(
+        description="Maximum number of datasets searched at once by multi-dataset retrieval, shared by all requests"
+        " of the process",
+        default=32,
+    )
+
+    DATASET_RETRIEVAL_TIMEOUT: PositiveFloat = Field(
+        description="Seconds multi-dataset retrieval waits for its datasets, the ones not done by then are left out",
+        default=60,
+    )
+
 
 class WorkspaceConfig(BaseSettings):
     """
@@ -744,6 +920,41 @@ class IndexingConfig(BaseSettings):
         default=50,
     )
 
+    INDEXING_PIPELINE_BATCH_SIZE: PositiveInt = Field(
+        description="Number of extracted pages split, saved and indexed per batch when indexing a document",
+        default=20,
+    )
+
+    INDEXING_CHECKPOINT_TTL: PositiveInt = Field(
+        description="Time in seconds the checkpoint of an interrupted document indexing is kept for resuming it",
+        default=604800,
+    )
+
+    EMBEDDING_CACHE_BATCH_SIZE: PositiveInt = Field(
+        description="Number of text hashes resolved per query when looking up or writing cached document embeddings",
+        default=1000,
+    )
+
+    EMBEDDING_CACHE_LOCAL_SIZE: NonNegativeInt = Field(
+        description="Capacity of the in-process LRU cache placed in front of the embeddings table (0 to disable)",
+        default=0,
+    )
+
+    EMBEDDING_CACHE_REDIS_ENABLED: bool = Field(
+        description="Enable the Redis cache tier placed in front of the embeddings table",
+        default=False,
+    )
+
+    EMBEDDING_CACHE_REDIS_TTL: PositiveInt = Field(
+        description="Expiration time in seconds for document embeddings cached in Redis",
+        default=600,
+    )
+
+    EMBEDDING_CACHE_STORAGE_DTYPE: Literal["float32", "float16"] = Field(
+        description="Float precision used to store cached embeddings, 'float16' halves the size at reduced precision",
+        default="float32",
+    )
+
 
 class MultiModalTransferConfig(BaseSettings):
     MULTIMODAL_SEND_FORMAT: Literal["base64", "url"] = Field(
@@ -870,6 +1081,7 @@ class FeatureConfig(
     ModerationConfig,
     MultiModalTransferConfig,
     PositionConfig,
+    ProviderConfigurationsCacheConfig,
     RagEtlConfig,
     SecurityConfig,
     ToolConfig,
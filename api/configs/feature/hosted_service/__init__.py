@@ -1,6 +1,6 @@
 from typing import Optional
 
-from pydantic import Field, NonNegativeInt, computed_field
+from pydantic import Field, NonNegativeInt, PositiveInt, computed_field
 from pydantic_settings import BaseSettings
 
 
@@ -10,6 +10,12 @@ class HostedCreditConfig(BaseSettings):
         default="",
     )
 
+    HOSTED_QUOTA_FLUSH_INTERVAL: PositiveInt = Field(
+        description="Minimum interval in seconds between writes of the buffered quota usage of a hosted provider"
+        " to the database",
+        default=10,
+    )
+
     def get_model_credits(self, model_name: str) -> int:
         """
         Get credit value for a specific model name.
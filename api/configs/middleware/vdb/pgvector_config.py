@@ -1,6 +1,6 @@
 from typing import Optional
 
-from pydantic import Field, PositiveInt
+from pydantic import Field, PositiveFloat, PositiveInt
 from pydantic_settings import BaseSettings
 
 
@@ -44,6 +44,11 @@ class PGVectorConfig(BaseSettings):
         default=5,
     )
 
+    PGVECTOR_POOL_TIMEOUT: PositiveFloat = Field(
+        description="Seconds to wait for a free connection of the PostgreSQL database when all are in use",
+        default=30,
+    )
+
     PGVECTOR_PG_BIGM: bool = Field(
         description="Whether to use pg_bigm module for full text search",
         default=False,
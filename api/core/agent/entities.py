@@ -83,6 +83,9 @@ class AgentEntity(BaseModel):
     prompt: Optional[AgentPromptEntity] = None
     tools: Optional[list[AgentToolEntity]] = None
     max_iteration: int = 5
+    # tool calls of one model turn invoked at once, and seconds to wait for each of them
+    max_concurrent_tool_calls: int = 1
+    tool_call_timeout: Optional[float] = None
 
 
 class AgentInvokeMessage(ToolInvokeMessage):
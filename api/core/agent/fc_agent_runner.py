@@ -1,8 +1,15 @@
+import contextvars
 import json
 import logging
-from collections.abc import Generator
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Generator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from copy import deepcopy
-from typing import Any, Optional, Union
+from typing import Any, Optional, Union, cast
+
+from flask import current_app
 
 from core.agent.base_agent_runner import BaseAgentRunner
 from core.app.apps.base_app_queue_manager import PublishFrom
@@ -23,7 +30,9 @@ from core.model_runtime.entities import (
     UserPromptMessage,
 )
 from core.model_runtime.entities.message_entities import ImagePromptMessageContent
+from core.ops.ops_trace_manager import TraceQueueManager
 from core.prompt.agent_history_prompt_transform import AgentHistoryPromptTransform
+from core.tools.__base.tool import Tool
 from core.tools.entities.tool_entities import ToolInvokeMeta
 from core.tools.tool_engine import ToolEngine
 from models.model import Message
@@ -31,6 +40,29 @@ from models.model import Message
 logger = logging.getLogger(__name__)
 
 
+class _ToolCallState:
+    """
+    Decides between a tool call timing out and its result being kept, whichever happens first.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._finished = False
+        self._timed_out = False
+
+    def finish(self) -> bool:
+        with self._lock:
+            if not self._timed_out:
+                self._finished = True
+            return self._finished
+
+    def time_out(self) -> bool:
+        with self._lock:
+            if not self._finished:
+                self._timed_out = True
+            return self._timed_out
+
+
 class FunctionCallAgentRunner(BaseAgentRunner):
     def run(self, message: Message, query: str, **kwargs: Any) -> Generator[LLMResultChunk, None, None]:
         """
@@ -223,46 +255,25 @@ class FunctionCallAgentRunner(BaseAgentRunner):
 
             # call tools
             tool_responses = []
-            for tool_call_id, tool_call_name, tool_call_args in tool_calls:
-                tool_instance = tool_instances.get(tool_call_name)
-                if not tool_instance:
-                    tool_response = {
-                        "tool_call_id": tool_call_id,
-                        "tool_call_name": tool_call_name,
-                        "tool_response": f"there is not a tool named {tool_call_name}",
-                        "meta": ToolInvokeMeta.error_instance(f"there is not a tool named {tool_call_name}").to_dict(),
-                    }
-                else:
-                    # invoke tool
-                    tool_invoke_response, message_files, tool_invoke_meta = ToolEngine.agent_invoke(
-                        tool=tool_instance,
-                        tool_parameters=tool_call_args,
-                        user_id=self.user_id,
-                        tenant_id=self.tenant_id,
-                        message=self.message,
-                        invoke_from=self.application_generate_entity.invoke_from,
-                        agent_tool_callback=self.agent_callback,
-                        trace_manager=trace_manager,
-                        app_id=self.application_generate_entity.app_config.app_id,
-                        message_id=self.message.id,
-                        conversation_id=self.conversation.id,
+            tool_results = self._invoke_tool_calls(tool_calls, tool_instances, trace_manager)
+            for (tool_call_id, tool_call_name, _), (tool_invoke_response, message_files, tool_invoke_meta) in zip(
+                tool_calls, tool_results
+            ):
+                # publish files in the order of the tool calls
+                for message_file_id in message_files:
+                    # publish message file
+                    self.queue_manager.publish(
+                        QueueMessageFileEvent(message_file_id=message_file_id), PublishFrom.APPLICATION_MANAGER
                     )
-                    # publish files
-                    for message_file_id in message_files:
-                        # publish message file
-                        self.queue_manager.publish(
-                            QueueMessageFileEvent(message_file_id=message_file_id), PublishFrom.APPLICATION_MANAGER
-                        )
-                        # add message file ids
-                        message_file_ids.append(message_file_id)
-
-                    tool_response = {
-                        "tool_call_id": tool_call_id,
-                        "tool_call_name": tool_call_name,
-                        "tool_response": tool_invoke_response,
-                        "meta": tool_invoke_meta.to_dict(),
-                    }
-
+                    # add message file ids
+                    message_file_ids.append(message_file_id)
+
+                tool_response = {
+                    "tool_call_id": tool_call_id,
+                    "tool_call_name": tool_call_name,
+                    "tool_response": tool_invoke_response,
+                    "meta": tool_invoke_meta.to_dict(),
+                }
                 tool_responses.append(tool_response)
                 if tool_response["tool_response"] is not None:
                     self._current_thoughts.append(
@@ -314,6 +325,110 @@ class FunctionCallAgentRunner(BaseAgentRunner):
             PublishFrom.APPLICATION_MANAGER,
         )
 
+    def _invoke_tool_calls(
+        self,
+        tool_calls: list[tuple[str, str, dict[str, Any]]],
+        tool_instances: dict[str, Tool],
+        trace_manager: Optional[TraceQueueManager],
+    ) -> list[tuple[str, list[str], ToolInvokeMeta]]:
+        """
+        Invoke the tool calls of one model turn, at most max_concurrent_tool_calls of the agent at once
+
+        Returns:
+            List[Tuple[str, List[str], ToolInvokeMeta]]: [(tool_response, message_file_ids, tool_invoke_meta)]
+            in the order of the tool calls
+        """
+        assert self.app_config.agent is not None
+        max_concurrent = self.app_config.agent.max_concurrent_tool_calls
+        timeout = self.app_config.agent.tool_call_timeout
+        if (max_concurrent <= 1 or len(tool_calls) <= 1) and timeout is None:
+            return [
+                self._invoke_tool_call(tool_call_name, tool_call_args, tool_instances, trace_manager)
+                for _, tool_call_name, tool_call_args in tool_calls
+            ]
+
+        # load the records used by the tools here, other threads must not refresh them on this session
+        _ = self.message.id, self.message.conversation_id, self.conversation.id
+        flask_app = current_app._get_current_object()  # type: ignore
+        context = contextvars.copy_context()
+
+        def invoke(
+            call: _ToolCallState, tool_call_name: str, tool_call_args: dict[str, Any]
+        ) -> tuple[str, list[str], ToolInvokeMeta]:
+            for var, val in context.items():
+                var.set(val)
+
+            with flask_app.app_context():
+                return self._invoke_tool_call(
+                    tool_call_name, tool_call_args, tool_instances, trace_manager, keep_result=call.finish
+                )
+
+        results: list[Optional[tuple[str, list[str], ToolInvokeMeta]]] = [None] * len(tool_calls)
+        waiting = deque(enumerate(tool_calls))
+        # future -> (index of the call, call state, deadline)
+        running: dict[Future, tuple[int, _ToolCallState, Optional[float]]] = {}
+        # one thread per call, a timed out tool keeps its thread until it returns
+        executor = ThreadPoolExecutor(max_workers=len(tool_calls), thread_name_prefix="agent-tool-call")
+        try:
+            while waiting or running:
+                while waiting and len(running) < max_concurrent:
+                    index, (_, tool_call_name, tool_call_args) = waiting.popleft()
+                    call = _ToolCallState()
+                    # the timeout runs from the start of each call, not from when its result is awaited
+                    deadline = time.monotonic() + timeout if timeout is not None else None
+                    running[executor.submit(invoke, call, tool_call_name, tool_call_args)] = (index, call, deadline)
+
+                deadlines = [deadline for _, _, deadline in running.values() if deadline is not None]
+                wait_timeout = max(min(deadlines) - time.monotonic(), 0) if deadlines else None
+                done, _ = wait(running, timeout=wait_timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, _, _ = running.pop(future)
+                    results[index] = future.result()
+
+                now = time.monotonic()
+                for future, (index, call, deadline) in list(running.items()):
+                    if deadline is None or deadline > now:
+                        continue
+                    if not call.time_out():
+                        # the tool returned and is creating its message files, wait for them
+                        running[future] = (index, call, None)
+                        continue
+                    del running[future]
+                    tool_call_name = tool_calls[index][1]
+                    error_response = f"tool invoke error: {tool_call_name} timed out after {timeout} seconds"
+                    results[index] = (error_response, [], ToolInvokeMeta.error_instance(error_response))
+            return cast(list[tuple[str, list[str], ToolInvokeMeta]], results)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _invoke_tool_call(
+        self,
+        tool_call_name: str,
+        tool_call_args: dict[str, Any],
+        tool_instances: dict[str, Tool],
+        trace_manager: Optional[TraceQueueManager],
+        keep_result: Optional[Callable[[], bool]] = None,
+    ) -> tuple[str, list[str], ToolInvokeMeta]:
+        tool_instance = tool_instances.get(tool_call_name)
+        if not tool_instance:
+            error_response = f"there is not a tool named {tool_call_name}"
+            return error_response, [], ToolInvokeMeta.error_instance(error_response)
+
+        return ToolEngine.agent_invoke(
+            tool=tool_instance,
+            tool_parameters=tool_call_args,
+            user_id=self.user_id,
+            tenant_id=self.tenant_id,
+            message=self.message,
+            invoke_from=self.application_generate_entity.invoke_from,
+            agent_tool_callback=self.agent_callback,
+            trace_manager=trace_manager,
+            app_id=self.application_generate_entity.app_config.app_id,
+            message_id=self.message.id,
+            conversation_id=self.conversation.id,
+            keep_result=keep_result,
+        )
+
     def check_tool_calls(self, llm_result_chunk: LLMResultChunk) -> bool:
         """
         Check if there is any tool call in llm result chunk
@@ -76,6 +76,8 @@ class AgentConfigManager:
                     prompt=agent_prompt_entity,
                     tools=agent_tools,
                     max_iteration=agent_dict.get("max_iteration", 5),
+                    max_concurrent_tool_calls=agent_dict.get("max_concurrent_tool_calls", 1),
+                    tool_call_timeout=agent_dict.get("tool_call_timeout"),
                 )
 
         return None
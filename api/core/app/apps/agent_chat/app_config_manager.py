@@ -229,4 +229,20 @@ class AgentChatAppConfigManager(BaseAppConfigManager):
                 if "tool_parameters" not in tool:
                     raise ValueError("tool_parameters is required in agent_mode.tools")
 
+        max_concurrent_tool_calls = config["agent_mode"].get("max_concurrent_tool_calls")
+        if max_concurrent_tool_calls is not None and (
+            not isinstance(max_concurrent_tool_calls, int)
+            or isinstance(max_concurrent_tool_calls, bool)
+            or max_concurrent_tool_calls < 1
+        ):
+            raise ValueError("max_concurrent_tool_calls in agent_mode must be a positive integer")
+
+        tool_call_timeout = config["agent_mode"].get("tool_call_timeout")
+        if tool_call_timeout is not None and (
+            not isinstance(tool_call_timeout, int | float)
+            or isinstance(tool_call_timeout, bool)
+            or tool_call_timeout <= 0
+        ):
+            raise ValueError("tool_call_timeout in agent_mode must be a positive number")
+
         return config, ["agent_mode"]
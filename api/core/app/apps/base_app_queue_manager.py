@@ -1,12 +1,21 @@
 import queue
+import random
 import time
+import types
 from abc import abstractmethod
+from collections.abc import Mapping, Sequence
+from datetime import date, datetime
+from decimal import Decimal
 from enum import Enum
-from typing import Any, Optional
+from functools import cache
+from typing import Any, Literal, Optional, Union, get_args, get_origin
+from uuid import UUID
 
+from pydantic import BaseModel
 from sqlalchemy.orm import DeclarativeMeta
 
 from configs import dify_config
+from core.app.apps.task_stop_listener import task_stop_listener
 from core.app.entities.app_invoke_entities import InvokeFrom
 from core.app.entities.queue_entities import (
     AppQueueEvent,
@@ -41,6 +50,8 @@ class AppQueueManager:
         q: queue.Queue[WorkflowQueueMessage | MessageQueueMessage | None] = queue.Queue()
 
         self._q = q
+        self._stop_event = task_stop_listener.register(self._task_id)
+        self._last_stop_check_time: float = 0
 
     def listen(self):
         """
@@ -96,7 +107,9 @@ class AppQueueManager:
         :param pub_from:
         :return:
         """
-        self._check_for_sqlalchemy_models(event.model_dump())
+        sample_rate = dify_config.APP_QUEUE_EVENT_CHECK_SAMPLE_RATE
+        if sample_rate >= 1 or random.random() < sample_rate:
+            self._check_for_sqlalchemy_models(event)
         self._publish(event, pub_from)
 
     @abstractmethod
@@ -125,15 +138,25 @@ class AppQueueManager:
 
         stopped_cache_key = cls._generate_stopped_cache_key(task_id)
         redis_client.setex(stopped_cache_key, 600, 1)
+        task_stop_listener.publish(task_id)
 
     def _is_stopped(self) -> bool:
         """
-        Check if task is stopped
+        Check if task is stopped, the stop flag in Redis is only polled as a fallback to the stop signal
         :return:
         """
+        if self._stop_event.is_set():
+            return True
+
+        now = time.monotonic()
+        if now - self._last_stop_check_time < dify_config.APP_STOP_FLAG_POLL_INTERVAL:
+            return False
+        self._last_stop_check_time = now
+
         stopped_cache_key = AppQueueManager._generate_stopped_cache_key(self._task_id)
         result = redis_client.get(stopped_cache_key)
         if result is not None:
+            self._stop_event.set()
             return True
 
         return False
@@ -157,11 +180,16 @@ class AppQueueManager:
         return f"generate_task_stopped:{task_id}"
 
     def _check_for_sqlalchemy_models(self, data: Any):
-        # from entity to dict or list
-        if isinstance(data, dict):
-            for key, value in data.items():
+        # only fields whose type does not already rule out SQLAlchemy models are walked
+        if isinstance(data, BaseModel):
+            for name in _fields_to_check(type(data)):
+                self._check_for_sqlalchemy_models(getattr(data, name))
+            if data.model_extra:
+                self._check_for_sqlalchemy_models(data.model_extra)
+        elif isinstance(data, Mapping):
+            for value in data.values():
                 self._check_for_sqlalchemy_models(value)
-        elif isinstance(data, list):
+        elif isinstance(data, list | tuple | set | frozenset):
             for item in data:
                 self._check_for_sqlalchemy_models(item)
         else:
@@ -171,5 +199,33 @@ class AppQueueManager:
                 )
 
 
+_SAFE_FIELD_TYPES = (type(None), str, int, float, bool, bytes, datetime, date, Decimal, UUID, Enum)
+
+
+def _is_safe_annotation(annotation: Any) -> bool:
+    """
+    Whether pydantic validation of a field with this annotation already rules out SQLAlchemy models.
+    Pydantic models are not safe, a subclass instance with untyped fields is accepted as is.
+    """
+    origin = get_origin(annotation)
+    if origin is None:
+        return isinstance(annotation, type) and issubclass(annotation, _SAFE_FIELD_TYPES)
+    if origin is Literal:
+        return True
+    if origin in {Union, types.UnionType} or (isinstance(origin, type) and issubclass(origin, Sequence | Mapping)):
+        return all(arg is Ellipsis or _is_safe_annotation(arg) for arg in get_args(annotation))
+    if isinstance(origin, type) and issubclass(origin, set | frozenset):
+        return all(_is_safe_annotation(arg) for arg in get_args(annotation))
+    return False
+
+
+@cache
+def _fields_to_check(model_class: type[BaseModel]) -> tuple[str, ...]:
+    """
+    Names of the fields of a model that may hold SQLAlchemy models, computed once per class.
+    """
+    return tuple(name for name, field in model_class.model_fields.items() if not _is_safe_annotation(field.annotation))
+
+
 class GenerateTaskStoppedError(Exception):
     pass
@@ -0,0 +1,75 @@
+import logging
+import os
+import threading
+import time
+import weakref
+from typing import Optional
+
+from extensions.ext_redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+TASK_STOPPED_CHANNEL = "generate_task_stopped"
+
+
+class TaskStopListener:
+    """
+    Per-process subscriber to task stop signals published over Redis pub/sub.
+    Each running task registers a local event which is set as soon as its stop signal arrives.
+    """
+
+    def __init__(self):
+        self._events: weakref.WeakValueDictionary[str, threading.Event] = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def register(self, task_id: str) -> threading.Event:
+        """
+        Get the stop event of a task, it is dropped once the caller no longer references it.
+        """
+        self._ensure_started()
+        event = threading.Event()
+        with self._lock:
+            self._events[task_id] = event
+        return event
+
+    @staticmethod
+    def publish(task_id: str) -> None:
+        redis_client.publish(TASK_STOPPED_CHANNEL, task_id)
+
+    def _ensure_started(self) -> None:
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is None or self._pid != pid or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="task-stop-listener", daemon=True)
+                self._pid = pid
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(TASK_STOPPED_CHANNEL)
+                try:
+                    for message in pubsub.listen():
+                        if message.get("type") != "message":
+                            continue
+                        data = message["data"]
+                        task_id = data.decode("utf-8") if isinstance(data, bytes) else str(data)
+                        with self._lock:
+                            event = self._events.get(task_id)
+                        if event is not None:
+                            event.set()
+                finally:
+                    pubsub.close()
+            except Exception:
+                # stop flags are still polled by the queue managers while the subscription is down
+                logger.exception("Task stop listener disconnected, resubscribing")
+                time.sleep(1)
+
+
+task_stop_listener = TaskStopListener()
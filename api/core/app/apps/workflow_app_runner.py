@@ -60,6 +60,7 @@ from core.workflow.graph_engine.entities.event import (
     ParallelBranchRunSucceededEvent,
 )
 from core.workflow.graph_engine.entities.graph import Graph
+from core.workflow.graph_engine.graph_cache import CompiledWorkflowGraph, workflow_graph_cache
 from core.workflow.nodes import NodeType
 from core.workflow.nodes.node_mapping import NODE_TYPE_CLASSES_MAPPING
 from core.workflow.workflow_entry import WorkflowEntry
@@ -92,6 +93,12 @@ class WorkflowBasedAppRunner(AppRunner):
 
         return graph
 
+    def _init_workflow_graph(self, workflow: Workflow) -> CompiledWorkflowGraph:
+        """
+        Init graph of the workflow, reusing the compiled graph of previous runs of the same workflow version
+        """
+        return workflow_graph_cache.get(workflow, init_graph=self._init_graph)
+
     def _get_graph_and_variable_pool_of_single_iteration(
         self,
         workflow: Workflow,
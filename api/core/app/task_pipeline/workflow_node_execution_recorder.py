@@ -0,0 +1,117 @@
+import logging
+import threading
+from typing import Any, Optional
+
+from sqlalchemy import Engine, insert, inspect, update
+from sqlalchemy.orm import InstanceState, Session
+
+from configs import dify_config
+from extensions.ext_database import db
+from models.workflow import WorkflowNodeExecution
+
+logger = logging.getLogger(__name__)
+
+
+class WorkflowNodeExecutionRecorder:
+    """
+    Write-behind persistence for the node executions of one workflow run.
+
+    Saved executions are snapshotted on the caller thread and written in batches by a background thread,
+    once WORKFLOW_NODE_EXECUTION_FLUSH_BATCH_SIZE executions are pending or every
+    WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL seconds. Several saves of the same execution before a flush
+    are written as one row. `flush` writes everything pending synchronously and must be called before
+    the workflow run reaches its terminal state.
+    """
+
+    def __init__(self) -> None:
+        self._engine: Optional[Engine] = None
+        self._pending: dict[str, dict[str, Any]] = {}
+        self._persisted_ids: set[str] = set()
+        self._lock = threading.Lock()
+        # serializes flushes of the background thread and of the caller
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    def save(self, workflow_node_execution: WorkflowNodeExecution) -> None:
+        if self._engine is None:
+            # resolved on the caller thread, the background thread has no app context
+            self._engine = db.engine
+
+        state: InstanceState[WorkflowNodeExecution] = inspect(workflow_node_execution)
+        snapshot = {attr.key: state.dict[attr.key] for attr in state.mapper.column_attrs if attr.key in state.dict}
+        with self._lock:
+            pending = self._pending.setdefault(workflow_node_execution.id, {})
+            pending.update(snapshot)
+            batch_full = len(self._pending) >= dify_config.WORKFLOW_NODE_EXECUTION_FLUSH_BATCH_SIZE
+
+        self._ensure_started()
+        if batch_full:
+            self._wakeup.set()
+
+    def flush(self) -> None:
+        """
+        Write all pending executions, raising if the database write fails.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return
+
+            try:
+                self._write(batch)
+            except Exception:
+                with self._lock:
+                    # keep the failed batch for the next flush, newer saves of the same execution win
+                    for execution_id, snapshot in batch.items():
+                        self._pending[execution_id] = {**snapshot, **self._pending.get(execution_id, {})}
+                raise
+
+    def close(self) -> None:
+        """
+        Stop the background thread and write everything still pending.
+        """
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Failed to persist workflow node executions")
+
+    def _write(self, batch: dict[str, dict[str, Any]]) -> None:
+        assert self._engine is not None
+        inserts = [snapshot for execution_id, snapshot in batch.items() if execution_id not in self._persisted_ids]
+        updates = [snapshot for execution_id, snapshot in batch.items() if execution_id in self._persisted_ids]
+
+        with Session(self._engine) as session:
+            if inserts:
+                session.execute(insert(WorkflowNodeExecution), inserts)
+            if updates:
+                session.execute(update(WorkflowNodeExecution), updates)
+            session.commit()
+
+        self._persisted_ids.update(snapshot["id"] for snapshot in inserts)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None or self._closed:
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="workflow-node-execution-recorder", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(timeout=dify_config.WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL)
+            self._wakeup.clear()
+            if self._closed:
+                break
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to persist workflow node executions, retrying on the next flush")
@@ -13,11 +13,14 @@ from core.entities.model_entities import ModelStatus, ModelWithProviderEntity, S
 from core.entities.provider_entities import (
     CustomConfiguration,
     ModelSettings,
+    QuotaConfiguration,
     SystemConfiguration,
     SystemConfigurationStatus,
 )
 from core.helper import encrypter
 from core.helper.model_provider_cache import ProviderCredentialsCache, ProviderCredentialsCacheType
+from core.helper.provider_configurations_cache import provider_configurations_cache
+from core.helper.provider_quota_ledger import provider_quota_ledger
 from core.model_runtime.entities.model_entities import AIModelEntity, FetchFrom, ModelType
 from core.model_runtime.entities.provider_entities import (
     ConfigurateMethod,
@@ -146,10 +149,30 @@ class ProviderConfiguration(BaseModel):
 
         return (
             SystemConfigurationStatus.ACTIVE
-            if current_quota_configuration.is_valid
+            if self._is_quota_valid(current_quota_configuration)
             else SystemConfigurationStatus.QUOTA_EXCEEDED
         )
 
+    def _is_quota_valid(self, quota_configuration: QuotaConfiguration) -> bool:
+        """
+        Check a quota against the usage buffered right now.
+
+        Provider configurations are cached, so the buffered usage added to `quota_used` when they were built can be
+        behind by up to PROVIDER_CONFIGURATIONS_CACHE_TTL seconds.
+        :param quota_configuration: quota configuration
+        :return:
+        """
+        if not quota_configuration.is_valid:
+            return False
+        if quota_configuration.quota_limit == -1:
+            return True
+
+        pending_quota_used = provider_quota_ledger.get_provider_pending_usage(
+            self.tenant_id, self.provider.provider, quota_configuration.quota_type.value
+        )
+        quota_used = quota_configuration.quota_used - quota_configuration.pending_quota_used + pending_quota_used
+        return quota_configuration.quota_limit > quota_used
+
     def is_custom_configuration_available(self) -> bool:
         """
         Check custom configuration available.
@@ -263,6 +286,7 @@ class ProviderConfiguration(BaseModel):
             provider_record.is_valid = True
             provider_record.updated_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
             db.session.commit()
+            provider_configurations_cache.invalidate(self.tenant_id)
         else:
             provider_record = Provider()
             provider_record.tenant_id = self.tenant_id
@@ -273,6 +297,7 @@ class ProviderConfiguration(BaseModel):
 
             db.session.add(provider_record)
             db.session.commit()
+            provider_configurations_cache.invalidate(self.tenant_id)
 
         provider_model_credentials_cache = ProviderCredentialsCache(
             tenant_id=self.tenant_id, identity_id=provider_record.id, cache_type=ProviderCredentialsCacheType.PROVIDER
@@ -296,6 +321,7 @@ class ProviderConfiguration(BaseModel):
 
             db.session.delete(provider_record)
             db.session.commit()
+            provider_configurations_cache.invalidate(self.tenant_id)
 
             provider_model_credentials_cache = ProviderCredentialsCache(
                 tenant_id=self.tenant_id,
@@ -428,6 +454,7 @@ class ProviderConfiguration(BaseModel):
             provider_model_record.is_valid = True
             provider_model_record.updated_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
             db.session.commit()
+            provider_configurations_cache.invalidate(self.tenant_id)
         else:
             provider_model_record = ProviderModel()
             provider_model_record.tenant_id = self.tenant_id
@@ -438,6 +465,7 @@ class ProviderConfiguration(BaseModel):
             provider_model_record.is_valid = True
             db.session.add(provider_model_record)
             db.session.commit()
+            provider_configurations_cache.invalidate(self.tenant_id)
 
         provider_model_credentials_cache = ProviderCredentialsCache(
             tenant_id=self.tenant_id,
@@ -461,6 +489,7 @@ class ProviderConfiguration(BaseModel):
         if provider_model_record:
             db.session.delete(provider_model_record)
             db.session.commit()
+            provider_configurations_cache.invalidate(self.tenant_id)
 
             provider_model_credentials_cache = ProviderCredentialsCache(
                 tenant_id=self.tenant_id,
@@ -503,6 +532,7 @@ class ProviderConfiguration(BaseModel):
             model_setting.enabled = True
             model_setting.updated_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
             db.session.commit()
+            provider_configurations_cache.invalidate(self.tenant_id)
         else:
             model_setting = ProviderModelSetting()
             model_setting.tenant_id = self.tenant_id
@@ -512,6 +542,7 @@ class ProviderConfiguration(BaseModel):
             model_setting.enabled = True
             db.session.add(model_setting)
             db.session.commit()
+            provider_configurations_cache.invalidate(self.tenant_id)
 
         return model_setting
 
@@ -528,6 +559,7 @@ class ProviderConfiguration(BaseModel):
             model_setting.enabled = False
             model_setting.updated_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
             db.session.commit()
+            provider_configurations_cache.invalidate(self.tenant_id)
         else:
             model_setting = ProviderModelSetting()
             model_setting.tenant_id = self.tenant_id
@@ -537,6 +569,7 @@ class ProviderConfiguration(BaseModel):
             model_setting.enabled = False
             db.session.add(model_setting)
             db.session.commit()
+            provider_configurations_cache.invalidate(self.tenant_id)
 
         return model_setting
 
@@ -601,6 +634,7 @@ class ProviderConfiguration(BaseModel):
             model_setting.load_balancing_enabled = True
             model_setting.updated_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
             db.session.commit()
+            provider_configurations_cache.invalidate(self.tenant_id)
         else:
             model_setting = ProviderModelSetting()
             model_setting.tenant_id = self.tenant_id
@@ -610,6 +644,7 @@ class ProviderConfiguration(BaseModel):
             model_setting.load_balancing_enabled = True
             db.session.add(model_setting)
             db.session.commit()
+            provider_configurations_cache.invalidate(self.tenant_id)
 
         return model_setting
 
@@ -640,6 +675,7 @@ class ProviderConfiguration(BaseModel):
             model_setting.load_balancing_enabled = False
             model_setting.updated_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
             db.session.commit()
+            provider_configurations_cache.invalidate(self.tenant_id)
         else:
             model_setting = ProviderModelSetting()
             model_setting.tenant_id = self.tenant_id
@@ -649,6 +685,7 @@ class ProviderConfiguration(BaseModel):
             model_setting.load_balancing_enabled = False
             db.session.add(model_setting)
             db.session.commit()
+            provider_configurations_cache.invalidate(self.tenant_id)
 
         return model_setting
 
@@ -710,6 +747,7 @@ class ProviderConfiguration(BaseModel):
             db.session.add(preferred_model_provider)
 
         db.session.commit()
+        provider_configurations_cache.invalidate(self.tenant_id)
 
     def extract_secret_variables(self, credential_form_schemas: list[CredentialFormSchema]) -> list[str]:
         """
@@ -916,7 +954,7 @@ class ProviderConfiguration(BaseModel):
             for model in provider_models:
                 if model.model_type == ModelType.LLM and model.model not in restrict_model_names:
                     model.status = ModelStatus.NO_PERMISSION
-                elif not quota_configuration.is_valid:
+                elif not self._is_quota_valid(quota_configuration):
                     model.status = ModelStatus.QUOTA_EXCEEDED
 
         return provider_models
@@ -65,6 +65,8 @@ class QuotaConfiguration(BaseModel):
     quota_unit: QuotaUnit
     quota_limit: int
     quota_used: int
+    # part of `quota_used` still buffered in the quota ledger when the configuration was built
+    pending_quota_used: int = 0
     is_valid: bool
     restrict_models: list[RestrictModel] = []
 
@@ -0,0 +1,156 @@
+import json
+import os
+import select
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import Mapping
+from typing import Any, Optional
+
+from configs import dify_config
+from core.helper.code_executor.code_executor import CodeExecutionError
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "jinja2_sandbox_worker.py")
+
+# time given to a new worker to import Jinja2, not counted in the time limit of a render
+WORKER_STARTUP_TIMEOUT = 10.0
+
+
+class _WorkerTimeoutError(Exception):
+    pass
+
+
+class _RenderWorker:
+    """
+    A worker process rendering one template at a time, see jinja2_sandbox_worker.
+    """
+
+    def __init__(self, cache_size: int, memory_limit: int) -> None:
+        self._process = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT, str(cache_size), str(memory_limit)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self._buffer = b""
+        try:
+            self._read_line(WORKER_STARTUP_TIMEOUT)
+        except Exception:
+            self.kill()
+            raise
+
+    @property
+    def pid(self) -> int:
+        return self._process.pid
+
+    def render(self, request: bytes, timeout: float) -> dict[str, Any]:
+        assert self._process.stdin is not None
+        self._process.stdin.write(request)
+        self._process.stdin.flush()
+        response: dict[str, Any] = json.loads(self._read_line(timeout))
+        return response
+
+    def _read_line(self, timeout: float) -> bytes:
+        assert self._process.stdout is not None
+        fd = self._process.stdout.fileno()
+        deadline = time.monotonic() + timeout
+        while b"\n" not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise _WorkerTimeoutError()
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise EOFError("worker exited")
+            self._buffer += chunk
+        line, _, self._buffer = self._buffer.partition(b"\n")
+        return line
+
+    def kill(self) -> None:
+        self._process.kill()
+        self._process.wait()
+        for pipe in (self._process.stdin, self._process.stdout):
+            if pipe is not None:
+                pipe.close()
+
+
+class Jinja2Sandbox:
+    """
+    Renders Jinja2 templates with an immutable sandboxed environment in local worker processes, without the
+    round-trip to the code execution service.
+
+    Each worker caches the compiled templates by the hash of their source. A render is limited in time by killing
+    its worker once the time limit is reached, and in memory by the address space limit of the worker, so neither
+    depends on what the template does.
+    """
+
+    def __init__(self, cache_size: int, time_limit: float, memory_limit: int, max_workers: int) -> None:
+        self._cache_size = cache_size
+        self._time_limit = time_limit
+        self._memory_limit = memory_limit
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._idle_workers: list[_RenderWorker] = []
+        self._lock = threading.Lock()
+
+    def render(self, template: str, inputs: Mapping[str, Any], max_output_length: Optional[int] = None) -> str:
+        """
+        Render template with inputs
+        :param template: template
+        :param inputs: inputs, serialized as JSON like for the code execution service
+        :param max_output_length: max length of the output in characters
+        :return:
+        """
+        try:
+            request = json.dumps(
+                {"template": template, "inputs": dict(inputs), "max_output_length": max_output_length},
+                ensure_ascii=False,
+            )
+        except (TypeError, ValueError) as e:
+            raise CodeExecutionError(f"Failed to serialize template inputs: {e}") from e
+
+        with self._slots:
+            worker = self._acquire_worker()
+            try:
+                response = worker.render(request.encode("utf-8") + b"\n", self._time_limit)
+            except _WorkerTimeoutError:
+                worker.kill()
+                raise CodeExecutionError(f"Template rendering exceeded the time limit of {self._time_limit} seconds.")
+            except (OSError, EOFError, ValueError) as e:
+                worker.kill()
+                raise CodeExecutionError(f"Template rendering worker exited unexpectedly: {e}") from e
+            except BaseException:
+                # e.g. a timeout of the caller, the worker may still be rendering
+                worker.kill()
+                raise
+            self._release_worker(worker)
+
+        if "error" in response:
+            raise CodeExecutionError(response["error"])
+        return str(response["result"])
+
+    def close(self) -> None:
+        with self._lock:
+            workers, self._idle_workers = self._idle_workers, []
+        for worker in workers:
+            worker.kill()
+
+    def _acquire_worker(self) -> _RenderWorker:
+        with self._lock:
+            if self._idle_workers:
+                return self._idle_workers.pop()
+        try:
+            return _RenderWorker(self._cache_size, self._memory_limit)
+        except (OSError, EOFError, _WorkerTimeoutError) as e:
+            raise CodeExecutionError(f"Failed to start template rendering worker: {e!r}") from e
+
+    def _release_worker(self, worker: _RenderWorker) -> None:
+        with self._lock:
+            self._idle_workers.append(worker)
+
+
+jinja2_sandbox = Jinja2Sandbox(
+    cache_size=dify_config.TEMPLATE_TRANSFORM_TEMPLATE_CACHE_SIZE,
+    time_limit=dify_config.TEMPLATE_TRANSFORM_IN_PROCESS_TIME_LIMIT,
+    memory_limit=dify_config.TEMPLATE_TRANSFORM_IN_PROCESS_MEMORY_LIMIT * 1024 * 1024,
+    max_workers=dify_config.TEMPLATE_TRANSFORM_IN_PROCESS_MAX_WORKERS,
+)
@@ -0,0 +1,111 @@
+"""
+Worker process of the local Jinja2 sandbox.
+
+Reads one JSON render request per line from stdin and writes one JSON response per line to stdout. It only imports
+the standard library and Jinja2, and limits its own address space at start, so that a template building huge values
+fails with a MemoryError instead of exhausting the memory of the host. The parent process enforces the time limit of
+a render by killing the worker.
+"""
+
+import hashlib
+import json
+import os
+import sys
+from collections import OrderedDict
+from typing import Any, Optional
+
+from jinja2 import Template, TemplateError
+from jinja2.sandbox import ImmutableSandboxedEnvironment
+
+
+class RenderError(Exception):
+    pass
+
+
+class TemplateRenderer:
+    """
+    Renders templates with an immutable sandboxed environment, compiled templates are cached by the hash of their
+    source.
+    """
+
+    def __init__(self, cache_size: int) -> None:
+        self._cache_size = cache_size
+        self._environment = ImmutableSandboxedEnvironment()
+        self._templates: OrderedDict[str, Template] = OrderedDict()
+
+    def render(self, template: str, inputs: dict[str, Any], max_output_length: Optional[int] = None) -> str:
+        compiled = self._get_template(template)
+        output: list[str] = []
+        length = 0
+        for chunk in compiled.generate(**inputs):
+            output.append(chunk)
+            length += len(chunk)
+            if max_output_length is not None and length > max_output_length:
+                raise RenderError(f"Output length exceeds {max_output_length} characters")
+        return "".join(output)
+
+    def _get_template(self, template: str) -> Template:
+        key = hashlib.sha256(template.encode("utf-8")).hexdigest()
+        compiled = self._templates.get(key)
+        if compiled is not None:
+            self._templates.move_to_end(key)
+            return compiled
+
+        try:
+            compiled = self._environment.from_string(template)
+        except TemplateError as e:
+            raise RenderError(f"Invalid template: {e}") from e
+
+        if self._cache_size > 0:
+            self._templates[key] = compiled
+            while len(self._templates) > self._cache_size:
+                self._templates.popitem(last=False)
+        return compiled
+
+
+def handle_request(renderer: TemplateRenderer, request: dict[str, Any]) -> dict[str, Any]:
+    try:
+        return {"result": renderer.render(request["template"], request["inputs"], request.get("max_output_length"))}
+    except MemoryError:
+        return {"error": "Template rendering exceeded the memory limit."}
+    except RenderError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": f"Failed to render template: {e}"}
+
+
+def limit_memory(memory_limit: int) -> None:
+    """
+    Allow the process to grow its address space by memory_limit bytes, on top of what the interpreter already maps
+    """
+    try:
+        import resource
+    except ImportError:
+        # not available on Windows
+        return
+
+    current = 0
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    resource.setrlimit(resource.RLIMIT_AS, (current + memory_limit, current + memory_limit))
+
+
+def main() -> None:
+    cache_size, memory_limit = int(sys.argv[1]), int(sys.argv[2])
+    renderer = TemplateRenderer(cache_size)
+    limit_memory(memory_limit)
+
+    stdout = sys.stdout.buffer
+    stdout.write(b'{"ready": true}\n')
+    stdout.flush()
+    for line in sys.stdin.buffer:
+        response = handle_request(renderer, json.loads(line))
+        stdout.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+        stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
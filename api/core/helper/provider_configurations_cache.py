@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+from configs import dify_config
+from extensions.ext_redis import redis_client
+
+if TYPE_CHECKING:
+    from core.entities.provider_configuration import ProviderConfigurations
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderConfigurationsCache:
+    """
+    Process-local LRU cache of the assembled provider configurations of each tenant.
+
+    Every read checks the entry against a per-tenant version kept in Redis, which writes to the provider, model,
+    load balancing and plugin records of the tenant bump through `invalidate`. Entries also expire after
+    PROVIDER_CONFIGURATIONS_CACHE_TTL seconds to pick up changes made outside the API, e.g. plugin installations
+    finishing in the daemon. Cached configurations are shared between requests and must not be mutated.
+    """
+
+    def __init__(self, max_size: int, ttl: int) -> None:
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries: OrderedDict[str, tuple[int, float, ProviderConfigurations]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, tenant_id: str, build: Callable[[str], "ProviderConfigurations"]) -> "ProviderConfigurations":
+        """
+        Get the provider configurations of a tenant, building them with `build` when the entry is missing or stale.
+        """
+        if self._max_size <= 0:
+            return build(tenant_id)
+
+        try:
+            # read before building, a write racing with the build leaves a stale version behind
+            version = int(redis_client.get(self._version_key(tenant_id)) or 0)
+        except Exception:
+            logger.exception("Failed to get provider configurations version of tenant %s", tenant_id)
+            return build(tenant_id)
+
+        with self._lock:
+            entry = self._entries.get(tenant_id)
+            if entry is not None and entry[0] == version and time.monotonic() - entry[1] < self._ttl:
+                self._entries.move_to_end(tenant_id)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        provider_configurations = build(tenant_id)
+        with self._lock:
+            self._entries[tenant_id] = (version, time.monotonic(), provider_configurations)
+            self._entries.move_to_end(tenant_id)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+        return provider_configurations
+
+    def invalidate(self, tenant_id: str) -> None:
+        """
+        Drop the cached provider configurations of a tenant in all processes.
+        """
+        with self._lock:
+            self._entries.pop(tenant_id, None)
+        try:
+            redis_client.incr(self._version_key(tenant_id))
+        except Exception:
+            logger.exception("Failed to bump provider configurations version of tenant %s", tenant_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _version_key(tenant_id: str) -> str:
+        return f"provider_configurations_version:{tenant_id}"
+
+
+provider_configurations_cache = ProviderConfigurationsCache(
+    max_size=dify_config.PROVIDER_CONFIGURATIONS_CACHE_SIZE,
+    ttl=dify_config.PROVIDER_CONFIGURATIONS_CACHE_TTL,
+)
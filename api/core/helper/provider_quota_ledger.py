@@ -0,0 +1,152 @@
+import logging
+import uuid
+from datetime import UTC, datetime
+
+from sqlalchemy.orm import Session
+
+from configs import dify_config
+from core.helper.provider_configurations_cache import provider_configurations_cache
+from core.plugin.entities.plugin import ModelProviderID
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from models.provider import Provider, ProviderType
+
+logger = logging.getLogger(__name__)
+
+# moves the buffered usage to a key of its own, usage added meanwhile starts the counter over
+TAKE_PENDING_USAGE_SCRIPT = """
+local pending = redis.call('GET', KEYS[1])
+if pending then
+    redis.call('DEL', KEYS[1])
+    redis.call('SET', KEYS[2], pending, 'EX', ARGV[1])
+end
+return pending
+"""
+
+
+class ProviderQuotaLedger:
+    """
+    Buffers the quota used on system providers in Redis.
+
+    Usage is added to a per provider record counter and written to the providers table at most once per
+    HOSTED_QUOTA_FLUSH_INTERVAL seconds, instead of updating the row after every model call. Quota checks add
+    the buffered usage to the stored `quota_used`, see `get_pending_usage` and `get_provider_pending_usage`.
+    """
+
+    PENDING_KEYS = "provider_quota_pending_keys"
+    FLUSHING_KEY_TTL = 3600
+
+    def deduct(self, tenant_id: str, provider_name: str, quota_type: str, used_quota: int) -> None:
+        key = self._pending_key(tenant_id, provider_name, quota_type)
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            pipeline.incrby(key, used_quota)
+            pipeline.sadd(self.PENDING_KEYS, key)
+            pipeline.set(f"{key}:flushed", 1, nx=True, ex=dify_config.HOSTED_QUOTA_FLUSH_INTERVAL)
+            _, _, flush_due = pipeline.execute()
+        except Exception:
+            logger.exception("Failed to buffer provider quota usage, writing it directly")
+            self._update_provider(tenant_id, provider_name, quota_type, used_quota)
+            provider_configurations_cache.invalidate(tenant_id)
+            return
+
+        if flush_due:
+            self.flush(key)
+
+    def get_pending_usage(self, provider_records: list[Provider]) -> dict[str, int]:
+        """
+        Get the buffered usage of each provider record by its id.
+        """
+        if not provider_records:
+            return {}
+
+        # usage is deducted under the provider name without prefix, see LLMNode.deduct_llm_quota
+        keys = [
+            self._pending_key(record.tenant_id, ModelProviderID(record.provider_name).provider_name, record.quota_type)
+            for record in provider_records
+        ]
+        try:
+            values = redis_client.mget(keys)
+        except Exception:
+            logger.exception("Failed to get buffered provider quota usage")
+            return {}
+
+        return {record.id: int(value) for record, value in zip(provider_records, values) if value}
+
+    def get_provider_pending_usage(self, tenant_id: str, provider_name: str, quota_type: str) -> int:
+        """
+        Get the buffered usage of one provider record, read at quota check time.
+        """
+        key = self._pending_key(tenant_id, ModelProviderID(provider_name).provider_name, quota_type)
+        try:
+            return int(redis_client.get(key) or 0)
+        except Exception:
+            logger.exception("Failed to get buffered provider quota usage")
+            return 0
+
+    def flush(self, key: str) -> None:
+        lock = redis_client.lock(f"{key}:lock", timeout=30)
+        if not lock.acquire(blocking=False):
+            return
+
+        try:
+            # the usage is taken out of the counter before it is written, so a flush failing after the write never
+            # writes it again, at worst the usage of a worker dying in between is lost
+            flushing_key = f"{key}:flushing:{uuid.uuid4().hex}"
+            pending = int(
+                redis_client.eval(TAKE_PENDING_USAGE_SCRIPT, 2, key, flushing_key, self.FLUSHING_KEY_TTL) or 0
+            )
+            if pending <= 0:
+                return
+
+            _, tenant_id, provider_name, quota_type = key.split(":", 3)
+            try:
+                self._update_provider(tenant_id, provider_name, quota_type, pending)
+            except Exception:
+                # nothing was written, the usage goes back to the counter for the next flush
+                pipeline = redis_client.pipeline()
+                pipeline.incrby(key, pending)
+                pipeline.delete(flushing_key)
+                pipeline.execute()
+                raise
+
+            # cached configurations carry the quota state read from the provider records
+            provider_configurations_cache.invalidate(tenant_id)
+            redis_client.delete(flushing_key)
+        except Exception:
+            logger.exception("Failed to flush provider quota usage of %s", key)
+        finally:
+            lock.release()
+
+    def flush_all(self) -> None:
+        for key in redis_client.smembers(self.PENDING_KEYS):
+            key = key.decode("utf-8") if isinstance(key, bytes) else key
+            # removed first, usage added from now on registers the key again
+            redis_client.srem(self.PENDING_KEYS, key)
+            self.flush(key)
+            if int(redis_client.get(key) or 0) > 0:
+                redis_client.sadd(self.PENDING_KEYS, key)
+
+    @staticmethod
+    def _pending_key(tenant_id: str, provider_name: str, quota_type: str) -> str:
+        return f"provider_quota_pending:{tenant_id}:{provider_name}:{quota_type}"
+
+    @staticmethod
+    def _update_provider(tenant_id: str, provider_name: str, quota_type: str, used_quota: int) -> None:
+        with Session(db.engine) as session:
+            session.query(Provider).filter(
+                Provider.tenant_id == tenant_id,
+                Provider.provider_name == provider_name,
+                Provider.provider_type == ProviderType.SYSTEM.value,
+                Provider.quota_type == quota_type,
+                Provider.quota_limit > Provider.quota_used,
+            ).update(
+                {
+                    "quota_used": Provider.quota_used + used_quota,
+                    "last_used": datetime.now(tz=UTC).replace(tzinfo=None),
+                }
+            )
+            session.commit()
+
+
+provider_quota_ledger = ProviderQuotaLedger()
@@ -2,12 +2,23 @@
 Proxy requests to avoid SSRF
 """
 
+import ipaddress
 import logging
+import os
+import socket
+import ssl
+import threading
 import time
+import weakref
+from contextlib import contextmanager
+from http.cookiejar import CookieJar
+from typing import Optional, TypedDict, cast
 
+import httpcore
 import httpx
 
 from configs import dify_config
+from core.helper.lru_cache import LRUCache
 
 SSRF_DEFAULT_MAX_RETRIES = dify_config.SSRF_DEFAULT_MAX_RETRIES
 
@@ -34,6 +45,321 @@ class MaxRetriesExceededError(ValueError):
     pass
 
 
+_dns_cache = LRUCache(dify_config.SSRF_HOST_CACHE_SIZE)
+_dns_cache_lock = threading.Lock()
+
+
+def _resolve_host(host: str, port: int) -> str:
+    """
+    Resolve a host name to an address, cached for SSRF_DNS_CACHE_TTL seconds.
+    """
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+
+    key = (host, port)
+    now = time.monotonic()
+    with _dns_cache_lock:
+        cached = _dns_cache.get(key)
+    if cached and cached[0] > now:
+        return cast(str, cached[1])
+
+    address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0][4][0]
+    with _dns_cache_lock:
+        _dns_cache.put(key, (now + dify_config.SSRF_DNS_CACHE_TTL, address))
+    return address
+
+
+class _CachedDNSBackend(httpcore.SyncBackend):
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        # resolution runs outside httpcore's exception mapping, a failed lookup is a connect error
+        try:
+            address = _resolve_host(host, port)
+        except OSError as e:
+            raise httpcore.ConnectError(str(e)) from e
+        return super().connect_tcp(address, port, timeout, local_address, socket_options)
+
+
+# most specific httpx exception of each httpcore exception, as raised by httpx.HTTPTransport
+_HTTPCORE_EXCEPTIONS: dict[type[Exception], type[httpx.TransportError]] = {
+    httpcore.TimeoutException: httpx.TimeoutException,
+    httpcore.ConnectTimeout: httpx.ConnectTimeout,
+    httpcore.ReadTimeout: httpx.ReadTimeout,
+    httpcore.WriteTimeout: httpx.WriteTimeout,
+    httpcore.PoolTimeout: httpx.PoolTimeout,
+    httpcore.NetworkError: httpx.NetworkError,
+    httpcore.ConnectError: httpx.ConnectError,
+    httpcore.ReadError: httpx.ReadError,
+    httpcore.WriteError: httpx.WriteError,
+    httpcore.ProxyError: httpx.ProxyError,
+    httpcore.UnsupportedProtocol: httpx.UnsupportedProtocol,
+    httpcore.ProtocolError: httpx.ProtocolError,
+    httpcore.LocalProtocolError: httpx.LocalProtocolError,
+    httpcore.RemoteProtocolError: httpx.RemoteProtocolError,
+}
+
+
+@contextmanager
+def _map_httpcore_exceptions():
+    try:
+        yield
+    except Exception as e:
+        mapped = None
+        for httpcore_exception, httpx_exception in _HTTPCORE_EXCEPTIONS.items():
+            if isinstance(e, httpcore_exception) and (mapped is None or issubclass(httpx_exception, mapped)):
+                mapped = httpx_exception
+        if mapped is None:
+            raise
+        raise mapped(str(e)) from e
+
+
+class _ResponseStream(httpx.SyncByteStream):
+    def __init__(self, stream) -> None:
+        self._stream = stream
+
+    def __iter__(self):
+        with _map_httpcore_exceptions():
+            yield from self._stream
+
+    def close(self) -> None:
+        if hasattr(self._stream, "close"):
+            self._stream.close()
+
+
+def _httpcore_url(url: httpx.URL) -> httpcore.URL:
+    return httpcore.URL(scheme=url.raw_scheme, host=url.raw_host, port=url.port, target=url.raw_path)
+
+
+class _PoolOptions(TypedDict):
+    ssl_context: ssl.SSLContext
+    max_connections: int
+    max_keepalive_connections: int
+    keepalive_expiry: float
+    http2: bool
+    network_backend: httpcore.NetworkBackend
+
+
+class _CachedDNSTransport(httpx.BaseTransport):
+    """
+    Transport opening its connections to the addresses in the DNS cache.
+
+    httpx does not let its transports take a network backend, so the connection pool is built
+    with the public httpcore API. Proxies are taken from the arguments only, not from the environment.
+    """
+
+    def __init__(self, proxy: Optional[str] = None) -> None:
+        options: _PoolOptions = {
+            "ssl_context": httpx.create_ssl_context(
+                verify=HTTP_REQUEST_NODE_SSL_VERIFY, http2=dify_config.SSRF_HTTP2_ENABLED
+            ),
+            "max_connections": dify_config.SSRF_POOL_MAX_CONNECTIONS,
+            "max_keepalive_connections": dify_config.SSRF_POOL_MAX_KEEPALIVE_CONNECTIONS,
+            "keepalive_expiry": dify_config.SSRF_POOL_KEEPALIVE_EXPIRY,
+            "http2": dify_config.SSRF_HTTP2_ENABLED,
+            "network_backend": _CachedDNSBackend(),
+        }
+        self._pool: httpcore.ConnectionPool
+        if proxy is None:
+            self._pool = httpcore.ConnectionPool(**options)
+        elif httpx.URL(proxy).scheme in {"socks5", "socks5h"}:
+            socks_proxy = httpx.Proxy(proxy)
+            self._pool = httpcore.SOCKSProxy(
+                proxy_url=_httpcore_url(socks_proxy.url), proxy_auth=socks_proxy.raw_auth, **options
+            )
+        else:
+            http_proxy = httpx.Proxy(proxy)
+            self._pool = httpcore.HTTPProxy(
+                proxy_url=_httpcore_url(http_proxy.url), proxy_headers=http_proxy.headers.raw, **options
+            )
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        core_request = httpcore.Request(
+            method=request.method,
+            url=_httpcore_url(request.url),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with _map_httpcore_exceptions():
+            core_response = self._pool.handle_request(core_request)
+
+        return httpx.Response(
+            status_code=core_response.status,
+            headers=core_response.headers,
+            stream=_ResponseStream(core_response.stream),
+            extensions=core_response.extensions,
+        )
+
+    def close(self) -> None:
+        self._pool.close()
+
+
+class _DiscardingCookieJar(CookieJar):
+    """
+    Cookie jar that never stores the cookies of a response.
+    The client is shared by all tenants, a cookie set for one of them must not be sent with the requests of another.
+    """
+
+    def extract_cookies(self, response, request) -> None:
+        pass
+
+    def set_cookie(self, cookie) -> None:
+        pass
+
+
+def _pool_options() -> dict:
+    return {
+        "verify": HTTP_REQUEST_NODE_SSL_VERIFY,
+        "http2": dify_config.SSRF_HTTP2_ENABLED,
+        "limits": httpx.Limits(
+            max_connections=dify_config.SSRF_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=dify_config.SSRF_POOL_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=dify_config.SSRF_POOL_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def _build_client(
+    proxy_all_url: Optional[str], proxy_http_url: Optional[str], proxy_https_url: Optional[str]
+) -> httpx.Client:
+    if dify_config.SSRF_DNS_CACHE_TTL > 0:
+        if proxy_all_url:
+            return httpx.Client(transport=_CachedDNSTransport(proxy_all_url), cookies=_DiscardingCookieJar())
+        elif proxy_http_url and proxy_https_url:
+            proxy_mounts: dict[str, httpx.BaseTransport] = {
+                "http://": _CachedDNSTransport(proxy_http_url),
+                "https://": _CachedDNSTransport(proxy_https_url),
+            }
+            return httpx.Client(mounts=proxy_mounts, cookies=_DiscardingCookieJar())
+        return httpx.Client(transport=_CachedDNSTransport(), cookies=_DiscardingCookieJar())
+
+    if proxy_all_url:
+        return httpx.Client(proxy=proxy_all_url, cookies=_DiscardingCookieJar(), **_pool_options())
+    elif proxy_http_url and proxy_https_url:
+        proxy_mounts = {
+            "http://": httpx.HTTPTransport(proxy=proxy_http_url, **_pool_options()),
+            "https://": httpx.HTTPTransport(proxy=proxy_https_url, **_pool_options()),
+        }
+        return httpx.Client(mounts=proxy_mounts, cookies=_DiscardingCookieJar(), **_pool_options())
+    else:
+        return httpx.Client(cookies=_DiscardingCookieJar(), **_pool_options())
+
+
+_clients: dict[tuple, httpx.Client] = {}
+_clients_pid: Optional[int] = None
+_clients_lock = threading.Lock()
+
+
+def _get_client() -> httpx.Client:
+    """
+    Get the long-lived client for the current proxy configuration, shared by all threads and greenlets.
+    A forked process builds its own clients instead of sharing the parent's sockets.
+    """
+    global _clients_pid
+    key = (
+        dify_config.SSRF_PROXY_ALL_URL,
+        dify_config.SSRF_PROXY_HTTP_URL,
+        dify_config.SSRF_PROXY_HTTPS_URL,
+    )
+    pid = os.getpid()
+    client = _clients.get(key) if _clients_pid == pid else None
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        if _clients_pid != pid:
+            _clients.clear()
+            _clients_pid = pid
+        client = _clients.get(key)
+        if client is None:
+            client = _build_client(*key)
+            _clients[key] = client
+    return client
+
+
+# an evicted host gets a new semaphore, hosts in use stay recent and are not evicted
+_host_semaphores = LRUCache(dify_config.SSRF_HOST_CACHE_SIZE)
+_host_semaphores_lock = threading.Lock()
+
+
+def _get_host_semaphore(url) -> Optional[threading.BoundedSemaphore]:
+    if not dify_config.SSRF_POOL_MAX_CONNECTIONS_PER_HOST:
+        return None
+    host = httpx.URL(url).host
+    with _host_semaphores_lock:
+        semaphore = cast(Optional[threading.BoundedSemaphore], _host_semaphores.get(host))
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(dify_config.SSRF_POOL_MAX_CONNECTIONS_PER_HOST)
+            _host_semaphores.put(host, semaphore)
+    return semaphore
+
+
+class _HostSlot:
+    """
+    A per-host semaphore slot taken by a streamed response, released once.
+    """
+
+    def __init__(self, semaphore: threading.BoundedSemaphore) -> None:
+        self._semaphore = semaphore
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self) -> None:
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._semaphore.release()
+
+
+class _HostSlotStream(httpx.SyncByteStream):
+    def __init__(self, stream: httpx.SyncByteStream, slot: _HostSlot) -> None:
+        self._stream = stream
+        self._slot = slot
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._slot.release()
+
+
+def _send_holding_slot(semaphore: threading.BoundedSemaphore, method, url, **kwargs) -> httpx.Response:
+    """
+    Send a streamed request, keeping its host slot until the caller closes the response or drops it.
+    """
+    semaphore.acquire()
+    slot = _HostSlot(semaphore)
+    try:
+        response = _send(method, url, True, **kwargs)
+    except BaseException:
+        slot.release()
+        raise
+
+    if isinstance(response.stream, httpx.SyncByteStream):
+        response.stream = _HostSlotStream(response.stream, slot)
+        weakref.finalize(response, slot.release)
+    else:
+        slot.release()
+    return response
+
+
+def _send(method, url, stream, **kwargs) -> httpx.Response:
+    client = _get_client()
+    if not stream:
+        return client.request(method=method, url=url, **kwargs)
+
+    follow_redirects = kwargs.pop("follow_redirects", httpx.USE_CLIENT_DEFAULT)
+    auth = kwargs.pop("auth", httpx.USE_CLIENT_DEFAULT)
+    request = client.build_request(method=method, url=url, **kwargs)
+    return client.send(request, stream=True, follow_redirects=follow_redirects, auth=auth)
+
+
 def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
     if "allow_redirects" in kwargs:
         allow_redirects = kwargs.pop("allow_redirects")
@@ -48,26 +374,26 @@ def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
             write=dify_config.SSRF_DEFAULT_WRITE_TIME_OUT,
         )
 
+    # a streamed response has only its headers read, the caller reads the body and must close it
+    stream = kwargs.pop("stream", False)
+
     retries = 0
     while retries <= max_retries:
         try:
-            if dify_config.SSRF_PROXY_ALL_URL:
-                with httpx.Client(proxy=dify_config.SSRF_PROXY_ALL_URL, verify=HTTP_REQUEST_NODE_SSL_VERIFY) as client:
-                    response = client.request(method=method, url=url, **kwargs)
-            elif dify_config.SSRF_PROXY_HTTP_URL and dify_config.SSRF_PROXY_HTTPS_URL:
-                proxy_mounts = {
-                    "http://": httpx.HTTPTransport(proxy=dify_config.SSRF_PROXY_HTTP_URL),
-                    "https://": httpx.HTTPTransport(proxy=dify_config.SSRF_PROXY_HTTPS_URL),
-                }
-                with httpx.Client(mounts=proxy_mounts, verify=HTTP_REQUEST_NODE_SSL_VERIFY) as client:
-                    response = client.request(method=method, url=url, **kwargs)
+            semaphore = _get_host_semaphore(url)
+            if semaphore is None:
+                response = _send(method, url, stream, **kwargs)
+            elif stream:
+                # the body is read after make_request returns, the slot bounds the responses in flight
+                response = _send_holding_slot(semaphore, method, url, **kwargs)
             else:
-                with httpx.Client(verify=HTTP_REQUEST_NODE_SSL_VERIFY) as client:
-                    response = client.request(method=method, url=url, **kwargs)
+                with semaphore:
+                    response = _send(method, url, stream, **kwargs)
 
             if response.status_code not in STATUS_FORCELIST:
                 return response
             else:
+                response.close()
                 logging.warning(f"Received status code {response.status_code} for URL {url} which is in the force list")
 
         except httpx.RequestError as e:
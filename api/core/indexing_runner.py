@@ -10,6 +10,7 @@ from typing import Any, Optional, cast
 
 from flask import current_app
 from flask_login import current_user  # type: ignore
+from sqlalchemy import func
 from sqlalchemy.orm.exc import ObjectDeletedError
 
 from configs import dify_config
@@ -38,6 +39,7 @@ from libs import helper
 from models.dataset import ChildChunk, Dataset, DatasetProcessRule, DocumentSegment
 from models.dataset import Document as DatasetDocument
 from models.model import UploadFile
+from services.entities.knowledge_entities.knowledge_entities import ParentMode
 from services.feature_service import FeatureService
 
 
@@ -66,23 +68,10 @@ class IndexingRunner:
                     raise ValueError("no process rule found")
                 index_type = dataset_document.doc_form
                 index_processor = IndexProcessorFactory(index_type).init_index_processor()
-                # extract
-                text_docs = self._extract(index_processor, dataset_document, processing_rule.to_dict())
-
-                # transform
-                documents = self._transform(
-                    index_processor, dataset, text_docs, dataset_document.doc_language, processing_rule.to_dict()
-                )
-                # save segment
-                self._load_segments(dataset, dataset_document, documents)
-
-                # load
-                self._load(
-                    index_processor=index_processor,
-                    dataset=dataset,
-                    dataset_document=dataset_document,
-                    documents=documents,
-                )
+                # a new run does not resume from the batches of an earlier one
+                self._clear_checkpoint(dataset_document.id)
+                # extract, transform, save segments and load in batches
+                self._run_pipeline(index_processor, dataset, dataset_document, processing_rule.to_dict())
             except DocumentIsPausedError:
                 raise DocumentIsPausedError("Document paused, document id: {}".format(dataset_document.id))
             except ProviderTokenNotInitError as e:
@@ -108,6 +97,10 @@ class IndexingRunner:
             if not dataset:
                 raise ValueError("no dataset found")
 
+            if self.has_checkpoint(dataset_document.id):
+                self.resume(dataset_document)
+                return
+
             # get exist document_segment list and delete
             document_segments = DocumentSegment.query.filter_by(
                 dataset_id=dataset.id, document_id=dataset_document.id
@@ -130,20 +123,8 @@ class IndexingRunner:
 
             index_type = dataset_document.doc_form
             index_processor = IndexProcessorFactory(index_type).init_index_processor()
-            # extract
-            text_docs = self._extract(index_processor, dataset_document, processing_rule.to_dict())
-
-            # transform
-            documents = self._transform(
-                index_processor, dataset, text_docs, dataset_document.doc_language, processing_rule.to_dict()
-            )
-            # save segment
-            self._load_segments(dataset, dataset_document, documents)
-
-            # load
-            self._load(
-                index_processor=index_processor, dataset=dataset, dataset_document=dataset_document, documents=documents
-            )
+            # extract, transform, save segments and load in batches
+            self._run_pipeline(index_processor, dataset, dataset_document, processing_rule.to_dict())
         except DocumentIsPausedError:
             raise DocumentIsPausedError("Document paused, document id: {}".format(dataset_document.id))
         except ProviderTokenNotInitError as e:
@@ -167,6 +148,11 @@ class IndexingRunner:
             if not dataset:
                 raise ValueError("no dataset found")
 
+            # the pipeline was interrupted before all batches were split
+            if self.has_checkpoint(dataset_document.id):
+                self.resume(dataset_document)
+                return
+
             # get exist document_segment list and delete
             document_segments = DocumentSegment.query.filter_by(
                 dataset_id=dataset.id, document_id=dataset_document.id
@@ -231,6 +217,58 @@ class IndexingRunner:
             dataset_document.stopped_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
             db.session.commit()
 
+    def resume(self, dataset_document: DatasetDocument):
+        """Resume the indexing process after the last checkpointed batch."""
+        try:
+            checkpoint = self._get_checkpoint(dataset_document.id)
+            if checkpoint is None:
+                raise ValueError("no indexing checkpoint found")
+
+            # get dataset
+            dataset = Dataset.query.filter_by(id=dataset_document.dataset_id).first()
+
+            if not dataset:
+                raise ValueError("no dataset found")
+
+            # get the process rule
+            processing_rule = (
+                db.session.query(DatasetProcessRule)
+                .filter(DatasetProcessRule.id == dataset_document.dataset_process_rule_id)
+                .first()
+            )
+            if not processing_rule:
+                raise ValueError("no process rule found")
+
+            index_type = dataset_document.doc_form
+            index_processor = IndexProcessorFactory(index_type).init_index_processor()
+
+            # delete the segments of the interrupted batch, they are split again
+            document_segments = DocumentSegment.query.filter(
+                DocumentSegment.document_id == dataset_document.id,
+                DocumentSegment.position > checkpoint["position"],
+            ).all()
+            if document_segments:
+                index_node_ids = [document_segment.index_node_id for document_segment in document_segments]
+                index_processor.clean(dataset, index_node_ids, with_keywords=True, delete_child_chunks=True)
+                for document_segment in document_segments:
+                    db.session.delete(document_segment)
+                db.session.commit()
+
+            self._run_pipeline(index_processor, dataset, dataset_document, processing_rule.to_dict(), checkpoint)
+        except DocumentIsPausedError:
+            raise DocumentIsPausedError("Document paused, document id: {}".format(dataset_document.id))
+        except ProviderTokenNotInitError as e:
+            dataset_document.indexing_status = "error"
+            dataset_document.error = str(e.description)
+            dataset_document.stopped_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+            db.session.commit()
+        except Exception as e:
+            logging.exception("consume document failed")
+            dataset_document.indexing_status = "error"
+            dataset_document.error = str(e)
+            dataset_document.stopped_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+            db.session.commit()
+
     def indexing_estimate(
         self,
         tenant_id: str,
@@ -518,17 +556,93 @@ class IndexingRunner:
         insert index and update document/segment status to completed
         """
 
-        embedding_model_instance = None
-        if dataset.indexing_technique == "high_quality":
-            embedding_model_instance = self.model_manager.get_model_instance(
-                tenant_id=dataset.tenant_id,
-                provider=dataset.embedding_model_provider,
-                model_type=ModelType.TEXT_EMBEDDING,
-                model=dataset.embedding_model,
+        embedding_model_instance = self._get_load_embedding_model_instance(dataset)
+
+        indexing_start_at = time.perf_counter()
+        tokens = self._load_batch(index_processor, dataset, dataset_document, documents, embedding_model_instance)
+        indexing_end_at = time.perf_counter()
+
+        self._complete_document(dataset_document, tokens, indexing_end_at - indexing_start_at)
+
+    def _run_pipeline(
+        self,
+        index_processor: BaseIndexProcessor,
+        dataset: Dataset,
+        dataset_document: DatasetDocument,
+        process_rule: dict,
+        checkpoint: Optional[dict] = None,
+    ) -> None:
+        """
+        Transform, save and index the extracted pages in batches of INDEXING_PIPELINE_BATCH_SIZE, so only the
+        chunks of one batch are held at a time. Every indexed batch is checkpointed, a resumed run skips the pages
+        of the checkpointed batches.
+        """
+        # extract
+        text_docs = self._extract(index_processor, dataset_document, process_rule)
+
+        pages = checkpoint["pages"] if checkpoint else 0
+        tokens = checkpoint["tokens"] if checkpoint else 0
+        indexing_latency = checkpoint["latency"] if checkpoint else 0.0
+        del text_docs[:pages]
+
+        batch_size = dify_config.INDEXING_PIPELINE_BATCH_SIZE
+        if (
+            dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX
+            and (process_rule.get("rules") or {}).get("parent_mode") == ParentMode.FULL_DOC.value
+        ):
+            # all pages are joined into one parent chunk
+            batch_size = max(len(text_docs), 1)
+
+        if checkpoint is None:
+            # from here on an interrupted run is resumed instead of indexing only the segments saved so far
+            self._save_checkpoint(dataset_document.id, pages, tokens, indexing_latency)
+
+        embedding_model_instance = self._get_load_embedding_model_instance(dataset)
+        while text_docs:
+            batch_text_docs = text_docs[:batch_size]
+            # release the pages of the batch once it is indexed
+            del text_docs[:batch_size]
+
+            # transform
+            documents = self._transform(
+                index_processor, dataset, batch_text_docs, dataset_document.doc_language, process_rule
             )
+            # save segment
+            self._load_segments(dataset, dataset_document, documents)
+
+            # load
+            indexing_start_at = time.perf_counter()
+            tokens += self._load_batch(index_processor, dataset, dataset_document, documents, embedding_model_instance)
+            indexing_latency += time.perf_counter() - indexing_start_at
+
+            pages += len(batch_text_docs)
+            self._save_checkpoint(dataset_document.id, pages, tokens, indexing_latency)
+
+        self._complete_document(dataset_document, tokens, indexing_latency)
+        self._clear_checkpoint(dataset_document.id)
 
+    def _get_load_embedding_model_instance(self, dataset: Dataset) -> Optional[ModelInstance]:
+        if dataset.indexing_technique != "high_quality":
+            return None
+        return self.model_manager.get_model_instance(
+            tenant_id=dataset.tenant_id,
+            provider=dataset.embedding_model_provider,
+            model_type=ModelType.TEXT_EMBEDDING,
+            model=dataset.embedding_model,
+        )
+
+    def _load_batch(
+        self,
+        index_processor: BaseIndexProcessor,
+        dataset: Dataset,
+        dataset_document: DatasetDocument,
+        documents: list[Document],
+        embedding_model_instance: Optional[ModelInstance],
+    ) -> int:
+        """
+        insert index of the documents and update their segment status to completed, returns the embedding tokens
+        """
         # chunk nodes by chunk size
-        indexing_start_at = time.perf_counter()
         tokens = 0
         if dataset_document.doc_form != IndexType.PARENT_CHILD_INDEX:
             # create keyword index
@@ -570,8 +684,10 @@ class IndexingRunner:
                     tokens += future.result()
         if dataset_document.doc_form != IndexType.PARENT_CHILD_INDEX:
             create_keyword_thread.join()
-        indexing_end_at = time.perf_counter()
 
+        return tokens
+
+    def _complete_document(self, dataset_document: DatasetDocument, tokens: int, indexing_latency: float) -> None:
         # update document status to completed
         self._update_document_index_status(
             document_id=dataset_document.id,
@@ -579,7 +695,7 @@ class IndexingRunner:
             extra_update_params={
                 DatasetDocument.tokens: tokens,
                 DatasetDocument.completed_at: datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
-                DatasetDocument.indexing_latency: indexing_end_at - indexing_start_at,
+                DatasetDocument.indexing_latency: indexing_latency,
                 DatasetDocument.error: None,
             },
         )
@@ -649,6 +765,36 @@ class IndexingRunner:
         if result:
             raise DocumentIsPausedError()
 
+    @staticmethod
+    def has_checkpoint(document_id: str) -> bool:
+        return bool(redis_client.exists(IndexingRunner._checkpoint_key(document_id)))
+
+    @staticmethod
+    def _get_checkpoint(document_id: str) -> Optional[dict]:
+        checkpoint = redis_client.get(IndexingRunner._checkpoint_key(document_id))
+        return json.loads(checkpoint) if checkpoint else None
+
+    @staticmethod
+    def _save_checkpoint(document_id: str, pages: int, tokens: int, indexing_latency: float) -> None:
+        # segments above the position belong to a batch that was not checkpointed
+        position = (
+            db.session.query(func.max(DocumentSegment.position))
+            .filter(DocumentSegment.document_id == document_id)
+            .scalar()
+        )
+        checkpoint = {"pages": pages, "position": position or 0, "tokens": tokens, "latency": indexing_latency}
+        redis_client.setex(
+            IndexingRunner._checkpoint_key(document_id), dify_config.INDEXING_CHECKPOINT_TTL, json.dumps(checkpoint)
+        )
+
+    @staticmethod
+    def _clear_checkpoint(document_id: str) -> None:
+        redis_client.delete(IndexingRunner._checkpoint_key(document_id))
+
+    @staticmethod
+    def _checkpoint_key(document_id: str) -> str:
+        return "document_{}_indexing_checkpoint".format(document_id)
+
     @staticmethod
     def _update_document_index_status(
         document_id: str, after_indexing_status: str, extra_update_params: Optional[dict] = None
@@ -674,9 +820,10 @@ class IndexingRunner:
     @staticmethod
     def _update_segments_by_document(dataset_document_id: str, update_params: dict) -> None:
         """
-        Update the document segment by document id.
+        Update the waiting document segments by document id.
         """
-        DocumentSegment.query.filter_by(document_id=dataset_document_id).update(update_params)
+        # segments of earlier batches are already indexing or completed
+        DocumentSegment.query.filter_by(document_id=dataset_document_id, status="waiting").update(update_params)
         db.session.commit()
 
     def _transform(
@@ -1,8 +1,9 @@
+import logging
 from collections.abc import Sequence
 from typing import Optional
 
 from core.app.app_config.features.file_upload.manager import FileUploadConfigManager
-from core.file import file_manager
+from core.file import FileUploadConfig, file_manager
 from core.model_manager import ModelInstance
 from core.model_runtime.entities import (
     AssistantPromptMessage,
@@ -15,9 +16,15 @@ from core.model_runtime.entities import (
 )
 from core.prompt.utils.extract_thread_messages import extract_thread_messages
 from extensions.ext_database import db
+from extensions.ext_redis import redis_client
 from factories import file_factory
 from models.model import AppMode, Conversation, Message, MessageFile
-from models.workflow import WorkflowRun
+from models.workflow import Workflow, WorkflowRun
+
+logger = logging.getLogger(__name__)
+
+# answered messages never change, their token counts only expire to bound the cache size
+MESSAGE_TOKENS_CACHE_TTL = 7 * 24 * 60 * 60
 
 
 class TokenBufferMemory:
@@ -68,24 +75,17 @@ class TokenBufferMemory:
 
         messages = list(reversed(thread_messages))
 
-        prompt_messages: list[PromptMessage] = []
+        message_files = self._get_message_files([message.id for message in messages])
+        file_extra_configs = self._get_file_extra_configs(
+            [message for message in messages if message.id in message_files]
+        )
+
+        message_prompt_messages: list[list[PromptMessage]] = []
         for message in messages:
-            files = db.session.query(MessageFile).filter(MessageFile.message_id == message.id).all()
+            user_prompt_message: PromptMessage = UserPromptMessage(content=message.query)
+            files = message_files.get(message.id)
             if files:
-                file_extra_config = None
-                if self.conversation.mode not in {AppMode.ADVANCED_CHAT, AppMode.WORKFLOW}:
-                    file_extra_config = FileUploadConfigManager.convert(self.conversation.model_config)
-                else:
-                    if message.workflow_run_id:
-                        workflow_run = (
-                            db.session.query(WorkflowRun).filter(WorkflowRun.id == message.workflow_run_id).first()
-                        )
-
-                        if workflow_run and workflow_run.workflow:
-                            file_extra_config = FileUploadConfigManager.convert(
-                                workflow_run.workflow.features_dict, is_vision=False
-                            )
-
+                file_extra_config = file_extra_configs.get(message.id)
                 detail = ImagePromptMessageContent.DETAIL.LOW
                 if file_extra_config and app_record:
                     file_objs = file_factory.build_from_message_files(
@@ -96,9 +96,7 @@ class TokenBufferMemory:
                 else:
                     file_objs = []
 
-                if not file_objs:
-                    prompt_messages.append(UserPromptMessage(content=message.query))
-                else:
+                if file_objs:
                     prompt_message_contents: list[PromptMessageContent] = []
                     prompt_message_contents.append(TextPromptMessageContent(data=message.query))
                     for file in file_objs:
@@ -108,27 +106,130 @@ class TokenBufferMemory:
                         )
                         prompt_message_contents.append(prompt_message)
 
-                    prompt_messages.append(UserPromptMessage(content=prompt_message_contents))
-
-            else:
-                prompt_messages.append(UserPromptMessage(content=message.query))
+                    user_prompt_message = UserPromptMessage(content=prompt_message_contents)
 
-            prompt_messages.append(AssistantPromptMessage(content=message.answer))
+            message_prompt_messages.append([user_prompt_message, AssistantPromptMessage(content=message.answer)])
 
-        if not prompt_messages:
+        if not message_prompt_messages:
             return []
 
-        # prune the chat message if it exceeds the max token limit
-        curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
+        # prune the oldest chat messages while the history exceeds the max token limit
+        message_tokens = self._get_message_tokens(
+            [message.id for message in messages], message_prompt_messages, max_token_limit
+        )
+        curr_message_tokens = sum(message_tokens)
+        start = 0
+        while curr_message_tokens > max_token_limit and start < len(message_prompt_messages) - 1:
+            curr_message_tokens -= message_tokens[start]
+            start += 1
 
+        prompt_messages = [
+            prompt_message for prompt_messages in message_prompt_messages[start:] for prompt_message in prompt_messages
+        ]
         if curr_message_tokens > max_token_limit:
-            pruned_memory = []
-            while curr_message_tokens > max_token_limit and len(prompt_messages) > 1:
-                pruned_memory.append(prompt_messages.pop(0))
-                curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
+            # only the latest chat message is left, keep its answer
+            prompt_messages.pop(0)
 
         return prompt_messages
 
+    @staticmethod
+    def _get_message_files(message_ids: list[str]) -> dict[str, list[MessageFile]]:
+        message_files: dict[str, list[MessageFile]] = {}
+        if not message_ids:
+            return message_files
+
+        files = db.session.query(MessageFile).filter(MessageFile.message_id.in_(message_ids)).all()
+        for file in files:
+            message_files.setdefault(file.message_id, []).append(file)
+        return message_files
+
+    def _get_file_extra_configs(self, messages: list) -> dict[str, Optional[FileUploadConfig]]:
+        """
+        Get the file upload config of each message, loading the workflows of all messages at once.
+        """
+        if not messages:
+            return {}
+
+        if self.conversation.mode not in {AppMode.ADVANCED_CHAT, AppMode.WORKFLOW}:
+            file_extra_config = FileUploadConfigManager.convert(self.conversation.model_config)
+            return {message.id: file_extra_config for message in messages}
+
+        workflow_run_ids = {message.workflow_run_id for message in messages if message.workflow_run_id}
+        if not workflow_run_ids:
+            return {}
+
+        workflow_ids: dict[str, str] = {
+            row.id: row.workflow_id
+            for row in db.session.query(WorkflowRun.id, WorkflowRun.workflow_id)
+            .filter(WorkflowRun.id.in_(workflow_run_ids))
+            .all()
+        }
+        workflows = (
+            db.session.query(Workflow).filter(Workflow.id.in_(set(workflow_ids.values()))).all() if workflow_ids else []
+        )
+        workflow_configs = {
+            workflow.id: FileUploadConfigManager.convert(workflow.features_dict, is_vision=False)
+            for workflow in workflows
+        }
+
+        return {
+            message.id: workflow_configs.get(workflow_ids.get(message.workflow_run_id, ""))
+            for message in messages
+            if message.workflow_run_id
+        }
+
+    def _get_message_tokens(
+        self, message_ids: list[str], message_prompt_messages: list[list[PromptMessage]], max_token_limit: int
+    ) -> list[int]:
+        """
+        Count the tokens of each chat message, counts are cached per message and model.
+
+        The messages without a cached count are counted with a single call first, they are only counted one by one
+        when the history exceeds the max token limit and has to be pruned.
+        """
+        cache_keys = [
+            f"message_tokens_{self.model_instance.provider}_{self.model_instance.model}_{message_id}"
+            for message_id in message_ids
+        ]
+        try:
+            cached_tokens = redis_client.mget(cache_keys)
+        except Exception:
+            logger.exception("Failed to get message tokens from redis")
+            cached_tokens = [None] * len(cache_keys)
+
+        message_tokens: list[Optional[int]] = [int(cached) if cached is not None else None for cached in cached_tokens]
+        uncounted = [index for index, tokens in enumerate(message_tokens) if tokens is None]
+        new_tokens: dict[str, int] = {}
+        if len(uncounted) == 1:
+            # usually the latest message, counted on its own it can be cached
+            index = uncounted[0]
+            tokens = self.model_instance.get_llm_num_tokens(message_prompt_messages[index])
+            message_tokens[index] = new_tokens[cache_keys[index]] = tokens
+        elif uncounted:
+            uncounted_tokens = self.model_instance.get_llm_num_tokens(
+                [prompt_message for index in uncounted for prompt_message in message_prompt_messages[index]]
+            )
+            counted_tokens = sum(tokens for tokens in message_tokens if tokens is not None)
+            if counted_tokens + uncounted_tokens <= max_token_limit:
+                # nothing is pruned, the uncounted messages share their total
+                message_tokens[uncounted[-1]] = uncounted_tokens
+                return [tokens or 0 for tokens in message_tokens]
+
+            for index in uncounted:
+                tokens = self.model_instance.get_llm_num_tokens(message_prompt_messages[index])
+                message_tokens[index] = new_tokens[cache_keys[index]] = tokens
+
+        if new_tokens:
+            try:
+                pipeline = redis_client.pipeline(transaction=False)
+                for cache_key, tokens in new_tokens.items():
+                    pipeline.setex(cache_key, MESSAGE_TOKENS_CACHE_TTL, tokens)
+                pipeline.execute()
+            except Exception:
+                logger.exception("Failed to add message tokens to redis")
+
+        return [tokens or 0 for tokens in message_tokens]
+
     def get_history_prompt_text(
         self,
         human_prefix: str = "Human",
@@ -632,6 +632,8 @@ class TraceTask:
             "workflow_run_id": message_data.workflow_run_id,
             "from_source": message_data.from_source,
         }
+        if kwargs.get("dataset_timings"):
+            metadata["dataset_timings"] = kwargs["dataset_timings"]
 
         dataset_retrieval_trace_info = DatasetRetrievalTraceInfo(
             message_id=message_id,
@@ -1,11 +1,13 @@
 import inspect
 import json
 import logging
-from collections.abc import Callable, Generator
+from collections.abc import AsyncGenerator, Callable, Generator
 from typing import TypeVar
 
+import httpx
 import requests
 from pydantic import BaseModel
+from urllib3.exceptions import EmptyPoolError
 from yarl import URL
 
 from configs import dify_config
@@ -28,6 +30,7 @@ from core.plugin.manager.exc import (
     PluginPermissionDeniedError,
     PluginUniqueIdentifierError,
 )
+from core.plugin.manager.http_client import get_plugin_daemon_async_client, get_plugin_daemon_session
 
 plugin_daemon_inner_api_baseurl = dify_config.PLUGIN_DAEMON_URL
 plugin_daemon_inner_api_key = dify_config.PLUGIN_DAEMON_KEY
@@ -51,6 +54,21 @@ class BasePluginManager:
         """
         Make a request to the plugin daemon inner API.
         """
+        url, headers, data = self._prepare_request(path, headers, data)
+
+        try:
+            response = get_plugin_daemon_session().request(
+                method=method, url=url, headers=headers, data=data, params=params, stream=stream, files=files
+            )
+        except (requests.exceptions.ConnectionError, EmptyPoolError):
+            logger.exception("Request to Plugin Daemon Service failed")
+            raise PluginDaemonInnerError(code=-500, message="Request to Plugin Daemon Service failed")
+
+        return response
+
+    def _prepare_request(
+        self, path: str, headers: dict | None, data: bytes | dict | str | None
+    ) -> tuple[str, dict, bytes | dict | str | None]:
         url = URL(str(plugin_daemon_inner_api_baseurl)) / path
         headers = headers or {}
         headers["X-Api-Key"] = plugin_daemon_inner_api_key
@@ -59,15 +77,7 @@ class BasePluginManager:
         if headers.get("Content-Type") == "application/json" and isinstance(data, dict):
             data = json.dumps(data)
 
-        try:
-            response = requests.request(
-                method=method, url=str(url), headers=headers, data=data, params=params, stream=stream, files=files
-            )
-        except requests.exceptions.ConnectionError:
-            logger.exception("Request to Plugin Daemon Service failed")
-            raise PluginDaemonInnerError(code=-500, message="Request to Plugin Daemon Service failed")
-
-        return response
+        return str(url), headers, data
 
     def _stream_request(
         self,
@@ -82,12 +92,72 @@ class BasePluginManager:
         Make a stream request to the plugin daemon inner API
         """
         response = self._request(method, path, headers, data, params, files, stream=True)
-        for line in response.iter_lines():
-            line = line.decode("utf-8").strip()
-            if line.startswith("data:"):
-                line = line[5:].strip()
-            if line:
-                yield line
+        # the connection goes back to the shared pool once closed, also when the consumer stops early
+        try:
+            for line in response.iter_lines():
+                line = line.decode("utf-8").strip()
+                if line.startswith("data:"):
+                    line = line[5:].strip()
+                if line:
+                    yield line
+        finally:
+            response.close()
+
+    async def _astream_request(
+        self,
+        method: str,
+        path: str,
+        params: dict | None = None,
+        headers: dict | None = None,
+        data: bytes | dict | None = None,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Make a stream request to the plugin daemon inner API with the pooled async client
+        """
+        url, headers, request_data = self._prepare_request(path, headers, data)
+        # the async client does not advertise brotli, httpx only decodes it with an optional package
+        headers["Accept-Encoding"] = "gzip, deflate"
+        content = request_data.encode("utf-8") if isinstance(request_data, str) else request_data
+
+        client = get_plugin_daemon_async_client()
+        try:
+            # the response is closed on leaving the block, also when the consumer stops early
+            async with client.stream(
+                method,
+                url,
+                headers=headers,
+                params=params,
+                content=content if not isinstance(content, dict) else None,
+                data=content if isinstance(content, dict) else None,
+            ) as response:
+                async for line in response.aiter_lines():
+                    line = line.strip()
+                    if line.startswith("data:"):
+                        line = line[5:].strip()
+                    if line:
+                        yield line
+        except (httpx.ConnectError, httpx.PoolTimeout):
+            logger.exception("Request to Plugin Daemon Service failed")
+            raise PluginDaemonInnerError(code=-500, message="Request to Plugin Daemon Service failed")
+
+    async def _astream_request_with_model(
+        self,
+        method: str,
+        path: str,
+        type: type[T],
+        headers: dict | None = None,
+        data: bytes | dict | None = None,
+        params: dict | None = None,
+    ) -> AsyncGenerator[T, None]:
+        """
+        Make an async stream request to the plugin daemon inner API and yield the response as a model.
+        """
+        lines = self._astream_request(method, path, params, headers, data)
+        try:
+            async for line in lines:
+                yield type(**json.loads(line))  # type: ignore
+        finally:
+            await lines.aclose()
 
     def _stream_request_with_model(
         self,
@@ -102,8 +172,12 @@ class BasePluginManager:
         """
         Make a stream request to the plugin daemon inner API and yield the response as a model.
         """
-        for line in self._stream_request(method, path, params, headers, data, files):
-            yield type(**json.loads(line))  # type: ignore
+        lines = self._stream_request(method, path, params, headers, data, files)
+        try:
+            for line in lines:
+                yield type(**json.loads(line))  # type: ignore
+        finally:
+            lines.close()
 
     def _request_with_model(
         self,
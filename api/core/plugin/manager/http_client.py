@@ -0,0 +1,150 @@
+import asyncio
+import bisect
+import logging
+import os
+import threading
+import time
+import weakref
+from typing import Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from configs import dify_config
+
+logger = logging.getLogger(__name__)
+
+# pool waits longer than this are logged, they mean the pool is too small for the load
+SLOW_POOL_WAIT_SECONDS = 1.0
+
+
+class PluginDaemonPoolMetrics:
+    """
+    Process-wide counters and a histogram of how long requests waited for a pooled plugin daemon connection.
+    """
+
+    # upper bounds in seconds of the wait histogram buckets, the last bucket takes the longer waits
+    WAIT_BUCKETS = (0.001, 0.01, 0.1, SLOW_POOL_WAIT_SECONDS, 10.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.slow_waits = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+            self.wait_histogram = [0] * (len(self.WAIT_BUCKETS) + 1)
+
+    def record(self, wait: float) -> None:
+        with self._lock:
+            self.requests += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.wait_histogram[bisect.bisect_left(self.WAIT_BUCKETS, wait)] += 1
+            if wait >= SLOW_POOL_WAIT_SECONDS:
+                self.slow_waits += 1
+        if wait >= SLOW_POOL_WAIT_SECONDS:
+            logger.warning(
+                f"Waited {wait:.2f}s for a plugin daemon connection, consider raising the pool size, "
+                f"pool waits: {self.snapshot()}"
+            )
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "slow_waits": self.slow_waits,
+                "avg_wait": self.total_wait / self.requests if self.requests else 0.0,
+                "max_wait": self.max_wait,
+                "wait_histogram": {
+                    f"le_{bound}" if bound is not None else "inf": count
+                    for bound, count in zip((*self.WAIT_BUCKETS, None), self.wait_histogram)
+                },
+            }
+
+
+plugin_daemon_pool_metrics = PluginDaemonPoolMetrics()
+
+
+class _InstrumentedPoolMixin:
+    def _get_conn(self, timeout: Optional[float] = None):
+        start = time.perf_counter()
+        try:
+            return super()._get_conn(  # type: ignore[misc]
+                timeout=timeout if timeout is not None else dify_config.PLUGIN_DAEMON_POOL_TIMEOUT
+            )
+        finally:
+            plugin_daemon_pool_metrics.record(time.perf_counter() - start)
+
+
+class _InstrumentedHTTPConnectionPool(_InstrumentedPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _InstrumentedHTTPSConnectionPool(_InstrumentedPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class _PluginDaemonHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _InstrumentedHTTPConnectionPool,
+            "https": _InstrumentedHTTPSConnectionPool,
+        }
+
+
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+
+def get_plugin_daemon_session() -> requests.Session:
+    """
+    Get the per-process session used for plugin daemon calls, connections are kept alive and reused.
+    A forked process builds its own session instead of sharing the parent's sockets.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            adapter = _PluginDaemonHTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=dify_config.PLUGIN_DAEMON_MAX_CONNECTIONS,
+                pool_block=dify_config.PLUGIN_DAEMON_POOL_BLOCK,
+            )
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session, _session_pid = session, pid
+    return _session
+
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_plugin_daemon_async_client() -> httpx.AsyncClient:
+    """
+    Get the pooled async client used for plugin daemon calls from the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=dify_config.PLUGIN_DAEMON_MAX_CONNECTIONS,
+                max_keepalive_connections=dify_config.PLUGIN_DAEMON_MAX_CONNECTIONS,
+                keepalive_expiry=dify_config.PLUGIN_DAEMON_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(None, pool=dify_config.PLUGIN_DAEMON_POOL_TIMEOUT),
+        )
+        _async_clients[loop] = client
+    return client
@@ -22,6 +22,8 @@ from core.entities.provider_entities import (
 from core.helper import encrypter
 from core.helper.model_provider_cache import ProviderCredentialsCache, ProviderCredentialsCacheType
 from core.helper.position_helper import is_filtered
+from core.helper.provider_configurations_cache import provider_configurations_cache
+from core.helper.provider_quota_ledger import provider_quota_ledger
 from core.model_runtime.entities.model_entities import ModelType
 from core.model_runtime.entities.provider_entities import (
     ConfigurateMethod,
@@ -92,6 +94,15 @@ class ProviderManager:
         :param tenant_id:
         :return:
         """
+        return provider_configurations_cache.get(tenant_id, self._build_configurations)
+
+    def _build_configurations(self, tenant_id: str) -> ProviderConfigurations:
+        """
+        Build model provider configurations from the records of the workspace.
+
+        :param tenant_id: workspace id
+        :return:
+        """
         # Get all provider records of the workspace
         provider_name_to_provider_records_dict = self._get_all_providers(tenant_id)
 
@@ -728,6 +739,10 @@ class ProviderManager:
             quota_type_to_provider_records_dict[ProviderQuotaType.value_of(provider_record.quota_type)] = (
                 provider_record
             )
+        # usage not yet written to the provider records
+        pending_quota_usage = provider_quota_ledger.get_pending_usage(
+            list(quota_type_to_provider_records_dict.values())
+        )
         quota_configurations = []
         for provider_quota in provider_hosting_configuration.quotas:
             if provider_quota.quota_type not in quota_type_to_provider_records_dict:
@@ -744,14 +759,16 @@ class ProviderManager:
                     continue
             else:
                 provider_record = quota_type_to_provider_records_dict[provider_quota.quota_type]
+                pending_quota_used = pending_quota_usage.get(provider_record.id, 0)
+                quota_used = provider_record.quota_used + pending_quota_used
 
                 quota_configuration = QuotaConfiguration(
                     quota_type=provider_quota.quota_type,
                     quota_unit=provider_hosting_configuration.quota_unit or QuotaUnit.TOKENS,
-                    quota_used=provider_record.quota_used,
+                    quota_used=quota_used,
+                    pending_quota_used=pending_quota_used,
                     quota_limit=provider_record.quota_limit,
-                    is_valid=provider_record.quota_limit > provider_record.quota_used
-                    or provider_record.quota_limit == -1,
+                    is_valid=provider_record.quota_limit > quota_used or provider_record.quota_limit == -1,
                     restrict_models=provider_quota.restrict_models,
                 )
 
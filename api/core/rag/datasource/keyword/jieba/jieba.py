@@ -1,17 +1,21 @@
 import json
-from collections import defaultdict
-from typing import Any, Optional
+from typing import Any, Optional, cast
 
 from pydantic import BaseModel
+from sqlalchemy import func
 
 from configs import dify_config
 from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
+from core.rag.datasource.keyword.jieba.keyword_index_cache import KeywordIndex, keyword_index_cache
 from core.rag.datasource.keyword.keyword_base import BaseKeyword
 from core.rag.models.document import Document
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
 from extensions.ext_storage import storage
-from models.dataset import Dataset, DatasetKeywordTable, DocumentSegment
+from models.dataset import Dataset, DatasetKeywordTable, DatasetKeywordTableLog, DocumentSegment
+
+# seconds between two compaction attempts of a dataset keyword table
+KEYWORD_TABLE_COMPACTION_INTERVAL = 60
 
 
 class KeywordTableConfig(BaseModel):
@@ -24,82 +28,66 @@ class Jieba(BaseKeyword):
         self._config = KeywordTableConfig()
 
     def create(self, texts: list[Document], **kwargs) -> BaseKeyword:
-        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
-        with redis_client.lock(lock_name, timeout=600):
-            keyword_table_handler = JiebaKeywordTableHandler()
-            keyword_table = self._get_dataset_keyword_table()
-            for text in texts:
-                keywords = keyword_table_handler.extract_keywords(
-                    text.page_content, self._config.max_keywords_per_chunk
-                )
-                if text.metadata is not None:
-                    self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
-                    keyword_table = self._add_text_to_keyword_table(
-                        keyword_table or {}, text.metadata["doc_id"], list(keywords)
-                    )
+        keyword_table_handler = JiebaKeywordTableHandler()
+        added_keywords = []
+        for text in texts:
+            keywords = keyword_table_handler.extract_keywords(text.page_content, self._config.max_keywords_per_chunk)
+            if text.metadata is not None:
+                self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
+                added_keywords.append((text.metadata["doc_id"], list(keywords)))
 
-            self._save_dataset_keyword_table(keyword_table)
+        self._append_keyword_table_logs(added_keywords=added_keywords)
 
-            return self
+        return self
 
     def add_texts(self, texts: list[Document], **kwargs):
-        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
-        with redis_client.lock(lock_name, timeout=600):
-            keyword_table_handler = JiebaKeywordTableHandler()
-
-            keyword_table = self._get_dataset_keyword_table()
-            keywords_list = kwargs.get("keywords_list")
-            for i in range(len(texts)):
-                text = texts[i]
-                if keywords_list:
-                    keywords = keywords_list[i]
-                    if not keywords:
-                        keywords = keyword_table_handler.extract_keywords(
-                            text.page_content, self._config.max_keywords_per_chunk
-                        )
-                else:
+        keyword_table_handler = JiebaKeywordTableHandler()
+
+        added_keywords = []
+        keywords_list = kwargs.get("keywords_list")
+        for i in range(len(texts)):
+            text = texts[i]
+            if keywords_list:
+                keywords = keywords_list[i]
+                if not keywords:
                     keywords = keyword_table_handler.extract_keywords(
                         text.page_content, self._config.max_keywords_per_chunk
                     )
-                if text.metadata is not None:
-                    self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
-                    keyword_table = self._add_text_to_keyword_table(
-                        keyword_table or {}, text.metadata["doc_id"], list(keywords)
-                    )
+            else:
+                keywords = keyword_table_handler.extract_keywords(
+                    text.page_content, self._config.max_keywords_per_chunk
+                )
+            if text.metadata is not None:
+                self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
+                added_keywords.append((text.metadata["doc_id"], list(keywords)))
 
-            self._save_dataset_keyword_table(keyword_table)
+        self._append_keyword_table_logs(added_keywords=added_keywords)
 
     def text_exists(self, id: str) -> bool:
-        keyword_table = self._get_dataset_keyword_table()
-        if keyword_table is None:
-            return False
-        return id in set.union(*keyword_table.values())
+        return id in self._get_keyword_index()
 
     def delete_by_ids(self, ids: list[str]) -> None:
-        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
-        with redis_client.lock(lock_name, timeout=600):
-            keyword_table = self._get_dataset_keyword_table()
-            if keyword_table is not None:
-                keyword_table = self._delete_ids_from_keyword_table(keyword_table, ids)
-
-            self._save_dataset_keyword_table(keyword_table)
+        self._append_keyword_table_logs(deleted_ids=ids)
 
     def search(self, query: str, **kwargs: Any) -> list[Document]:
-        keyword_table = self._get_dataset_keyword_table()
+        keyword_index = self._get_keyword_index()
 
         k = kwargs.get("top_k", 4)
         document_ids_filter = kwargs.get("document_ids_filter")
-        sorted_chunk_indices = self._retrieve_ids_by_query(keyword_table or {}, query, k)
+        sorted_chunk_indices = self._retrieve_ids_by_query(keyword_index, query, k)
+        if not sorted_chunk_indices:
+            return []
+
+        segment_query = db.session.query(DocumentSegment).filter(
+            DocumentSegment.dataset_id == self.dataset.id, DocumentSegment.index_node_id.in_(sorted_chunk_indices)
+        )
+        if document_ids_filter:
+            segment_query = segment_query.filter(DocumentSegment.document_id.in_(document_ids_filter))
+        segments = {segment.index_node_id: segment for segment in segment_query.all()}
 
         documents = []
         for chunk_index in sorted_chunk_indices:
-            segment_query = db.session.query(DocumentSegment).filter(
-                DocumentSegment.dataset_id == self.dataset.id, DocumentSegment.index_node_id == chunk_index
-            )
-            if document_ids_filter:
-                segment_query = segment_query.filter(DocumentSegment.document_id.in_(document_ids_filter))
-            segment = segment_query.first()
-
+            segment = segments.get(chunk_index)
             if segment:
                 documents.append(
                     Document(
@@ -121,15 +109,141 @@ class Jieba(BaseKeyword):
             dataset_keyword_table = self.dataset.dataset_keyword_table
             if dataset_keyword_table:
                 db.session.delete(dataset_keyword_table)
+                db.session.query(DatasetKeywordTableLog).filter(
+                    DatasetKeywordTableLog.dataset_id == self.dataset.id
+                ).delete()
                 db.session.commit()
                 if dataset_keyword_table.data_source_type != "database":
                     file_key = "keyword_files/" + self.dataset.tenant_id + "/" + self.dataset.id + ".txt"
                     storage.delete(file_key)
+                redis_client.delete(self._pending_logs_key())
+                keyword_index_cache.delete_version(self.dataset.id)
+
+    def _append_keyword_table_logs(
+        self,
+        added_keywords: Optional[list[tuple[str, list[str]]]] = None,
+        deleted_ids: Optional[list[str]] = None,
+    ) -> None:
+        """
+        Record keyword table changes as log rows instead of rewriting the whole table.
+        The cost of a write only depends on the nodes it touches. Only the first write of a dataset
+        takes the dataset lock, to create its keyword table.
+        """
+        logs = [
+            DatasetKeywordTableLog(dataset_id=self.dataset.id, node_id=node_id, action="delete")
+            for node_id in deleted_ids or []
+        ]
+        logs.extend(
+            DatasetKeywordTableLog(dataset_id=self.dataset.id, node_id=node_id, action="add", keywords=keywords)
+            for node_id, keywords in added_keywords or []
+        )
+        if not logs:
+            return
+
+        if not self._dataset_keyword_table_exists():
+            self._create_dataset_keyword_table()
+        # held from before the log ids are allocated until they are committed, see compact_keyword_table
+        self._lock_keyword_table_logs(shared=True)
+        db.session.add_all(logs)
+        db.session.commit()
+        keyword_index_cache.bump_version(self.dataset.id)
+
+        pending_logs = redis_client.incrby(self._pending_logs_key(), len(logs))
+        # compaction is queued at most once per interval for each dataset
+        if pending_logs >= dify_config.KEYWORD_TABLE_COMPACTION_THRESHOLD and redis_client.set(
+            "keyword_table_compaction_{}".format(self.dataset.id), 1, ex=KEYWORD_TABLE_COMPACTION_INTERVAL, nx=True
+        ):
+            from tasks.compact_keyword_table_task import compact_keyword_table_task
+
+            compact_keyword_table_task.delay(self.dataset.id)
+
+    def compact_keyword_table(self) -> None:
+        """
+        Fold the logged changes into the stored keyword table.
+
+        Runs in compact_keyword_table_task, outside of the indexing path. A compaction already holding
+        the dataset lock makes this one skip instead of waiting for it. The table records the highest
+        folded log id, readers replay the logs above it. Logs are pruned one compaction late, so readers
+        that loaded the previous table can still replay them.
+        """
+        lock = redis_client.lock("keyword_indexing_lock_{}".format(self.dataset.id), timeout=600)
+        if not lock.acquire(blocking=False):
+            return
+        try:
+            dataset_keyword_table = self.dataset.dataset_keyword_table
+            if not dataset_keyword_table:
+                return
+            # granted once the writes holding the shared lock have committed, every log id allocated
+            # so far is visible then, and the logs written after the commit get higher ids
+            self._lock_keyword_table_logs(shared=False)
+            max_log_id = self._get_max_keyword_table_log_id()
+            db.session.commit()
+
+            keyword_table, previous_max_log_id = self._load_keyword_table_snapshot(dataset_keyword_table)
+            if max_log_id is None or max_log_id <= previous_max_log_id:
+                return
+            logs = self._get_unapplied_keyword_table_logs(previous_max_log_id, max_log_id)
+            if not logs:
+                return
+
+            keyword_table = self._apply_keyword_table_logs(keyword_table, logs)
+            # pruned in the transaction that saves a database table, and before a file is written, so a pruned
+            # log is never folded twice
+            db.session.query(DatasetKeywordTableLog).filter(
+                DatasetKeywordTableLog.dataset_id == self.dataset.id,
+                DatasetKeywordTableLog.id <= previous_max_log_id,
+            ).delete(synchronize_session=False)
+            self._save_dataset_keyword_table(keyword_table, max_log_id=max_log_id)
+            db.session.commit()
+            redis_client.decrby(self._pending_logs_key(), len(logs))
+        finally:
+            lock.release()
+
+    def _pending_logs_key(self) -> str:
+        return "keyword_table_pending_logs_{}".format(self.dataset.id)
+
+    def _lock_keyword_table_logs(self, shared: bool) -> None:
+        """Take the transaction-level advisory lock of the dataset keyword table logs."""
+        lock_key = func.hashtext("keyword_table_logs_{}".format(self.dataset.id))
+        if shared:
+            db.session.execute(func.pg_advisory_xact_lock_shared(lock_key).select())
+        else:
+            db.session.execute(func.pg_advisory_xact_lock(lock_key).select())
+
+    def _get_max_keyword_table_log_id(self) -> Optional[int]:
+        max_log_id = (
+            db.session.query(func.max(DatasetKeywordTableLog.id))
+            .filter(DatasetKeywordTableLog.dataset_id == self.dataset.id)
+            .scalar()
+        )
+        return cast(Optional[int], max_log_id)
 
-    def _save_dataset_keyword_table(self, keyword_table):
+    def _dataset_keyword_table_exists(self) -> bool:
+        # only the id is loaded, not the keyword table
+        return (
+            db.session.query(DatasetKeywordTable.id).filter(DatasetKeywordTable.dataset_id == self.dataset.id).first()
+            is not None
+        )
+
+    def _get_unapplied_keyword_table_logs(
+        self, applied_max_log_id: int, max_log_id: Optional[int] = None
+    ) -> list[DatasetKeywordTableLog]:
+        log_query = db.session.query(DatasetKeywordTableLog).filter(
+            DatasetKeywordTableLog.dataset_id == self.dataset.id, DatasetKeywordTableLog.id > applied_max_log_id
+        )
+        if max_log_id is not None:
+            log_query = log_query.filter(DatasetKeywordTableLog.id <= max_log_id)
+        return log_query.order_by(DatasetKeywordTableLog.id).all()
+
+    def _save_dataset_keyword_table(self, keyword_table, max_log_id: int = 0):
         keyword_table_dict = {
             "__type__": "keyword_table",
-            "__data__": {"index_id": self.dataset.id, "summary": None, "table": keyword_table},
+            "__data__": {
+                "index_id": self.dataset.id,
+                "summary": None,
+                "table": keyword_table,
+                "max_log_id": max_log_id,
+            },
         }
         dataset_keyword_table = self.dataset.dataset_keyword_table
         keyword_data_source_type = dataset_keyword_table.data_source_type
@@ -137,18 +251,40 @@ class Jieba(BaseKeyword):
             dataset_keyword_table.keyword_table = json.dumps(keyword_table_dict, cls=SetEncoder)
             db.session.commit()
         else:
+            # the pruned logs are committed first, a failed commit leaves the previous file and its logs in place
+            db.session.commit()
             file_key = "keyword_files/" + self.dataset.tenant_id + "/" + self.dataset.id + ".txt"
             if storage.exists(file_key):
                 storage.delete(file_key)
             storage.save(file_key, json.dumps(keyword_table_dict, cls=SetEncoder).encode("utf-8"))
 
+    def _get_keyword_index(self) -> KeywordIndex:
+        """Get the inverted index of the dataset keyword table, rebuilt only after the table changed."""
+        version = keyword_index_cache.get_version(self.dataset.id)
+        keyword_index = keyword_index_cache.get(self.dataset.id, version)
+        if keyword_index is None:
+            keyword_index = KeywordIndex(self._get_dataset_keyword_table() or {})
+            keyword_index_cache.put(self.dataset.id, version, keyword_index)
+        return keyword_index
+
     def _get_dataset_keyword_table(self) -> Optional[dict]:
         dataset_keyword_table = self.dataset.dataset_keyword_table
         if dataset_keyword_table:
-            keyword_table_dict = dataset_keyword_table.keyword_table_dict
-            if keyword_table_dict:
-                return dict(keyword_table_dict["__data__"]["table"])
+            keyword_table, applied_max_log_id = self._load_keyword_table_snapshot(dataset_keyword_table)
+            logs = self._get_unapplied_keyword_table_logs(applied_max_log_id)
+            return self._apply_keyword_table_logs(keyword_table, logs)
         else:
+            self._create_dataset_keyword_table()
+
+        return {}
+
+    def _create_dataset_keyword_table(self) -> None:
+        # the table is unique per dataset, concurrent first indexings of the dataset create it once
+        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
+        with redis_client.lock(lock_name, timeout=600):
+            if self._dataset_keyword_table_exists():
+                return
+
             keyword_data_source_type = dify_config.KEYWORD_DATA_SOURCE_TYPE
             dataset_keyword_table = DatasetKeywordTable(
                 dataset_id=self.dataset.id,
@@ -166,7 +302,28 @@ class Jieba(BaseKeyword):
             db.session.add(dataset_keyword_table)
             db.session.commit()
 
-        return {}
+    @staticmethod
+    def _load_keyword_table_snapshot(dataset_keyword_table: DatasetKeywordTable) -> tuple[dict, int]:
+        """Get the stored keyword table and the highest id of the logs folded into it."""
+        keyword_table_dict = dataset_keyword_table.keyword_table_dict
+        if not keyword_table_dict:
+            return {}, 0
+        return dict(keyword_table_dict["__data__"]["table"]), int(keyword_table_dict["__data__"].get("max_log_id", 0))
+
+    def _apply_keyword_table_logs(self, keyword_table: dict, logs: list[DatasetKeywordTableLog]) -> dict:
+        deleted_ids: list[str] = []
+        for log in logs:
+            if log.action == "delete":
+                deleted_ids.append(log.node_id)
+                continue
+            # consecutive deletes are applied in one pass over the table
+            if deleted_ids:
+                keyword_table = self._delete_ids_from_keyword_table(keyword_table, deleted_ids)
+                deleted_ids = []
+            keyword_table = self._add_text_to_keyword_table(keyword_table, log.node_id, log.keywords or [])
+        if deleted_ids:
+            keyword_table = self._delete_ids_from_keyword_table(keyword_table, deleted_ids)
+        return keyword_table
 
     def _add_text_to_keyword_table(self, keyword_table: dict, id: str, keywords: list[str]) -> dict:
         for keyword in keywords:
@@ -192,24 +349,12 @@ class Jieba(BaseKeyword):
 
         return keyword_table
 
-    def _retrieve_ids_by_query(self, keyword_table: dict, query: str, k: int = 4):
+    def _retrieve_ids_by_query(self, keyword_index: KeywordIndex, query: str, k: int = 4) -> list[str]:
         keyword_table_handler = JiebaKeywordTableHandler()
         keywords = keyword_table_handler.extract_keywords(query)
 
         # go through text chunks in order of most matching keywords
-        chunk_indices_count: dict[str, int] = defaultdict(int)
-        keywords_list = [keyword for keyword in keywords if keyword in set(keyword_table.keys())]
-        for keyword in keywords_list:
-            for node_id in keyword_table[keyword]:
-                chunk_indices_count[node_id] += 1
-
-        sorted_chunk_indices = sorted(
-            chunk_indices_count.keys(),
-            key=lambda x: chunk_indices_count[x],
-            reverse=True,
-        )
-
-        return sorted_chunk_indices[:k]
+        return keyword_index.retrieve_ids(keywords, k)
 
     def _update_segment_keywords(self, dataset_id: str, node_id: str, keywords: list[str]):
         document_segment = (
@@ -223,33 +368,25 @@ class Jieba(BaseKeyword):
             db.session.commit()
 
     def create_segment_keywords(self, node_id: str, keywords: list[str]):
-        keyword_table = self._get_dataset_keyword_table()
         self._update_segment_keywords(self.dataset.id, node_id, keywords)
-        keyword_table = self._add_text_to_keyword_table(keyword_table or {}, node_id, keywords)
-        self._save_dataset_keyword_table(keyword_table)
+        self._append_keyword_table_logs(added_keywords=[(node_id, keywords)])
 
     def multi_create_segment_keywords(self, pre_segment_data_list: list):
         keyword_table_handler = JiebaKeywordTableHandler()
-        keyword_table = self._get_dataset_keyword_table()
+        added_keywords = []
         for pre_segment_data in pre_segment_data_list:
             segment = pre_segment_data["segment"]
             if pre_segment_data["keywords"]:
                 segment.keywords = pre_segment_data["keywords"]
-                keyword_table = self._add_text_to_keyword_table(
-                    keyword_table or {}, segment.index_node_id, pre_segment_data["keywords"]
-                )
+                added_keywords.append((segment.index_node_id, pre_segment_data["keywords"]))
             else:
                 keywords = keyword_table_handler.extract_keywords(segment.content, self._config.max_keywords_per_chunk)
                 segment.keywords = list(keywords)
-                keyword_table = self._add_text_to_keyword_table(
-                    keyword_table or {}, segment.index_node_id, list(keywords)
-                )
-        self._save_dataset_keyword_table(keyword_table)
+                added_keywords.append((segment.index_node_id, list(keywords)))
+        self._append_keyword_table_logs(added_keywords=added_keywords)
 
     def update_segment_keywords_index(self, node_id: str, keywords: list[str]):
-        keyword_table = self._get_dataset_keyword_table()
-        keyword_table = self._add_text_to_keyword_table(keyword_table or {}, node_id, keywords)
-        self._save_dataset_keyword_table(keyword_table)
+        self._append_keyword_table_logs(added_keywords=[(node_id, keywords)])
 
 
 class SetEncoder(json.JSONEncoder):
@@ -0,0 +1,99 @@
+import threading
+import uuid
+from typing import Optional, cast
+
+import numpy as np
+
+from configs import dify_config
+from core.helper.lru_cache import LRUCache
+from extensions.ext_redis import redis_client
+
+
+class KeywordIndex:
+    """
+    Immutable inverted index built from a dataset keyword table.
+
+    Node ids are coded as integers and every keyword maps to a sorted int32 posting list,
+    so a query only touches the postings of its own keywords.
+    """
+
+    def __init__(self, keyword_table: dict[str, set[str]]):
+        node_codes: dict[str, int] = {}
+        postings: dict[str, np.ndarray] = {}
+        for keyword, node_ids in keyword_table.items():
+            codes = [node_codes.setdefault(node_id, len(node_codes)) for node_id in node_ids]
+            postings[keyword] = np.unique(np.asarray(codes, dtype=np.int32))
+        self._node_codes = node_codes
+        self._node_ids = list(node_codes)
+        self._postings = postings
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._node_codes
+
+    def __len__(self) -> int:
+        return len(self._node_ids)
+
+    def retrieve_ids(self, keywords: set[str], k: int) -> list[str]:
+        """
+        Return the ids of the nodes matching the most keywords, best first.
+        Ties are broken by the order nodes were first seen in the keyword table.
+        """
+        matched = [self._postings[keyword] for keyword in keywords if keyword in self._postings]
+        if not matched or k <= 0:
+            return []
+
+        counts = np.bincount(np.concatenate(matched), minlength=len(self._node_ids))
+        candidates = np.flatnonzero(counts)
+        # stable sort on negated counts keeps ascending node codes among equal counts
+        ranked = candidates[np.argsort(-counts[candidates], kind="stable")][:k]
+        return [self._node_ids[code] for code in ranked]
+
+
+class KeywordIndexCache:
+    """
+    Per-process cache of keyword indexes keyed by dataset id.
+
+    Every write to a dataset keyword table replaces a random version token in redis, a cached
+    index is only served while its version still matches the token. Tokens expire after
+    KEYWORD_INDEX_VERSION_TTL seconds, an expired token is replaced by a new one, so indexes
+    cached under it are rebuilt.
+    """
+
+    def __init__(self, capacity: int):
+        self._cache = LRUCache(capacity)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _version_key(dataset_id: str) -> str:
+        return f"keyword_table_version_{dataset_id}"
+
+    def get_version(self, dataset_id: str) -> Optional[bytes]:
+        version_key = self._version_key(dataset_id)
+        version = redis_client.get(version_key)
+        if version is None:
+            redis_client.set(version_key, uuid.uuid4().hex, ex=dify_config.KEYWORD_INDEX_VERSION_TTL, nx=True)
+            version = redis_client.get(version_key)
+        return cast(Optional[bytes], version)
+
+    def bump_version(self, dataset_id: str) -> None:
+        redis_client.set(self._version_key(dataset_id), uuid.uuid4().hex, ex=dify_config.KEYWORD_INDEX_VERSION_TTL)
+
+    def delete_version(self, dataset_id: str) -> None:
+        redis_client.delete(self._version_key(dataset_id))
+
+    def get(self, dataset_id: str, version: Optional[bytes]) -> Optional[KeywordIndex]:
+        with self._lock:
+            cached = self._cache.get(dataset_id)
+        if cached is None:
+            return None
+        cached_version, index = cached
+        return index if cached_version == version else None
+
+    def put(self, dataset_id: str, version: Optional[bytes], index: KeywordIndex) -> None:
+        if self._cache.capacity <= 0:
+            return
+        with self._lock:
+            self._cache.put(dataset_id, (version, index))
+
+
+keyword_index_cache = KeywordIndexCache(dify_config.KEYWORD_INDEX_CACHE_SIZE)
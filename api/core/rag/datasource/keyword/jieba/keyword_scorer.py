@@ -0,0 +1,89 @@
+import math
+import threading
+from typing import Optional, cast
+
+import numpy as np
+
+from configs import dify_config
+from core.helper.lru_cache import LRUCache
+from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
+from core.rag.models.document import Document
+
+
+class KeywordScorer:
+    """
+    TF-IDF cosine scorer for ranking retrieved documents against a query.
+
+    All candidates of a request are scored together: their keywords form a document-term
+    matrix, so the IDF and every cosine similarity come out of a few array operations.
+    Keywords extracted from a segment are cached by its `doc_hash` (the segment's
+    index_node_hash), so the same segment is not re-tokenized on every query.
+    """
+
+    _keywords_cache = LRUCache(dify_config.KEYWORD_SCORE_CACHE_SIZE)
+    _keywords_cache_lock = threading.Lock()
+
+    def __init__(self):
+        self._keyword_table_handler = JiebaKeywordTableHandler()
+
+    def score(self, query: str, documents: list[Document]) -> list[float]:
+        """
+        Score documents by TF-IDF cosine similarity with the query,
+        documents without metadata are not scored.
+        """
+        query_keywords = self._keyword_table_handler.extract_keywords(query, None)
+        documents_keywords = []
+        for document in documents:
+            if document.metadata is not None:
+                # get the document keywords
+                document_keywords = self._get_document_keywords(document)
+                document.metadata["keywords"] = document_keywords
+                documents_keywords.append(document_keywords)
+
+        if not documents_keywords:
+            return []
+
+        vocabulary: dict[str, int] = {}
+        rows = []
+        columns = []
+        for row, document_keywords in enumerate(documents_keywords):
+            for keyword in document_keywords:
+                rows.append(row)
+                columns.append(vocabulary.setdefault(keyword, len(vocabulary)))
+
+        # keywords are sets, so every term frequency is 1
+        document_term_matrix = np.zeros((len(documents_keywords), len(vocabulary)), dtype=np.float64)
+        document_term_matrix[rows, columns] = 1.0
+
+        # IDF with the same smoothing as before, over the total number of documents
+        total_documents = len(documents)
+        doc_count_containing_keyword = document_term_matrix.sum(axis=0)
+        keyword_idf = np.log((1 + total_documents) / (1 + doc_count_containing_keyword)) + 1
+
+        # query keywords that no document contains have no IDF and do not count
+        query_tfidf = np.zeros(len(vocabulary), dtype=np.float64)
+        for keyword in query_keywords:
+            column = vocabulary.get(keyword)
+            if column is not None:
+                query_tfidf[column] = keyword_idf[column]
+
+        documents_tfidf = document_term_matrix * keyword_idf
+        numerators = documents_tfidf @ query_tfidf
+        denominators = np.linalg.norm(documents_tfidf, axis=1) * math.sqrt(query_tfidf @ query_tfidf)
+        similarities = np.divide(numerators, denominators, out=np.zeros_like(numerators), where=denominators != 0)
+        return cast(list[float], similarities.tolist())
+
+    def _get_document_keywords(self, document: Document) -> set[str]:
+        doc_hash: Optional[str] = document.metadata.get("doc_hash") if document.metadata else None
+        if not doc_hash or self._keywords_cache.capacity <= 0:
+            return self._keyword_table_handler.extract_keywords(document.page_content, None)
+
+        with self._keywords_cache_lock:
+            cached_keywords = self._keywords_cache.get(doc_hash)
+        if cached_keywords is not None:
+            return set(cached_keywords)
+
+        keywords = self._keyword_table_handler.extract_keywords(document.page_content, None)
+        with self._keywords_cache_lock:
+            self._keywords_cache.put(doc_hash, frozenset(keywords))
+        return keywords
@@ -9,6 +9,7 @@ from configs import dify_config
 from core.rag.data_post_processor.data_post_processor import DataPostProcessor
 from core.rag.datasource.keyword.keyword_factory import Keyword
 from core.rag.datasource.vdb.vector_factory import Vector
+from core.rag.embedding.embedding_base import Embeddings
 from core.rag.embedding.retrieval import RetrievalSegments
 from core.rag.index_processor.constant.index_type import IndexType
 from core.rag.models.document import Document
@@ -42,6 +43,8 @@ class RetrievalService:
         reranking_mode: str = "reranking_model",
         weights: Optional[dict] = None,
         document_ids_filter: Optional[list[str]] = None,
+        embeddings: Optional[Embeddings] = None,
+        query_vector: Optional[list[float]] = None,
     ):
         if not query:
             return []
@@ -82,6 +85,8 @@ class RetrievalService:
                         retrieval_method=retrieval_method,
                         exceptions=exceptions,
                         document_ids_filter=document_ids_filter,
+                        embeddings=embeddings,
+                        query_vector=query_vector,
                     )
                 )
             if RetrievalMethod.is_support_fulltext_search(retrieval_method):
@@ -170,6 +175,8 @@ class RetrievalService:
         retrieval_method: str,
         exceptions: list,
         document_ids_filter: Optional[list[str]] = None,
+        embeddings: Optional[Embeddings] = None,
+        query_vector: Optional[list[float]] = None,
     ):
         with flask_app.app_context():
             try:
@@ -177,9 +184,10 @@ class RetrievalService:
                 if not dataset:
                     raise ValueError("dataset not found")
 
-                vector = Vector(dataset=dataset)
+                vector = Vector(dataset=dataset, embeddings=embeddings)
                 documents = vector.search_by_vector(
                     query,
+                    query_vector=query_vector,
                     search_type="similarity_score_threshold",
                     top_k=top_k,
                     score_threshold=score_threshold,
@@ -280,11 +288,71 @@ class RetrievalService:
                 .all()
             }
 
+            # Batch query child chunks of parent-child documents
+            child_index_node_ids = set()
+            index_node_ids = set()
+            for document in documents:
+                dataset_document = dataset_documents.get(document.metadata.get("document_id"))
+                if not dataset_document or not document.metadata.get("doc_id"):
+                    continue
+                if dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX:
+                    child_index_node_ids.add(document.metadata["doc_id"])
+                else:
+                    index_node_ids.add(document.metadata["doc_id"])
+
+            child_chunks: dict[str, ChildChunk] = {}
+            if child_index_node_ids:
+                for chunk in (
+                    db.session.query(ChildChunk).filter(ChildChunk.index_node_id.in_(child_index_node_ids)).all()
+                ):
+                    child_chunks.setdefault(chunk.index_node_id, chunk)
+
+            # Batch query parent segments of the child chunks
+            dataset_ids = {dataset_document.dataset_id for dataset_document in dataset_documents.values()}
+            parent_segments: dict[str, DocumentSegment] = {}
+            if child_chunks:
+                parent_segments = {
+                    segment.id: segment
+                    for segment in db.session.query(DocumentSegment)
+                    .filter(
+                        DocumentSegment.dataset_id.in_(dataset_ids),
+                        DocumentSegment.enabled == True,
+                        DocumentSegment.status == "completed",
+                        DocumentSegment.id.in_({child_chunk.segment_id for child_chunk in child_chunks.values()}),
+                    )
+                    .options(
+                        load_only(
+                            DocumentSegment.id,
+                            DocumentSegment.dataset_id,
+                            DocumentSegment.content,
+                            DocumentSegment.answer,
+                        )
+                    )
+                    .all()
+                }
+
+            # Batch query segments of normal documents
+            segments: dict[tuple[str, str], DocumentSegment] = {}
+            if index_node_ids:
+                for normal_segment in (
+                    db.session.query(DocumentSegment)
+                    .filter(
+                        DocumentSegment.dataset_id.in_(dataset_ids),
+                        DocumentSegment.enabled == True,
+                        DocumentSegment.status == "completed",
+                        DocumentSegment.index_node_id.in_(index_node_ids),
+                    )
+                    .all()
+                ):
+                    segments.setdefault((normal_segment.dataset_id, normal_segment.index_node_id), normal_segment)
+
             records = []
             include_segment_ids = set()
             segment_child_map = {}
+            child_chunk: Optional[ChildChunk]
+            segment: Optional[DocumentSegment]
 
-            # Process documents
+            # Process documents in their original order
             for document in documents:
                 document_id = document.metadata.get("document_id")
                 if document_id not in dataset_documents:
@@ -297,33 +365,15 @@ class RetrievalService:
                 if dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX:
                     # Handle parent-child documents
                     child_index_node_id = document.metadata.get("doc_id")
+                    if not child_index_node_id:
+                        continue
 
-                    child_chunk = (
-                        db.session.query(ChildChunk).filter(ChildChunk.index_node_id == child_index_node_id).first()
-                    )
-
+                    child_chunk = child_chunks.get(child_index_node_id)
                     if not child_chunk:
                         continue
 
-                    segment = (
-                        db.session.query(DocumentSegment)
-                        .filter(
-                            DocumentSegment.dataset_id == dataset_document.dataset_id,
-                            DocumentSegment.enabled == True,
-                            DocumentSegment.status == "completed",
-                            DocumentSegment.id == child_chunk.segment_id,
-                        )
-                        .options(
-                            load_only(
-                                DocumentSegment.id,
-                                DocumentSegment.content,
-                                DocumentSegment.answer,
-                            )
-                        )
-                        .first()
-                    )
-
-                    if not segment:
+                    segment = parent_segments.get(child_chunk.segment_id)
+                    if not segment or segment.dataset_id != dataset_document.dataset_id:
                         continue
 
                     if segment.id not in include_segment_ids:
@@ -360,17 +410,7 @@ class RetrievalService:
                     if not index_node_id:
                         continue
 
-                    segment = (
-                        db.session.query(DocumentSegment)
-                        .filter(
-                            DocumentSegment.dataset_id == dataset_document.dataset_id,
-                            DocumentSegment.enabled == True,
-                            DocumentSegment.status == "completed",
-                            DocumentSegment.index_node_id == index_node_id,
-                        )
-                        .first()
-                    )
-
+                    segment = segments.get((dataset_document.dataset_id, index_node_id))
                     if not segment:
                         continue
 
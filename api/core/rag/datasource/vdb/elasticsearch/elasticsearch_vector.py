@@ -97,6 +97,12 @@ class ElasticSearchVector(BaseVector):
     def text_exists(self, id: str) -> bool:
         return bool(self._client.exists(index=self._collection_name, id=id))
 
+    def texts_exist(self, ids: list[str]) -> set[str]:
+        if not ids:
+            return set()
+        response = self._client.mget(index=self._collection_name, ids=ids, source=False)
+        return {doc["_id"] for doc in response["docs"] if doc.get("found")}
+
     def delete_by_ids(self, ids: list[str]) -> None:
         if not ids:
             return
@@ -196,6 +196,20 @@ class MilvusVector(BaseVector):
 
         return len(result) > 0
 
+    def texts_exist(self, ids: list[str]) -> set[str]:
+        if not ids or not self._client.has_collection(self._collection_name):
+            return set()
+
+        # quoted as JSON strings, which Milvus string literals accept with the same escapes
+        result = self._client.query(
+            collection_name=self._collection_name,
+            filter=f'metadata["doc_id"] in {json.dumps(ids)}',
+            output_fields=[Field.METADATA_KEY.value],
+            limit=len(ids),
+        )
+
+        return {item[Field.METADATA_KEY.value]["doc_id"] for item in result}
+
     def field_exists(self, field: str) -> bool:
         """
         Check if a field exists in the collection.
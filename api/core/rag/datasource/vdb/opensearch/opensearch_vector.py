@@ -141,6 +141,12 @@ class OpenSearchVector(BaseVector):
         except:
             return False
 
+    def texts_exist(self, ids: list[str]) -> set[str]:
+        if not ids or not self._client.indices.exists(index=self._collection_name.lower()):
+            return set()
+        response = self._client.mget(index=self._collection_name.lower(), body={"ids": ids}, _source=False)
+        return {doc["_id"] for doc in response["docs"] if doc.get("found")}
+
     def search_by_vector(self, query_vector: list[float], **kwargs: Any) -> list[Document]:
         # Make sure query_vector is a list
         if not isinstance(query_vector, list):
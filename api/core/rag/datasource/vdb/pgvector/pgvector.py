@@ -1,16 +1,21 @@
+import hashlib
+import io
 import json
 import logging
+import struct
+import threading
+import time
 import uuid
 from contextlib import contextmanager
-from typing import Any
+from typing import Any, Optional
 
 import psycopg2.errors
-import psycopg2.extras  # type: ignore
 import psycopg2.pool  # type: ignore
 from pydantic import BaseModel, model_validator
 
 from configs import dify_config
 from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_client_registry import vector_client_registry
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.embedding.embedding_base import Embeddings
@@ -27,6 +32,7 @@ class PGVectorConfig(BaseModel):
     database: str
     min_connection: int
     max_connection: int
+    pool_timeout: float = 30
     pg_bigm: bool = False
 
     @model_validator(mode="before")
@@ -56,10 +62,20 @@ CREATE TABLE IF NOT EXISTS {table_name} (
     id UUID PRIMARY KEY,
     text TEXT NOT NULL,
     meta JSONB NOT NULL,
-    embedding vector({dimension}) NOT NULL
+    embedding vector({dimension}) NOT NULL,
+    document_id TEXT GENERATED ALWAYS AS (meta->>'document_id') STORED
 ) using heap;
 """
 
+SQL_ADD_DOCUMENT_ID_COLUMN = """
+ALTER TABLE {table_name}
+ADD COLUMN IF NOT EXISTS document_id TEXT GENERATED ALWAYS AS (meta->>'document_id') STORED;
+"""
+
+SQL_CREATE_INDEX_DOCUMENT_ID = """
+CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} (document_id);
+"""
+
 SQL_CREATE_INDEX = """
 CREATE INDEX IF NOT EXISTS embedding_cosine_v1_idx ON {table_name} 
 USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
@@ -71,20 +87,120 @@ USING gin (text gin_bigm_ops);
 """
 
 
+class PGVectorConnectionPool(psycopg2.pool.ThreadedConnectionPool):
+    """
+    Connection pool shared by all threads, waiting up to `timeout` seconds for a free connection instead of failing
+    right away when all are in use.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, *args, timeout: float, **kwargs):
+        self._semaphore = threading.BoundedSemaphore(maxconn)
+        self._timeout = timeout
+        # connections handed out and connections kept open by the pool, counted here for the metrics
+        self._metrics_lock = threading.Lock()
+        self._in_use = 0
+        self._idle_connections: set[int] = set()
+        # the first connections are opened through getconn so that they are counted as well
+        super().__init__(0, maxconn, *args, **kwargs)
+        self.minconn = minconn
+        connections = []
+        try:
+            for _ in range(minconn):
+                connections.append(self.getconn())
+        finally:
+            for conn in connections:
+                self.putconn(conn)
+
+    def getconn(self, key=None):
+        if not self._semaphore.acquire(timeout=self._timeout):
+            raise psycopg2.pool.PoolError(f"no connection became free within {self._timeout} seconds")
+        try:
+            conn = super().getconn(key)
+        except Exception:
+            self._semaphore.release()
+            raise
+        with self._metrics_lock:
+            self._in_use += 1
+            self._idle_connections.discard(id(conn))
+        return conn
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            with self._metrics_lock:
+                self._in_use -= 1
+                # the pool closes the connections it does not keep
+                if conn is not None and not conn.closed:
+                    self._idle_connections.add(id(conn))
+            self._semaphore.release()
+
+    def closeall(self):
+        super().closeall()
+        with self._metrics_lock:
+            self._idle_connections.clear()
+
+    def get_metrics(self) -> dict[str, int]:
+        with self._metrics_lock:
+            return {"in_use": self._in_use, "idle": len(self._idle_connections), "max": self.maxconn}
+
+
+# whether a collection table has the document_id column and when that was checked, tables created before the
+# column existed get it from the add-pgvector-document-id-column command
+_document_id_columns: dict[str, tuple[bool, float]] = {}
+DOCUMENT_ID_COLUMN_RECHECK_INTERVAL = 300
+
+
+def _encode_copy_rows(rows: list[tuple[str, str, dict, list[float]]]) -> io.BytesIO:
+    """
+    Encode (id, text, meta, embedding) rows in the binary COPY format, embeddings as float4 like vector_recv reads.
+    """
+    buffer = io.BytesIO()
+    # signature, flags and header extension length
+    buffer.write(b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0))
+    for doc_id, text, meta, embedding in rows:
+        fields = (
+            uuid.UUID(doc_id).bytes,
+            text.encode("utf-8"),
+            # jsonb version 1 followed by its text
+            b"\x01" + json.dumps(meta).encode("utf-8"),
+            struct.pack(f"!hh{len(embedding)}f", len(embedding), 0, *embedding),
+        )
+        buffer.write(struct.pack("!h", len(fields)))
+        for field in fields:
+            buffer.write(struct.pack("!i", len(field)))
+            buffer.write(field)
+    buffer.write(struct.pack("!h", -1))
+    buffer.seek(0)
+    return buffer
+
+
 class PGVector(BaseVector):
     def __init__(self, collection_name: str, config: PGVectorConfig):
         super().__init__(collection_name)
-        self.pool = self._create_connection_pool(config)
+        self.pool = vector_client_registry.get_client(
+            VectorType.PGVECTOR, config, owner=self, **self._connection_pool_callbacks(config)
+        )
         self.table_name = f"embedding_{collection_name}"
         self.pg_bigm = config.pg_bigm
 
     def get_type(self) -> str:
         return VectorType.PGVECTOR
 
-    def _create_connection_pool(self, config: PGVectorConfig):
-        return psycopg2.pool.SimpleConnectionPool(
+    @classmethod
+    def _connection_pool_callbacks(cls, config: PGVectorConfig) -> dict:
+        return {
+            "create": lambda: cls._create_connection_pool(config),
+            "close": lambda pool: pool.closeall(),
+            "metrics": lambda pool: pool.get_metrics(),
+        }
+
+    @staticmethod
+    def _create_connection_pool(config: PGVectorConfig) -> PGVectorConnectionPool:
+        return PGVectorConnectionPool(
             config.min_connection,
             config.max_connection,
+            timeout=config.pool_timeout,
             host=config.host,
             port=config.port,
             user=config.user,
@@ -100,8 +216,10 @@ class PGVector(BaseVector):
             yield cur
         finally:
             cur.close()
-            conn.commit()
-            self.pool.putconn(conn)
+            if not conn.closed:
+                conn.commit()
+            # a connection lost by the server is dropped instead of handed out again
+            self.pool.putconn(conn, close=bool(conn.closed))
 
     def create(self, texts: list[Document], embeddings: list[list[float]], **kwargs):
         dimension = len(embeddings[0])
@@ -119,13 +237,15 @@ class PGVector(BaseVector):
                     (
                         doc_id,
                         doc.page_content,
-                        json.dumps(doc.metadata),
+                        doc.metadata,
                         embeddings[i],
                     )
                 )
         with self._get_cursor() as cur:
-            psycopg2.extras.execute_values(
-                cur, f"INSERT INTO {self.table_name} (id, text, meta, embedding) VALUES %s", values
+            # binary COPY, the embeddings are sent as float4 instead of as text
+            cur.copy_expert(
+                f"COPY {self.table_name} (id, text, meta, embedding) FROM STDIN WITH (FORMAT BINARY)",
+                _encode_copy_rows(values),
             )
         return pks
 
@@ -134,6 +254,13 @@ class PGVector(BaseVector):
             cur.execute(f"SELECT id FROM {self.table_name} WHERE id = %s", (id,))
             return cur.fetchone() is not None
 
+    def texts_exist(self, ids: list[str]) -> set[str]:
+        if not ids:
+            return set()
+        with self._get_cursor() as cur:
+            cur.execute(f"SELECT id FROM {self.table_name} WHERE id = ANY(%s::uuid[])", (ids,))
+            return {str(id) for (id,) in cur.fetchall()}
+
     def get_by_ids(self, ids: list[str]) -> list[Document]:
         with self._get_cursor() as cur:
             cur.execute(f"SELECT meta, text FROM {self.table_name} WHERE id IN %s", (tuple(ids),))
@@ -160,7 +287,10 @@ class PGVector(BaseVector):
 
     def delete_by_metadata_field(self, key: str, value: str) -> None:
         with self._get_cursor() as cur:
-            cur.execute(f"DELETE FROM {self.table_name} WHERE meta->>%s = %s", (key, value))
+            if key == "document_id" and self._has_document_id_column(cur):
+                cur.execute(f"DELETE FROM {self.table_name} WHERE document_id = %s", (value,))
+            else:
+                cur.execute(f"DELETE FROM {self.table_name} WHERE meta->>%s = %s", (key, value))
 
     def search_by_vector(self, query_vector: list[float], **kwargs: Any) -> list[Document]:
         """
@@ -173,18 +303,15 @@ class PGVector(BaseVector):
         top_k = kwargs.get("top_k", 4)
         if not isinstance(top_k, int) or top_k <= 0:
             raise ValueError("top_k must be a positive integer")
-        document_ids_filter = kwargs.get("document_ids_filter")
-        where_clause = ""
-        if document_ids_filter:
-            document_ids = ", ".join(f"'{id}'" for id in document_ids_filter)
-            where_clause = f" WHERE metadata->>'document_id' in ({document_ids}) "
-
         with self._get_cursor() as cur:
+            where_clause, where_params = self._get_document_ids_filter(cur, kwargs.get("document_ids_filter"))
+            if where_clause:
+                where_clause = f" WHERE {where_clause}"
             cur.execute(
-                f"SELECT meta, text, embedding <=> %s AS distance FROM {self.table_name}"
+                f"SELECT meta, text, embedding <=> %s::vector AS distance FROM {self.table_name}"
                 f" {where_clause}"
                 f" ORDER BY distance LIMIT {top_k}",
-                (json.dumps(query_vector),),
+                (json.dumps(query_vector), *where_params),
             )
             docs = []
             score_threshold = float(kwargs.get("score_threshold") or 0.0)
@@ -201,11 +328,9 @@ class PGVector(BaseVector):
         if not isinstance(top_k, int) or top_k <= 0:
             raise ValueError("top_k must be a positive integer")
         with self._get_cursor() as cur:
-            document_ids_filter = kwargs.get("document_ids_filter")
-            where_clause = ""
-            if document_ids_filter:
-                document_ids = ", ".join(f"'{id}'" for id in document_ids_filter)
-                where_clause = f" AND metadata->>'document_id' in ({document_ids}) "
+            where_clause, where_params = self._get_document_ids_filter(cur, kwargs.get("document_ids_filter"))
+            if where_clause:
+                where_clause = f" AND {where_clause}"
             if self.pg_bigm:
                 cur.execute("SET pg_bigm.similarity_limit TO 0.000001")
                 cur.execute(
@@ -216,7 +341,7 @@ class PGVector(BaseVector):
                     ORDER BY score DESC
                     LIMIT {top_k}""",
                     # f"'{query}'" is required in order to account for whitespace in query
-                    (f"'{query}'", f"'{query}'"),
+                    (f"'{query}'", f"'{query}'", *where_params),
                 )
             else:
                 cur.execute(
@@ -227,7 +352,7 @@ class PGVector(BaseVector):
                     ORDER BY score DESC
                     LIMIT {top_k}""",
                     # f"'{query}'" is required in order to account for whitespace in query
-                    (f"'{query}'", f"'{query}'"),
+                    (f"'{query}'", f"'{query}'", *where_params),
                 )
 
             docs = []
@@ -242,6 +367,59 @@ class PGVector(BaseVector):
     def delete(self) -> None:
         with self._get_cursor() as cur:
             cur.execute(f"DROP TABLE IF EXISTS {self.table_name}")
+        _document_id_columns.pop(self.table_name, None)
+
+    def add_document_id_column(self) -> None:
+        """
+        Add the indexed document_id column to a collection table created before it existed.
+        Rewrites the table, which is locked meanwhile.
+        """
+        with self._get_cursor() as cur:
+            cur.execute(SQL_ADD_DOCUMENT_ID_COLUMN.format(table_name=self.table_name))
+            cur.execute(
+                SQL_CREATE_INDEX_DOCUMENT_ID.format(
+                    index_name=self._document_id_index_name(), table_name=self.table_name
+                )
+            )
+        _document_id_columns[self.table_name] = (True, time.monotonic())
+
+    @classmethod
+    def get_collection_names(cls, config: PGVectorConfig) -> list[str]:
+        callbacks = cls._connection_pool_callbacks(config)
+        with vector_client_registry.lease(VectorType.PGVECTOR, config, **callbacks) as pool:
+            conn = pool.getconn()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT tablename FROM pg_tables WHERE tablename LIKE 'embedding\\_%'")
+                    return [table_name.removeprefix("embedding_") for (table_name,) in cur.fetchall()]
+            finally:
+                conn.rollback()
+                pool.putconn(conn)
+
+    def _get_document_ids_filter(self, cur, document_ids_filter: Optional[list[str]]) -> tuple[str, tuple]:
+        if not document_ids_filter:
+            return "", ()
+        column = "document_id" if self._has_document_id_column(cur) else "meta->>'document_id'"
+        # bound as a text array, served by the index on the document_id column
+        return f"{column} = ANY(%s)", (list(document_ids_filter),)
+
+    def _has_document_id_column(self, cur) -> bool:
+        checked = _document_id_columns.get(self.table_name)
+        if checked is not None and (checked[0] or time.monotonic() - checked[1] < DOCUMENT_ID_COLUMN_RECHECK_INTERVAL):
+            return checked[0]
+
+        cur.execute(
+            "SELECT 1 FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = 'document_id'"
+            " AND NOT attisdropped",
+            (self.table_name,),
+        )
+        has_column = cur.fetchone() is not None
+        _document_id_columns[self.table_name] = (has_column, time.monotonic())
+        return has_column
+
+    def _document_id_index_name(self) -> str:
+        # table names can be near the identifier length limit, a suffixed name would be truncated into the table's
+        return f"document_id_{hashlib.md5(self.table_name.lower().encode('utf-8')).hexdigest()}_idx"
 
     def _create_collection(self, dimension: int):
         cache_key = f"vector_indexing_{self._collection_name}"
@@ -258,6 +436,11 @@ class PGVector(BaseVector):
                 # ref: https://github.com/pgvector/pgvector?tab=readme-ov-file#indexing
                 if dimension <= 2000:
                     cur.execute(SQL_CREATE_INDEX.format(table_name=self.table_name))
+                cur.execute(
+                    SQL_CREATE_INDEX_DOCUMENT_ID.format(
+                        index_name=self._document_id_index_name(), table_name=self.table_name
+                    )
+                )
                 if self.pg_bigm:
                     cur.execute("CREATE EXTENSION IF NOT EXISTS pg_bigm")
                     cur.execute(SQL_CREATE_INDEX_PG_BIGM.format(table_name=self.table_name))
@@ -274,16 +457,18 @@ class PGVectorFactory(AbstractVectorFactory):
             collection_name = Dataset.gen_collection_name_by_id(dataset_id)
             dataset.index_struct = json.dumps(self.gen_index_struct_dict(VectorType.PGVECTOR, collection_name))
 
-        return PGVector(
-            collection_name=collection_name,
-            config=PGVectorConfig(
-                host=dify_config.PGVECTOR_HOST or "localhost",
-                port=dify_config.PGVECTOR_PORT,
-                user=dify_config.PGVECTOR_USER or "postgres",
-                password=dify_config.PGVECTOR_PASSWORD or "",
-                database=dify_config.PGVECTOR_DATABASE or "postgres",
-                min_connection=dify_config.PGVECTOR_MIN_CONNECTION,
-                max_connection=dify_config.PGVECTOR_MAX_CONNECTION,
-                pg_bigm=dify_config.PGVECTOR_PG_BIGM,
-            ),
+        return PGVector(collection_name=collection_name, config=self.get_config())
+
+    @staticmethod
+    def get_config() -> PGVectorConfig:
+        return PGVectorConfig(
+            host=dify_config.PGVECTOR_HOST or "localhost",
+            port=dify_config.PGVECTOR_PORT,
+            user=dify_config.PGVECTOR_USER or "postgres",
+            password=dify_config.PGVECTOR_PASSWORD or "",
+            database=dify_config.PGVECTOR_DATABASE or "postgres",
+            min_connection=dify_config.PGVECTOR_MIN_CONNECTION,
+            max_connection=dify_config.PGVECTOR_MAX_CONNECTION,
+            pool_timeout=dify_config.PGVECTOR_POOL_TIMEOUT,
+            pg_bigm=dify_config.PGVECTOR_PG_BIGM,
         )
@@ -22,6 +22,7 @@ from qdrant_client.local.qdrant_local import QdrantLocal
 from configs import dify_config
 from core.rag.datasource.vdb.field import Field
 from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_client_registry import vector_client_registry
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.embedding.embedding_base import Embeddings
@@ -71,7 +72,13 @@ class QdrantVector(BaseVector):
     def __init__(self, collection_name: str, group_id: str, config: QdrantConfig, distance_func: str = "Cosine"):
         super().__init__(collection_name)
         self._client_config = config
-        self._client = qdrant_client.QdrantClient(**self._client_config.to_qdrant_params())
+        self._client = vector_client_registry.get_client(
+            VectorType.QDRANT,
+            config,
+            create=lambda: qdrant_client.QdrantClient(**config.to_qdrant_params()),
+            close=lambda client: client.close(),
+            owner=self,
+        )
         self._distance_func = distance_func.upper()
         self._group_id = group_id
 
@@ -323,6 +330,18 @@ class QdrantVector(BaseVector):
 
         return len(response) > 0
 
+    def texts_exist(self, ids: list[str]) -> set[str]:
+        if not ids:
+            return set()
+        collections_response = self._client.get_collections()
+        if self._collection_name not in {collection.name for collection in collections_response.collections}:
+            return set()
+        response = self._client.retrieve(
+            collection_name=self._collection_name, ids=ids, with_payload=False, with_vectors=False
+        )
+
+        return {str(point.id) for point in response}
+
     def search_by_vector(self, query_vector: list[float], **kwargs: Any) -> list[Document]:
         from qdrant_client.http import models
 
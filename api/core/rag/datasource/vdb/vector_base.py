@@ -26,6 +26,13 @@ class BaseVector(ABC):
     def text_exists(self, id: str) -> bool:
         raise NotImplementedError
 
+    def texts_exist(self, ids: list[str]) -> set[str]:
+        """
+        Get the given ids that exist in the collection.
+        Backends able to check them in a single request override this per id fallback.
+        """
+        return {id for id in ids if self.text_exists(id)}
+
     @abstractmethod
     def delete_by_ids(self, ids: list[str]) -> None:
         raise NotImplementedError
@@ -50,14 +57,9 @@ class BaseVector(ABC):
         raise NotImplementedError
 
     def _filter_duplicate_texts(self, texts: list[Document]) -> list[Document]:
-        for text in texts.copy():
-            if text.metadata and "doc_id" in text.metadata:
-                doc_id = text.metadata["doc_id"]
-                exists_duplicate_node = self.text_exists(doc_id)
-                if exists_duplicate_node:
-                    texts.remove(text)
-
-        return texts
+        doc_ids = [text.metadata["doc_id"] for text in texts if text.metadata and text.metadata.get("doc_id")]
+        existing_doc_ids = self.texts_exist(doc_ids) if doc_ids else set()
+        return [text for text in texts if not (text.metadata and text.metadata.get("doc_id") in existing_doc_ids)]
 
     def _get_uuids(self, texts: list[Document]) -> list[str]:
         return [text.metadata["doc_id"] for text in texts if text.metadata and "doc_id" in text.metadata]
@@ -0,0 +1,221 @@
+import hashlib
+import logging
+import os
+import threading
+import weakref
+from collections.abc import Callable, Generator
+from contextlib import contextmanager
+from typing import Any, Optional, TypeVar, cast
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _RegisteredClient:
+    __slots__ = ("client", "close", "config_hash", "metrics", "retired", "users")
+
+    def __init__(
+        self,
+        client: Any,
+        config_hash: str,
+        close: Optional[Callable[[Any], None]],
+        metrics: Optional[Callable[[Any], dict[str, int]]],
+    ) -> None:
+        self.client = client
+        self.config_hash = config_hash
+        self.close = close
+        self.metrics = metrics
+        # owners and leases still using the client, a retired client is closed once the last of them is done
+        self.users = 0
+        self.retired = False
+
+
+class VectorClientRegistry:
+    """
+    Process-wide registry of vector store clients and connection pools, shared by all vector instances and threads.
+
+    Each backend has one client, built from its config on first use. Clients are built under a lock of their
+    backend only, so a slow handshake does not hold up the other backends. A different config replaces the
+    previous client, which is retired and closed once the owners and leases still using it are done. A forked
+    process drops the clients it inherited without closing them, their connections belong to the parent, and
+    builds its own on first use.
+    """
+
+    def __init__(self) -> None:
+        self._clients: dict[str, _RegisteredClient] = {}
+        self._retired: set[_RegisteredClient] = set()
+        self._backend_locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.created = 0
+        self.reused = 0
+
+    def get_client(
+        self,
+        backend: str,
+        config: BaseModel,
+        create: Callable[[], T],
+        close: Optional[Callable[[T], None]] = None,
+        metrics: Optional[Callable[[T], dict[str, int]]] = None,
+        owner: Optional[object] = None,
+    ) -> T:
+        """
+        Get the shared client of a backend, creating it with `create` when missing or built from another config.
+        :param backend: backend name
+        :param config: config the client is built from
+        :param create: creates the client
+        :param close: closes the client when it is retired
+        :param metrics: reports the pool utilisation of the client
+        :param owner: object using the client until it is garbage collected, a retired client is not closed before
+        :return:
+        """
+        registered = self._get_registered(backend, config, create, close, metrics, acquire=owner is not None)
+        if owner is not None:
+            weakref.finalize(owner, self._release, backend, registered)
+        return cast(T, registered.client)
+
+    @contextmanager
+    def lease(
+        self,
+        backend: str,
+        config: BaseModel,
+        create: Callable[[], T],
+        close: Optional[Callable[[T], None]] = None,
+        metrics: Optional[Callable[[T], dict[str, int]]] = None,
+    ) -> Generator[T, None, None]:
+        """
+        Use the shared client of a backend for the duration of the block, a retired client is not closed before.
+        """
+        registered = self._get_registered(backend, config, create, close, metrics, acquire=True)
+        try:
+            yield cast(T, registered.client)
+        finally:
+            self._release(backend, registered)
+
+    def clear(self) -> None:
+        with self._lock:
+            clients, self._clients = self._clients, {}
+            to_close = [(backend, registered) for backend, registered in clients.items() if self._retire(registered)]
+        for backend, registered in to_close:
+            self._close(backend, registered)
+
+    def metrics(self) -> dict[str, Any]:
+        """
+        Get the number of clients created and reused, and the pool utilisation of each backend.
+        """
+        with self._lock:
+            clients = dict(self._clients)
+            result: dict[str, Any] = {
+                "created": self.created,
+                "reused": self.reused,
+                "retired_in_use": len(self._retired),
+            }
+
+        for backend, registered in clients.items():
+            backend_metrics: dict[str, Any] = {"users": registered.users}
+            if registered.metrics is not None:
+                try:
+                    backend_metrics.update(registered.metrics(registered.client))
+                except Exception:
+                    logger.exception("Failed to get metrics of vector store %s", backend)
+            result[backend] = backend_metrics
+        return result
+
+    def reset_after_fork(self) -> None:
+        # the locks may have been held by other threads of the parent at fork time
+        self._lock = threading.Lock()
+        self._backend_locks = {}
+        self._clients = {}
+        self._retired = set()
+        self._pid = os.getpid()
+
+    def _get_registered(
+        self,
+        backend: str,
+        config: BaseModel,
+        create: Callable[[], Any],
+        close: Optional[Callable[[Any], None]],
+        metrics: Optional[Callable[[Any], dict[str, int]]],
+        acquire: bool,
+    ) -> _RegisteredClient:
+        config_hash = hashlib.sha256(config.model_dump_json().encode("utf-8")).hexdigest()
+        with self._lock:
+            self._check_pid()
+            registered = self._get_current(backend, config_hash, acquire)
+            if registered is not None:
+                return registered
+            backend_lock = self._backend_locks.setdefault(backend, threading.Lock())
+
+        # created under the lock of the backend, so concurrent first uses do not build several pools
+        with backend_lock:
+            with self._lock:
+                registered = self._get_current(backend, config_hash, acquire)
+            if registered is not None:
+                return registered
+
+            registered = _RegisteredClient(create(), config_hash, close, metrics)
+            with self._lock:
+                previous = self._clients.get(backend)
+                self._clients[backend] = registered
+                registered.users += int(acquire)
+                self.created += 1
+                close_previous = previous is not None and self._retire(previous)
+
+        if previous is not None:
+            logger.info("Config of vector store %s changed, retiring its client", backend)
+            if close_previous:
+                self._close(backend, previous)
+        return registered
+
+    def _get_current(self, backend: str, config_hash: str, acquire: bool) -> Optional[_RegisteredClient]:
+        registered = self._clients.get(backend)
+        if registered is None or registered.config_hash != config_hash:
+            return None
+        registered.users += int(acquire)
+        self.reused += 1
+        return registered
+
+    def _retire(self, registered: _RegisteredClient) -> bool:
+        """
+        Mark a client retired, returns whether it is unused and must be closed now. Called under the lock.
+        """
+        registered.retired = True
+        if registered.users > 0:
+            self._retired.add(registered)
+            return False
+        return True
+
+    def _release(self, backend: str, registered: _RegisteredClient) -> None:
+        with self._lock:
+            registered.users -= 1
+            close = registered.retired and registered.users == 0 and registered in self._retired
+            if close:
+                self._retired.discard(registered)
+        if close:
+            self._close(backend, registered)
+
+    def _check_pid(self) -> None:
+        # in case the registry was copied by a fork that did not run the fork hooks
+        if self._pid != os.getpid():
+            self._clients = {}
+            self._retired = set()
+            self._backend_locks = {}
+            self._pid = os.getpid()
+
+    @staticmethod
+    def _close(backend: str, registered: _RegisteredClient) -> None:
+        if registered.close is None:
+            return
+        try:
+            registered.close(registered.client)
+        except Exception:
+            logger.exception("Failed to close client of vector store %s", backend)
+
+
+vector_client_registry = VectorClientRegistry()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=vector_client_registry.reset_after_fork)
@@ -26,11 +26,12 @@ class AbstractVectorFactory(ABC):
 
 
 class Vector:
-    def __init__(self, dataset: Dataset, attributes: Optional[list] = None):
+    def __init__(self, dataset: Dataset, attributes: Optional[list] = None, embeddings: Optional[Embeddings] = None):
         if attributes is None:
             attributes = ["doc_id", "dataset_id", "document_id", "doc_hash"]
         self._dataset = dataset
-        self._embeddings = self._get_embeddings()
+        # datasets sharing an embedding model can share its embeddings instead of resolving the model each
+        self._embeddings = embeddings or self._get_embeddings()
         self._attributes = attributes
         self._vector_processor = self._init_vector()
 
@@ -163,6 +164,8 @@ class Vector:
     def add_texts(self, documents: list[Document], **kwargs):
         if kwargs.get("duplicate_check", False):
             documents = self._filter_duplicate_texts(documents)
+            if not documents:
+                return
 
         embeddings = self._embeddings.embed_documents([document.page_content for document in documents])
         self._vector_processor.create(texts=documents, embeddings=embeddings, **kwargs)
@@ -170,6 +173,9 @@ class Vector:
     def text_exists(self, id: str) -> bool:
         return self._vector_processor.text_exists(id)
 
+    def texts_exist(self, ids: list[str]) -> set[str]:
+        return self._vector_processor.texts_exist(ids)
+
     def delete_by_ids(self, ids: list[str]) -> None:
         self._vector_processor.delete_by_ids(ids)
 
@@ -177,7 +183,8 @@ class Vector:
         self._vector_processor.delete_by_metadata_field(key, value)
 
     def search_by_vector(self, query: str, **kwargs: Any) -> list[Document]:
-        query_vector = self._embeddings.embed_query(query)
+        # the query may have been embedded already, e.g. once for all datasets of a multi-dataset retrieval
+        query_vector = kwargs.pop("query_vector", None) or self._embeddings.embed_query(query)
         return self._vector_processor.search_by_vector(query_vector, **kwargs)
 
     def search_by_full_text(self, query: str, **kwargs: Any) -> list[Document]:
@@ -202,16 +209,10 @@ class Vector:
         return CacheEmbedding(embedding_model)
 
     def _filter_duplicate_texts(self, texts: list[Document]) -> list[Document]:
-        for text in texts.copy():
-            if text.metadata is None:
-                continue
-            doc_id = text.metadata["doc_id"]
-            if doc_id:
-                exists_duplicate_node = self.text_exists(doc_id)
-                if exists_duplicate_node:
-                    texts.remove(text)
-
-        return texts
+        # one existence check for the whole batch
+        doc_ids = [text.metadata["doc_id"] for text in texts if text.metadata and text.metadata["doc_id"]]
+        existing_doc_ids = self.texts_exist(doc_ids) if doc_ids else set()
+        return [text for text in texts if not (text.metadata and text.metadata["doc_id"] in existing_doc_ids)]
 
     def __getattr__(self, name):
         if self._vector_processor is not None:
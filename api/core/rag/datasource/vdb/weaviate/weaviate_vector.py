@@ -1,5 +1,6 @@
 import datetime
 import json
+import threading
 from typing import Any, Optional
 
 import requests
@@ -9,6 +10,7 @@ from pydantic import BaseModel, model_validator
 from configs import dify_config
 from core.rag.datasource.vdb.field import Field
 from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_client_registry import vector_client_registry
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.embedding.embedding_base import Embeddings
@@ -30,10 +32,16 @@ class WeaviateConfig(BaseModel):
         return values
 
 
+# the batch of a client is a single object, threads sharing the client take turns using it
+_batch_lock = threading.Lock()
+
+
 class WeaviateVector(BaseVector):
     def __init__(self, collection_name: str, config: WeaviateConfig, attributes: list):
         super().__init__(collection_name)
-        self._client = self._init_client(config)
+        self._client = vector_client_registry.get_client(
+            VectorType.WEAVIATE, config, create=lambda: self._init_client(config), owner=self
+        )
         self._attributes = attributes
 
     def _init_client(self, config: WeaviateConfig) -> weaviate.Client:
@@ -103,7 +111,7 @@ class WeaviateVector(BaseVector):
 
         ids = []
 
-        with self._client.batch as batch:
+        with _batch_lock, self._client.batch as batch:
             for i, text in enumerate(texts):
                 data_properties = {Field.TEXT_KEY.value: text}
                 if metadatas is not None:
@@ -126,7 +134,10 @@ class WeaviateVector(BaseVector):
         if self._client.schema.contains(schema):
             where_filter = {"operator": "Equal", "path": [key], "valueText": value}
 
-            self._client.batch.delete_objects(class_name=self._collection_name, where=where_filter, output="minimal")
+            with _batch_lock:
+                self._client.batch.delete_objects(
+                    class_name=self._collection_name, where=where_filter, output="minimal"
+                )
 
     def delete(self):
         # check whether the index already exists
@@ -164,6 +175,30 @@ class WeaviateVector(BaseVector):
 
         return True
 
+    def texts_exist(self, ids: list[str]) -> set[str]:
+        collection_name = self._collection_name
+        schema = self._default_schema(self._collection_name)
+
+        # check whether the index already exists
+        if not ids or not self._client.schema.contains(schema):
+            return set()
+        result = (
+            self._client.query.get(collection_name, ["doc_id"])
+            .with_where(
+                {
+                    "operator": "Or",
+                    "operands": [{"path": ["doc_id"], "operator": "Equal", "valueText": id} for id in ids],
+                }
+            )
+            .with_limit(len(ids))
+            .do()
+        )
+
+        if "errors" in result:
+            raise ValueError(f"Error during query: {result['errors']}")
+
+        return {entry["doc_id"] for entry in result["data"]["Get"][collection_name]}
+
     def delete_by_ids(self, ids: list[str]) -> None:
         # check whether the index already exists
         schema = self._default_schema(self._collection_name)
@@ -1,16 +1,19 @@
-import base64
 import logging
+import threading
 from typing import Any, Optional, cast
 
 import numpy as np
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 
 from configs import dify_config
 from core.entities.embedding_type import EmbeddingInputType
+from core.helper.lru_cache import LRUCache
 from core.model_manager import ModelInstance
 from core.model_runtime.entities.model_entities import ModelPropertyKey
 from core.model_runtime.model_providers.__base.text_embedding_model import TextEmbeddingModel
 from core.rag.embedding.embedding_base import Embeddings
+from core.rag.embedding.embedding_codec import encode_embedding, load_embedding
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
 from libs import helper
@@ -19,6 +22,25 @@ from models.dataset import Embedding
 logger = logging.getLogger(__name__)
 
 
+class _LocalEmbeddingCache:
+    """Thread-safe LRU tier shared by all CacheEmbedding instances in the process."""
+
+    def __init__(self, capacity: int):
+        self._cache = LRUCache(capacity)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            return cast(Optional[np.ndarray], self._cache.get(key))
+
+    def put(self, key: str, value: np.ndarray) -> None:
+        with self._lock:
+            self._cache.put(key, value)
+
+
+_local_embedding_cache = _LocalEmbeddingCache(dify_config.EMBEDDING_CACHE_LOCAL_SIZE)
+
+
 class CacheEmbedding(Embeddings):
     def __init__(self, model_instance: ModelInstance, user: Optional[str] = None) -> None:
         self._model_instance = model_instance
@@ -26,25 +48,25 @@ class CacheEmbedding(Embeddings):
 
     def embed_documents(self, texts: list[str]) -> list[list[float]]:
         """Embed search docs in batches of 10."""
+        return [
+            embedding.tolist() if embedding is not None else None for embedding in self.embed_documents_as_array(texts)
+        ]
+
+    def embed_documents_as_array(self, texts: list[str]) -> list[np.ndarray]:
+        """Embed search docs as float32 arrays."""
         # use doc embedding cache or store if not exists
         text_embeddings: list[Any] = [None for _ in range(len(texts))]
         embedding_queue_indices = []
-        for i, text in enumerate(texts):
-            hash = helper.generate_text_hash(text)
-            embedding = (
-                db.session.query(Embedding)
-                .filter_by(
-                    model_name=self._model_instance.model, hash=hash, provider_name=self._model_instance.provider
-                )
-                .first()
-            )
-            if embedding:
-                text_embeddings[i] = embedding.get_embedding()
+        hashes = [helper.generate_text_hash(text) for text in texts]
+        cached_embeddings = self._get_cached_embeddings(set(hashes))
+        for i, hash in enumerate(hashes):
+            if hash in cached_embeddings:
+                text_embeddings[i] = cached_embeddings[hash]
             else:
                 embedding_queue_indices.append(i)
         if embedding_queue_indices:
             embedding_queue_texts = [texts[i] for i in embedding_queue_indices]
-            embedding_queue_embeddings = []
+            new_embeddings: dict[str, np.ndarray] = {}
             try:
                 model_type_instance = cast(TextEmbeddingModel, self._model_instance.model_type_instance)
                 model_schema = model_type_instance.get_model_schema(
@@ -62,37 +84,26 @@ class CacheEmbedding(Embeddings):
                         texts=batch_texts, user=self._user, input_type=EmbeddingInputType.DOCUMENT
                     )
 
-                    for vector in embedding_result.embeddings:
-                        try:
-                            # FIXME: type ignore for numpy here
-                            normalized_embedding = (vector / np.linalg.norm(vector)).tolist()  # type: ignore
-                            # stackoverflow best way: https://stackoverflow.com/questions/20319813/how-to-check-list-containing-nan
-                            if np.isnan(normalized_embedding).any():
-                                # for issue #11827  float values are not json compliant
-                                logger.warning(f"Normalized embedding is nan: {normalized_embedding}")
-                                continue
-                            embedding_queue_embeddings.append(normalized_embedding)
-                        except IntegrityError:
-                            db.session.rollback()
-                        except Exception:
-                            logging.exception("Failed transform embedding")
-                cache_embeddings = []
-                try:
-                    for i, n_embedding in zip(embedding_queue_indices, embedding_queue_embeddings):
-                        text_embeddings[i] = n_embedding
-                        hash = helper.generate_text_hash(texts[i])
-                        if hash not in cache_embeddings:
-                            embedding_cache = Embedding(
-                                model_name=self._model_instance.model,
-                                hash=hash,
-                                provider_name=self._model_instance.provider,
-                            )
-                            embedding_cache.set_embedding(n_embedding)
-                            db.session.add(embedding_cache)
-                            cache_embeddings.append(hash)
-                    db.session.commit()
-                except IntegrityError:
-                    db.session.rollback()
+                    try:
+                        vectors = np.asarray(embedding_result.embeddings, dtype=np.float64)
+                        normalized_embeddings = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(
+                            np.float32
+                        )
+                    except Exception:
+                        logging.exception("Failed transform embedding")
+                        continue
+                    # stackoverflow best way: https://stackoverflow.com/questions/20319813/how-to-check-list-containing-nan
+                    nan_rows = np.isnan(normalized_embeddings).any(axis=1)
+                    for queue_index, normalized_embedding, is_nan in zip(
+                        embedding_queue_indices[i : i + max_chunks], normalized_embeddings, nan_rows
+                    ):
+                        if is_nan:
+                            # for issue #11827  float values are not json compliant
+                            logger.warning(f"Normalized embedding is nan: {normalized_embedding}")
+                            continue
+                        text_embeddings[queue_index] = normalized_embedding
+                        new_embeddings.setdefault(hashes[queue_index], normalized_embedding)
+                self._save_cached_embeddings(new_embeddings)
             except Exception as ex:
                 db.session.rollback()
                 logger.exception("Failed to embed documents: %s")
@@ -100,24 +111,147 @@ class CacheEmbedding(Embeddings):
 
         return text_embeddings
 
+    def _get_cached_embeddings(self, hashes: set[str]) -> dict[str, np.ndarray]:
+        """
+        Resolve cached document embeddings for the given text hashes.
+
+        Lookups go through the in-process LRU tier, then Redis, then the embeddings table,
+        which is queried with one `IN` query per batch. Hits from a slower tier are copied
+        into the faster ones.
+        """
+        result: dict[str, np.ndarray] = {}
+        if not hashes:
+            return result
+
+        pending = set(hashes)
+        if dify_config.EMBEDDING_CACHE_LOCAL_SIZE > 0:
+            for hash in list(pending):
+                local_embedding = _local_embedding_cache.get(self._cache_key(hash))
+                if local_embedding is not None:
+                    result[hash] = local_embedding
+                    pending.discard(hash)
+
+        if pending and dify_config.EMBEDDING_CACHE_REDIS_ENABLED:
+            redis_hits = self._get_redis_embeddings(pending)
+            self._put_local_embeddings(redis_hits)
+            result.update(redis_hits)
+            pending.difference_update(redis_hits)
+
+        if pending:
+            db_hits: dict[str, np.ndarray] = {}
+            pending_hashes = list(pending)
+            batch_size = dify_config.EMBEDDING_CACHE_BATCH_SIZE
+            for i in range(0, len(pending_hashes), batch_size):
+                embeddings = (
+                    db.session.query(Embedding)
+                    .filter(
+                        Embedding.model_name == self._model_instance.model,
+                        Embedding.provider_name == self._model_instance.provider,
+                        Embedding.hash.in_(pending_hashes[i : i + batch_size]),
+                    )
+                    .all()
+                )
+                for embedding in embeddings:
+                    db_hits[embedding.hash] = embedding.get_embedding_array()
+            self._put_local_embeddings(db_hits)
+            self._put_redis_embeddings(db_hits)
+            result.update(db_hits)
+
+        return result
+
+    def _save_cached_embeddings(self, embeddings: dict[str, np.ndarray]) -> None:
+        """
+        Store newly computed document embeddings in every enabled cache tier.
+
+        Rows are written to the embeddings table with bulk inserts that skip hashes
+        another worker has already stored.
+        """
+        if not embeddings:
+            return
+
+        rows = [
+            {
+                "model_name": self._model_instance.model,
+                "hash": hash,
+                "provider_name": self._model_instance.provider,
+                "embedding": encode_embedding(vector, dify_config.EMBEDDING_CACHE_STORAGE_DTYPE),
+            }
+            for hash, vector in embeddings.items()
+        ]
+        try:
+            batch_size = dify_config.EMBEDDING_CACHE_BATCH_SIZE
+            for i in range(0, len(rows), batch_size):
+                stmt = (
+                    insert(Embedding)
+                    .values(rows[i : i + batch_size])
+                    .on_conflict_do_nothing(index_elements=["model_name", "hash", "provider_name"])
+                )
+                db.session.execute(stmt)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+
+        self._put_local_embeddings(embeddings)
+        self._put_redis_embeddings(embeddings)
+
+    def _cache_key(self, hash: str) -> str:
+        return f"embedding_doc_{self._model_instance.provider}_{self._model_instance.model}_{hash}"
+
+    def _put_local_embeddings(self, embeddings: dict[str, np.ndarray]) -> None:
+        if dify_config.EMBEDDING_CACHE_LOCAL_SIZE <= 0:
+            return
+        for hash, vector in embeddings.items():
+            _local_embedding_cache.put(self._cache_key(hash), vector)
+
+    def _get_redis_embeddings(self, hashes: set[str]) -> dict[str, np.ndarray]:
+        ordered_hashes = list(hashes)
+        try:
+            values = redis_client.mget([self._cache_key(hash) for hash in ordered_hashes])
+        except Exception:
+            logger.exception("Failed to get document embeddings from redis")
+            return {}
+
+        result: dict[str, np.ndarray] = {}
+        for hash, value in zip(ordered_hashes, values):
+            if value:
+                result[hash] = load_embedding(value)
+        return result
+
+    def _put_redis_embeddings(self, embeddings: dict[str, np.ndarray]) -> None:
+        if not embeddings or not dify_config.EMBEDDING_CACHE_REDIS_ENABLED:
+            return
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            for hash, vector in embeddings.items():
+                pipeline.setex(
+                    self._cache_key(hash),
+                    dify_config.EMBEDDING_CACHE_REDIS_TTL,
+                    encode_embedding(vector, dify_config.EMBEDDING_CACHE_STORAGE_DTYPE),
+                )
+            pipeline.execute()
+        except Exception:
+            logger.exception("Failed to add document embeddings to redis")
+
     def embed_query(self, text: str) -> list[float]:
         """Embed query text."""
+        return cast(list[float], self.embed_query_as_array(text).tolist())
+
+    def embed_query_as_array(self, text: str) -> np.ndarray:
+        """Embed query text as a float32 array."""
         # use doc embedding cache or store if not exists
         hash = helper.generate_text_hash(text)
         embedding_cache_key = f"{self._model_instance.provider}_{self._model_instance.model}_{hash}"
         embedding = redis_client.get(embedding_cache_key)
         if embedding:
             redis_client.expire(embedding_cache_key, 600)
-            decoded_embedding = np.frombuffer(base64.b64decode(embedding), dtype="float")
-            return [float(x) for x in decoded_embedding]
+            return load_embedding(embedding)
         try:
             embedding_result = self._model_instance.invoke_text_embedding(
                 texts=[text], user=self._user, input_type=EmbeddingInputType.QUERY
             )
 
-            embedding_results = embedding_result.embeddings[0]
-            # FIXME: type ignore for numpy here
-            embedding_results = (embedding_results / np.linalg.norm(embedding_results)).tolist()  # type: ignore
+            vector = np.asarray(embedding_result.embeddings[0], dtype=np.float64)
+            embedding_results = (vector / np.linalg.norm(vector)).astype(np.float32)
             if np.isnan(embedding_results).any():
                 raise ValueError("Normalized embedding is nan please try again")
         except Exception as ex:
@@ -126,14 +260,9 @@ class CacheEmbedding(Embeddings):
             raise ex
 
         try:
-            # encode embedding to base64
-            embedding_vector = np.array(embedding_results)
-            vector_bytes = embedding_vector.tobytes()
-            # Transform to Base64
-            encoded_vector = base64.b64encode(vector_bytes)
-            # Transform to string
-            encoded_str = encoded_vector.decode("utf-8")
-            redis_client.setex(embedding_cache_key, 600, encoded_str)
+            redis_client.setex(
+                embedding_cache_key, 600, encode_embedding(embedding_results, dify_config.EMBEDDING_CACHE_STORAGE_DTYPE)
+            )
         except Exception as ex:
             if dify_config.DEBUG:
                 logging.exception(f"Failed to add embedding to redis for the text '{text[:10]}...({len(text)} chars)'")
@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
 
+import numpy as np
+
 
 class Embeddings(ABC):
     """Interface for embedding models."""
@@ -14,6 +16,14 @@ class Embeddings(ABC):
         """Embed query text."""
         raise NotImplementedError
 
+    def embed_documents_as_array(self, texts: list[str]) -> list[np.ndarray]:
+        """Embed search docs as float32 arrays."""
+        return [np.asarray(embedding, dtype=np.float32) for embedding in self.embed_documents(texts)]
+
+    def embed_query_as_array(self, text: str) -> np.ndarray:
+        """Embed query text as a float32 array."""
+        return np.asarray(self.embed_query(text), dtype=np.float32)
+
     async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
         """Asynchronous Embed search docs."""
         raise NotImplementedError
@@ -0,0 +1,83 @@
+import base64
+import binascii
+import pickle
+import struct
+from typing import Literal, Union
+
+import numpy as np
+
+# Header layout (little-endian, 12 bytes):
+#   magic (4 bytes) | version (uint8) | dtype code (uint8) | reserved (uint16) | dimension (uint32)
+# The first magic byte is outside both the base64 alphabet and the pickle protocol opcode,
+# so legacy values can always be told apart from encoded ones.
+EMBEDDING_MAGIC = b"\x93DEV"
+EMBEDDING_FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sBBHI")
+_DTYPE_CODES: dict[str, int] = {"float32": 1, "float16": 2}
+_CODE_DTYPES: dict[int, np.dtype] = {1: np.dtype("<f4"), 2: np.dtype("<f2")}
+
+EmbeddingStorageDtype = Literal["float32", "float16"]
+
+
+class EmbeddingDecodeError(ValueError):
+    pass
+
+
+def encode_embedding(vector: Union[np.ndarray, list[float]], dtype: EmbeddingStorageDtype = "float32") -> bytes:
+    """
+    Encode an embedding vector as a version header followed by raw little-endian float bytes.
+    """
+    if dtype not in _DTYPE_CODES:
+        raise ValueError(f"Unsupported embedding storage dtype: {dtype}")
+    array = np.ascontiguousarray(vector, dtype=_CODE_DTYPES[_DTYPE_CODES[dtype]])
+    if array.ndim != 1:
+        raise ValueError("Only one-dimensional embeddings can be encoded")
+    header = _HEADER.pack(EMBEDDING_MAGIC, EMBEDDING_FORMAT_VERSION, _DTYPE_CODES[dtype], 0, array.shape[0])
+    return header + array.tobytes()
+
+
+def is_encoded_embedding(data: Union[bytes, memoryview, str]) -> bool:
+    return not isinstance(data, str) and len(data) >= _HEADER.size and bytes(data[:4]) == EMBEDDING_MAGIC
+
+
+def decode_embedding(data: Union[bytes, memoryview]) -> np.ndarray:
+    """
+    Decode an encoded embedding without copying the payload.
+
+    The returned array is a read-only view over `data`, values are widened to float32
+    only when they were stored as float16.
+    """
+    if not is_encoded_embedding(data):
+        raise EmbeddingDecodeError("Embedding is not in the binary embedding format")
+    _, version, dtype_code, _, dimension = _HEADER.unpack_from(data)
+    if version != EMBEDDING_FORMAT_VERSION:
+        raise EmbeddingDecodeError(f"Unsupported embedding format version: {version}")
+    if dtype_code not in _CODE_DTYPES:
+        raise EmbeddingDecodeError(f"Unsupported embedding dtype code: {dtype_code}")
+    array = np.frombuffer(data, dtype=_CODE_DTYPES[dtype_code], count=dimension, offset=_HEADER.size)
+    if array.dtype != np.float32:
+        array = array.astype(np.float32)
+    return array
+
+
+def decode_legacy_embedding(data: Union[bytes, str]) -> np.ndarray:
+    """
+    Decode embeddings written before the binary format existed: pickled lists from the
+    embeddings table and base64 encoded float64 bytes from the redis query cache.
+    """
+    if isinstance(data, bytes) and data[:1] == b"\x80":
+        return np.asarray(pickle.loads(data), dtype=np.float64)  # noqa: S301
+    try:
+        return np.frombuffer(base64.b64decode(data, validate=True), dtype=np.float64)
+    except (binascii.Error, ValueError) as e:
+        raise EmbeddingDecodeError("Unrecognized embedding format") from e
+
+
+def load_embedding(data: Union[bytes, memoryview, str]) -> np.ndarray:
+    """
+    Decode an embedding in either the binary format or one of the legacy formats.
+    """
+    if not isinstance(data, str) and is_encoded_embedding(data):
+        return decode_embedding(data)
+    return decode_legacy_embedding(bytes(data) if isinstance(data, memoryview) else data)
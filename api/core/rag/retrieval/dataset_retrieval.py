@@ -1,15 +1,19 @@
 import json
-import math
+import logging
 import re
 import threading
-from collections import Counter, defaultdict
+import time
+from collections import defaultdict
 from collections.abc import Generator, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import Any, Optional, Union, cast
 
 from flask import Flask, current_app
 from sqlalchemy import Integer, and_, or_, text
 from sqlalchemy import cast as sqlalchemy_cast
 
+from configs import dify_config
 from core.app.app_config.entities import (
     DatasetEntity,
     DatasetRetrieveConfigEntity,
@@ -33,8 +37,10 @@ from core.prompt.advanced_prompt_transform import AdvancedPromptTransform
 from core.prompt.entities.advanced_prompt_entities import ChatModelMessage, CompletionModelPromptTemplate
 from core.prompt.simple_prompt_transform import ModelMode
 from core.rag.data_post_processor.data_post_processor import DataPostProcessor
-from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
+from core.rag.datasource.keyword.jieba.keyword_scorer import KeywordScorer
 from core.rag.datasource.retrieval_service import RetrievalService
+from core.rag.embedding.cached_embedding import CacheEmbedding
+from core.rag.embedding.embedding_base import Embeddings
 from core.rag.entities.context_entities import DocumentContext
 from core.rag.entities.metadata_entities import Condition, MetadataCondition
 from core.rag.index_processor.constant.index_type import IndexType
@@ -67,6 +73,24 @@ default_retrieval_model: dict[str, Any] = {
     "score_threshold_enabled": False,
 }
 
+logger = logging.getLogger(__name__)
+
+_retrieval_executor: Optional[ThreadPoolExecutor] = None
+_retrieval_executor_lock = threading.Lock()
+
+
+def _get_retrieval_executor() -> ThreadPoolExecutor:
+    """
+    Executor shared by the multi-dataset retrievals of the process, created on first use.
+    """
+    global _retrieval_executor
+    with _retrieval_executor_lock:
+        if _retrieval_executor is None:
+            _retrieval_executor = ThreadPoolExecutor(
+                max_workers=dify_config.DATASET_RETRIEVAL_MAX_WORKERS, thread_name_prefix="dataset-retrieval"
+            )
+        return _retrieval_executor
+
 
 class DatasetRetrieval:
     def __init__(self, application_generate_entity=None):
@@ -413,7 +437,6 @@ class DatasetRetrieval:
     ):
         if not available_datasets:
             return []
-        threads = []
         all_documents: list[Document] = []
         dataset_ids = [dataset.id for dataset in available_datasets]
         index_type_check = all(
@@ -447,6 +470,7 @@ class DatasetRetrieval:
                     ].embedding_model_provider
                     weights["vector_setting"]["embedding_model_name"] = available_datasets[0].embedding_model
 
+        datasets_to_search = []
         for dataset in available_datasets:
             index_type = dataset.indexing_technique
             document_ids_filter = None
@@ -459,22 +483,43 @@ class DatasetRetrieval:
                         document_ids_filter = document_ids
                     else:
                         continue
-            retrieval_thread = threading.Thread(
-                target=self._retriever,
-                kwargs={
-                    "flask_app": current_app._get_current_object(),  # type: ignore
-                    "dataset_id": dataset.id,
-                    "query": query,
-                    "top_k": top_k,
-                    "all_documents": all_documents,
-                    "document_ids_filter": document_ids_filter,
-                    "metadata_condition": metadata_condition,
-                },
+            datasets_to_search.append((dataset, document_ids_filter))
+
+        query_embeddings = self._embed_query(tenant_id, [dataset for dataset, _ in datasets_to_search], query)
+        dataset_timings: list[dict[str, Any]] = []
+        futures = []
+        for dataset, document_ids_filter in datasets_to_search:
+            embeddings, query_vector = query_embeddings.get(
+                (dataset.embedding_model_provider, dataset.embedding_model), (None, None)
+            )
+            # collected per dataset, a dataset that timed out must not add documents while they are reranked
+            documents: list[Document] = []
+            future = _get_retrieval_executor().submit(
+                self._retriever,
+                flask_app=current_app._get_current_object(),  # type: ignore
+                dataset_id=dataset.id,
+                query=query,
+                top_k=top_k,
+                all_documents=documents,
+                document_ids_filter=document_ids_filter,
+                metadata_condition=metadata_condition,
+                embeddings=embeddings,
+                query_vector=query_vector,
+                dataset_timings=dataset_timings,
             )
-            threads.append(retrieval_thread)
-            retrieval_thread.start()
-        for thread in threads:
-            thread.join()
+            futures.append((dataset.id, future, documents))
+
+        deadline = time.perf_counter() + dify_config.DATASET_RETRIEVAL_TIMEOUT
+        for dataset_id, future, documents in futures:
+            try:
+                future.result(timeout=max(deadline - time.perf_counter(), 0))
+            except FutureTimeoutError:
+                future.cancel()
+                logger.warning("Retrieval from dataset %s timed out", dataset_id)
+                continue
+            except Exception:
+                logger.exception("Failed to retrieve from dataset %s", dataset_id)
+            all_documents.extend(documents)
 
         with measure_time() as timer:
             if reranking_enable:
@@ -493,12 +538,46 @@ class DatasetRetrieval:
         self._on_query(query, dataset_ids, app_id, user_from, user_id)
 
         if all_documents:
-            self._on_retrieval_end(all_documents, message_id, timer)
+            # datasets that timed out may still add their timings
+            self._on_retrieval_end(all_documents, message_id, timer, list(dataset_timings))
 
         return all_documents
 
+    def _embed_query(
+        self, tenant_id: str, datasets: list[Dataset], query: str
+    ) -> dict[tuple[str, str], tuple[Embeddings, list[float]]]:
+        """
+        Embed the query once per embedding model of the datasets that search by vector.
+        :return: embeddings and query vector by embedding model provider and name
+        """
+        embedding_models = set()
+        for dataset in datasets:
+            if dataset.provider == "external" or dataset.indexing_technique != "high_quality":
+                continue
+            retrieval_model = dataset.retrieval_model or default_retrieval_model
+            if RetrievalMethod.is_support_semantic_search(retrieval_model["search_method"]):
+                embedding_models.add((dataset.embedding_model_provider, dataset.embedding_model))
+
+        query_embeddings: dict[tuple[str, str], tuple[Embeddings, list[float]]] = {}
+        model_manager = ModelManager()
+        for provider, model in embedding_models:
+            try:
+                embedding_model = model_manager.get_model_instance(
+                    tenant_id=tenant_id, provider=provider, model_type=ModelType.TEXT_EMBEDDING, model=model
+                )
+                embeddings = CacheEmbedding(embedding_model)
+                query_embeddings[(provider, model)] = (embeddings, embeddings.embed_query(query))
+            except Exception:
+                # the datasets of the model resolve it themselves and report the error
+                logger.exception("Failed to embed query with %s/%s", provider, model)
+        return query_embeddings
+
     def _on_retrieval_end(
-        self, documents: list[Document], message_id: Optional[str] = None, timer: Optional[dict] = None
+        self,
+        documents: list[Document],
+        message_id: Optional[str] = None,
+        timer: Optional[dict] = None,
+        dataset_timings: Optional[list[dict[str, Any]]] = None,
     ) -> None:
         """Handle retrieval end."""
         dify_documents = [document for document in documents if document.provider == "dify"]
@@ -542,7 +621,11 @@ class DatasetRetrieval:
         if trace_manager:
             trace_manager.add_trace_task(
                 TraceTask(
-                    TraceTaskName.DATASET_RETRIEVAL_TRACE, message_id=message_id, documents=documents, timer=timer
+                    TraceTaskName.DATASET_RETRIEVAL_TRACE,
+                    message_id=message_id,
+                    documents=documents,
+                    timer=timer,
+                    dataset_timings=dataset_timings,
                 )
             )
 
@@ -576,6 +659,46 @@ class DatasetRetrieval:
         all_documents: list,
         document_ids_filter: Optional[list[str]] = None,
         metadata_condition: Optional[MetadataCondition] = None,
+        embeddings: Optional[Embeddings] = None,
+        query_vector: Optional[list[float]] = None,
+        dataset_timings: Optional[list[dict[str, Any]]] = None,
+    ):
+        start = time.perf_counter()
+        documents: list[Document] = []
+        try:
+            self._retrieve_dataset(
+                flask_app=flask_app,
+                dataset_id=dataset_id,
+                query=query,
+                top_k=top_k,
+                all_documents=documents,
+                document_ids_filter=document_ids_filter,
+                metadata_condition=metadata_condition,
+                embeddings=embeddings,
+                query_vector=query_vector,
+            )
+        finally:
+            all_documents.extend(documents)
+            if dataset_timings is not None:
+                dataset_timings.append(
+                    {
+                        "dataset_id": dataset_id,
+                        "elapsed": round(time.perf_counter() - start, 4),
+                        "documents": len(documents),
+                    }
+                )
+
+    def _retrieve_dataset(
+        self,
+        flask_app: Flask,
+        dataset_id: str,
+        query: str,
+        top_k: int,
+        all_documents: list,
+        document_ids_filter: Optional[list[str]] = None,
+        metadata_condition: Optional[MetadataCondition] = None,
+        embeddings: Optional[Embeddings] = None,
+        query_vector: Optional[list[float]] = None,
     ):
         with flask_app.app_context():
             dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
@@ -631,6 +754,8 @@ class DatasetRetrieval:
                             reranking_mode=retrieval_model.get("reranking_mode") or "reranking_model",
                             weights=retrieval_model.get("weights", None),
                             document_ids_filter=document_ids_filter,
+                            embeddings=embeddings,
+                            query_vector=query_vector,
                         )
 
                         all_documents.extend(documents)
@@ -733,69 +858,7 @@ class DatasetRetrieval:
 
         :return:
         """
-        keyword_table_handler = JiebaKeywordTableHandler()
-        query_keywords = keyword_table_handler.extract_keywords(query, None)
-        documents_keywords = []
-        for document in documents:
-            if document.metadata is not None:
-                # get the document keywords
-                document_keywords = keyword_table_handler.extract_keywords(document.page_content, None)
-                document.metadata["keywords"] = document_keywords
-                documents_keywords.append(document_keywords)
-
-        # Counter query keywords(TF)
-        query_keyword_counts = Counter(query_keywords)
-
-        # total documents
-        total_documents = len(documents)
-
-        # calculate all documents' keywords IDF
-        all_keywords = set()
-        for document_keywords in documents_keywords:
-            all_keywords.update(document_keywords)
-
-        keyword_idf = {}
-        for keyword in all_keywords:
-            # calculate include query keywords' documents
-            doc_count_containing_keyword = sum(1 for doc_keywords in documents_keywords if keyword in doc_keywords)
-            # IDF
-            keyword_idf[keyword] = math.log((1 + total_documents) / (1 + doc_count_containing_keyword)) + 1
-
-        query_tfidf = {}
-
-        for keyword, count in query_keyword_counts.items():
-            tf = count
-            idf = keyword_idf.get(keyword, 0)
-            query_tfidf[keyword] = tf * idf
-
-        # calculate all documents' TF-IDF
-        documents_tfidf = []
-        for document_keywords in documents_keywords:
-            document_keyword_counts = Counter(document_keywords)
-            document_tfidf = {}
-            for keyword, count in document_keyword_counts.items():
-                tf = count
-                idf = keyword_idf.get(keyword, 0)
-                document_tfidf[keyword] = tf * idf
-            documents_tfidf.append(document_tfidf)
-
-        def cosine_similarity(vec1, vec2):
-            intersection = set(vec1.keys()) & set(vec2.keys())
-            numerator = sum(vec1[x] * vec2[x] for x in intersection)
-
-            sum1 = sum(vec1[x] ** 2 for x in vec1)
-            sum2 = sum(vec2[x] ** 2 for x in vec2)
-            denominator = math.sqrt(sum1) * math.sqrt(sum2)
-
-            if not denominator:
-                return 0.0
-            else:
-                return float(numerator) / denominator
-
-        similarities = []
-        for document_tfidf in documents_tfidf:
-            similarity = cosine_similarity(query_tfidf, document_tfidf)
-            similarities.append(similarity)
+        similarities = KeywordScorer().score(query, documents)
 
         for document, score in zip(documents, similarities):
             # format document
@@ -1,5 +1,5 @@
 import json
-from collections.abc import Generator, Iterable
+from collections.abc import Callable, Generator, Iterable
 from copy import deepcopy
 from datetime import UTC, datetime
 from mimetypes import guess_type
@@ -54,9 +54,13 @@ class ToolEngine:
         conversation_id: Optional[str] = None,
         app_id: Optional[str] = None,
         message_id: Optional[str] = None,
+        keep_result: Optional[Callable[[], bool]] = None,
     ) -> tuple[str, list[str], ToolInvokeMeta]:
         """
         Agent invokes the tool with the given arguments.
+
+        `keep_result` is called once the tool returned, before its message files are created. When it returns False
+        the caller no longer waits for the result, e.g. the call timed out, and no message files are created.
         """
         # check if arguments is a string
         if isinstance(tool_parameters, str):
@@ -104,9 +108,12 @@ class ToolEngine:
             # extract binary data from tool invoke message
             binary_files = ToolEngine._extract_tool_response_binary_and_text(message_list)
             # create message file
-            message_files = ToolEngine._create_message_files(
-                tool_messages=binary_files, agent_message=message, invoke_from=invoke_from, user_id=user_id
-            )
+            if keep_result is not None and not keep_result():
+                message_files = []
+            else:
+                message_files = ToolEngine._create_message_files(
+                    tool_messages=binary_files, agent_message=message, invoke_from=invoke_from, user_id=user_id
+                )
 
             plain_text = ToolEngine._convert_tool_response_to_str(message_list)
 
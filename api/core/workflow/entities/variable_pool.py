@@ -1,9 +1,9 @@
 import re
 from collections import defaultdict
 from collections.abc import Mapping, Sequence
-from typing import Any, Union
+from typing import Any, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 from core.file import File, FileAttribute, file_manager
 from core.variables import Segment, SegmentGroup, Variable
@@ -42,6 +42,12 @@ class VariablePool(BaseModel):
         description="Conversation variables.",
         default_factory=list,
     )
+    # Set on overlays only, see `create_overlay`.
+    _parent: Optional["VariablePool"] = PrivateAttr(default=None)
+    _removed: set[tuple[str, int]] = PrivateAttr(default_factory=set)
+    _removed_node_ids: set[str] = PrivateAttr(default_factory=set)
+    # Set on snapshots only, see `snapshot`.
+    _frozen: bool = PrivateAttr(default=False)
 
     def __init__(
         self,
@@ -93,6 +99,8 @@ class VariablePool(BaseModel):
         """
         if len(selector) < 2:
             raise ValueError("Invalid selector")
+        if self._frozen:
+            raise ValueError("Variable pool snapshot is read-only")
 
         if isinstance(value, Variable):
             variable = value
@@ -104,6 +112,7 @@ class VariablePool(BaseModel):
 
         hash_key = hash(tuple(selector[1:]))
         self.variable_dictionary[selector[0]][hash_key] = variable
+        self._removed.discard((selector[0], hash_key))
 
     def get(self, selector: Sequence[str], /) -> Segment | None:
         """
@@ -122,7 +131,7 @@ class VariablePool(BaseModel):
             return None
 
         hash_key = hash(tuple(selector[1:]))
-        value = self.variable_dictionary[selector[0]].get(hash_key)
+        value = self._lookup(selector[0], hash_key)
 
         if value is None:
             selector, attr = selector[:-1], selector[-1]
@@ -152,11 +161,82 @@ class VariablePool(BaseModel):
         """
         if not selector:
             return
+        if self._frozen:
+            raise ValueError("Variable pool snapshot is read-only")
         if len(selector) == 1:
             self.variable_dictionary[selector[0]] = {}
+            if self._parent is not None:
+                self._removed_node_ids.add(selector[0])
             return
         hash_key = hash(tuple(selector[1:]))
         self.variable_dictionary[selector[0]].pop(hash_key, None)
+        if self._parent is not None:
+            self._removed.add((selector[0], hash_key))
+
+    def create_overlay(self, snapshot: Optional["VariablePool"] = None) -> "VariablePool":
+        """
+        Create a copy-on-write copy of the pool.
+
+        The overlay reads through to a snapshot of this pool and keeps its own writes and removals, so neither
+        pool sees the changes of the other. The segments are immutable and shared.
+
+        Args:
+            snapshot (Optional[VariablePool]): A snapshot of this pool taken with `snapshot`, shared by all the
+                overlays created from it. Taken now when not given.
+
+        Returns:
+            VariablePool: The overlay.
+        """
+        overlay = VariablePool.model_construct(
+            variable_dictionary=defaultdict(dict),
+            user_inputs=self.user_inputs,
+            system_variables=self.system_variables,
+            environment_variables=self.environment_variables,
+            conversation_variables=self.conversation_variables,
+        )
+        overlay._parent = snapshot if snapshot is not None else self.snapshot()
+        return overlay
+
+    def snapshot(self) -> "VariablePool":
+        """
+        Take a read-only snapshot of the pool, to share between the overlays of parallel iterations or branches.
+
+        The variable mappings are copied once here, an overlay created from the snapshot copies nothing.
+        """
+        if self._parent is None:
+            # list() copies the items at once, other branches may be adding variables concurrently
+            variables = {
+                node_id: dict(node_variables) for node_id, node_variables in list(self.variable_dictionary.items())
+            }
+        else:
+            # flatten the overlay chain, so lookups never go more than one level deep
+            variables = {
+                node_id: dict(node_variables)
+                for node_id, node_variables in self._parent.variable_dictionary.items()
+                if node_id not in self._removed_node_ids
+            }
+            for node_id, hash_key in self._removed:
+                variables.get(node_id, {}).pop(hash_key, None)
+            for node_id, node_variables in self.variable_dictionary.items():
+                variables.setdefault(node_id, {}).update(node_variables)
+
+        snapshot = VariablePool.model_construct(
+            variable_dictionary=defaultdict(dict, variables),
+            user_inputs=self.user_inputs,
+            system_variables=self.system_variables,
+            environment_variables=self.environment_variables,
+            conversation_variables=self.conversation_variables,
+        )
+        snapshot._frozen = True
+        return snapshot
+
+    def _lookup(self, node_id: str, hash_key: int) -> Segment | None:
+        node_variables = self.variable_dictionary.get(node_id)
+        if node_variables is not None and hash_key in node_variables:
+            return node_variables[hash_key]
+        if self._parent is None or node_id in self._removed_node_ids or (node_id, hash_key) in self._removed:
+            return None
+        return self._parent._lookup(node_id, hash_key)
 
     def convert_template(self, template: str, /):
         parts = VARIABLE_PATTERN.split(template)
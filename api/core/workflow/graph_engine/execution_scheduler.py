@@ -0,0 +1,234 @@
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from collections.abc import Callable, Generator
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Optional
+
+from configs import dify_config
+
+
+class WorkflowExecutionGroup:
+    """
+    Parallel work of one workflow run, or of a parallel iteration inside it, submitted to the shared scheduler.
+
+    A task of the group only starts while every group in its chain is below its `max_workers`.
+    """
+
+    def __init__(
+        self,
+        scheduler: "WorkflowExecutionScheduler",
+        tenant_id: str,
+        max_workers: int,
+        max_submit_count: int,
+        parent: Optional["WorkflowExecutionGroup"] = None,
+    ) -> None:
+        self.scheduler = scheduler
+        self.tenant_id = tenant_id
+        self.max_workers = max_workers
+        self.max_submit_count = max_submit_count
+        self.parent = parent
+        # both guarded by the scheduler lock
+        self.running = 0
+        self.submit_count = 0
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        return self.scheduler.submit(self, fn, *args, **kwargs)
+
+    def create_child(self, max_workers: int) -> "WorkflowExecutionGroup":
+        return WorkflowExecutionGroup(
+            scheduler=self.scheduler,
+            tenant_id=self.tenant_id,
+            max_workers=max_workers,
+            max_submit_count=self.max_submit_count,
+            parent=self,
+        )
+
+    def chain(self) -> Generator["WorkflowExecutionGroup", None, None]:
+        group: Optional[WorkflowExecutionGroup] = self
+        while group is not None:
+            yield group
+            group = group.parent
+
+
+class _ScheduledTask:
+    __slots__ = ("args", "fn", "future", "group", "kwargs", "queued_at")
+
+    def __init__(self, group: WorkflowExecutionGroup, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        self.group = group
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future: Future = Future()
+        self.queued_at = 0.0
+
+
+class WorkflowExecutionScheduler:
+    """
+    Process-wide scheduler for parallel branches and parallel iterations of all workflow runs.
+
+    At most `max_workers` tasks run at once, at most `max_workers_per_tenant` of them for one tenant, and
+    tasks waiting for a slot are started round-robin across tenants. A task submitted from inside a running
+    task, which is how nested engines submit work, runs inline on the submitting thread when it cannot start
+    right away: the submitter already holds a slot and waits for the result, so queueing it could deadlock.
+    """
+
+    def __init__(self, max_workers: int, max_workers_per_tenant: int) -> None:
+        self._max_workers = max_workers
+        self._max_workers_per_tenant = max_workers_per_tenant
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="workflow-scheduler")
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._running = 0
+        self._running_per_tenant: Counter[str] = Counter()
+        self._queues: OrderedDict[str, deque[_ScheduledTask]] = OrderedDict()
+        self.submitted = 0
+        self.queued = 0
+        self.inlined = 0
+        self.queue_wait_seconds = 0.0
+
+    def create_group(self, tenant_id: str, max_workers: int, max_submit_count: int) -> WorkflowExecutionGroup:
+        return WorkflowExecutionGroup(
+            scheduler=self, tenant_id=tenant_id, max_workers=max_workers, max_submit_count=max_submit_count
+        )
+
+    def submit(self, group: WorkflowExecutionGroup, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        task = _ScheduledTask(group, fn, args, kwargs)
+        with self._lock:
+            for g in group.chain():
+                if g.submit_count >= g.max_submit_count:
+                    raise ValueError(f"Max submit count {g.max_submit_count} of workflow thread pool reached.")
+            for g in group.chain():
+                g.submit_count += 1
+            self.submitted += 1
+
+            if self._can_start(group):
+                self._acquire(group)
+                start = True
+            elif getattr(self._local, "in_task", False):
+                self.inlined += 1
+                start = False
+            else:
+                task.queued_at = time.perf_counter()
+                self._queues.setdefault(group.tenant_id, deque()).append(task)
+                self.queued += 1
+                return task.future
+
+        if start:
+            self._executor.submit(self._run, task)
+        else:
+            self._run_inline(task)
+        return task.future
+
+    def metrics(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                "running": self._running,
+                "waiting": sum(len(tasks) for tasks in self._queues.values()),
+                "submitted": self.submitted,
+                "queued": self.queued,
+                "inlined": self.inlined,
+                "queue_wait_seconds": self.queue_wait_seconds,
+            }
+
+    def _can_start(self, group: WorkflowExecutionGroup) -> bool:
+        if self._running >= self._max_workers:
+            return False
+        if self._running_per_tenant[group.tenant_id] >= self._max_workers_per_tenant:
+            return False
+        return all(g.running < g.max_workers for g in group.chain())
+
+    def _acquire(self, group: WorkflowExecutionGroup) -> None:
+        self._running += 1
+        self._running_per_tenant[group.tenant_id] += 1
+        for g in group.chain():
+            g.running += 1
+
+    def _release(self, group: WorkflowExecutionGroup, acquired: bool) -> None:
+        with self._lock:
+            for g in group.chain():
+                g.submit_count -= 1
+            if not acquired:
+                return
+
+            self._running -= 1
+            self._running_per_tenant[group.tenant_id] -= 1
+            if not self._running_per_tenant[group.tenant_id]:
+                del self._running_per_tenant[group.tenant_id]
+            for g in group.chain():
+                g.running -= 1
+            tasks = self._pop_startable()
+
+        for task in tasks:
+            self._executor.submit(self._run, task)
+
+    def _pop_startable(self) -> list[_ScheduledTask]:
+        """
+        Take waiting tasks that can start now, one tenant at a time. Must be called with the lock held.
+        """
+        tasks = []
+        started = True
+        while started and self._running < self._max_workers:
+            started = False
+            for tenant_id in list(self._queues):
+                queue = self._queues[tenant_id]
+                task = self._pop_first_startable(queue)
+                if not queue:
+                    del self._queues[tenant_id]
+                if task is None:
+                    continue
+
+                self._acquire(task.group)
+                self.queue_wait_seconds += time.perf_counter() - task.queued_at
+                tasks.append(task)
+                if tenant_id in self._queues:
+                    # let the other tenants go first next time
+                    self._queues.move_to_end(tenant_id)
+                started = True
+                break
+        return tasks
+
+    def _pop_first_startable(self, queue: deque[_ScheduledTask]) -> Optional[_ScheduledTask]:
+        for task in list(queue):
+            if task.future.cancelled():
+                queue.remove(task)
+                for g in task.group.chain():
+                    g.submit_count -= 1
+                continue
+            if self._can_start(task.group):
+                queue.remove(task)
+                return task
+            if self._running_per_tenant[task.group.tenant_id] >= self._max_workers_per_tenant:
+                return None
+        return None
+
+    def _run(self, task: _ScheduledTask) -> None:
+        self._local.in_task = True
+        try:
+            self._execute(task)
+        finally:
+            self._local.in_task = False
+            self._release(task.group, acquired=True)
+
+    def _run_inline(self, task: _ScheduledTask) -> None:
+        try:
+            self._execute(task)
+        finally:
+            self._release(task.group, acquired=False)
+
+    @staticmethod
+    def _execute(task: _ScheduledTask) -> None:
+        if not task.future.set_running_or_notify_cancel():
+            return
+        try:
+            result = task.fn(*task.args, **task.kwargs)
+        except BaseException as e:
+            task.future.set_exception(e)
+        else:
+            task.future.set_result(result)
+
+
+workflow_execution_scheduler = WorkflowExecutionScheduler(
+    max_workers=dify_config.WORKFLOW_SCHEDULER_MAX_WORKERS,
+    max_workers_per_tenant=dify_config.WORKFLOW_SCHEDULER_MAX_WORKERS_PER_TENANT,
+)
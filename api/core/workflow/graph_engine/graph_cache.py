@@ -0,0 +1,75 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Mapping
+from typing import Any, NamedTuple
+
+from configs import dify_config
+from core.workflow.graph_engine.entities.graph import Graph
+from models.workflow import Workflow
+
+
+class CompiledWorkflowGraph(NamedTuple):
+    graph_config: Mapping[str, Any]
+    graph: Graph
+
+
+class WorkflowGraphCache:
+    """
+    Process-wide LRU cache of parsed and analysed workflow graphs.
+
+    Entries are keyed by workflow id and a hash of the stored graph, so an edited draft gets a new entry.
+    Cached graphs and configs are shared between runs and must not be mutated.
+    """
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._entries: OrderedDict[tuple[str, str], CompiledWorkflowGraph] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(
+        self, workflow: Workflow, init_graph: Callable[[Mapping[str, Any]], Graph] = Graph.init
+    ) -> CompiledWorkflowGraph:
+        """
+        Get the compiled graph of a workflow, building it with `init_graph` on a miss.
+        """
+        key = (workflow.id, hashlib.sha256((workflow.graph or "").encode("utf-8")).hexdigest())
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+
+        graph_config = workflow.graph_dict
+        compiled = CompiledWorkflowGraph(graph_config=graph_config, graph=init_graph(graph_config))
+        if self._max_size <= 0:
+            return compiled
+
+        with self._lock:
+            self._entries[key] = compiled
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return compiled
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+workflow_graph_cache = WorkflowGraphCache(max_size=dify_config.WORKFLOW_GRAPH_CACHE_SIZE)
@@ -4,8 +4,8 @@ import queue
 import time
 import uuid
 from collections.abc import Generator, Mapping
-from concurrent.futures import ThreadPoolExecutor, wait
-from copy import copy, deepcopy
+from concurrent.futures import wait
+from copy import copy
 from datetime import UTC, datetime
 from typing import Any, Optional, cast
 
@@ -41,6 +41,7 @@ from core.workflow.graph_engine.entities.graph import Graph, GraphEdge
 from core.workflow.graph_engine.entities.graph_init_params import GraphInitParams
 from core.workflow.graph_engine.entities.graph_runtime_state import GraphRuntimeState
 from core.workflow.graph_engine.entities.runtime_route_state import RouteNodeState
+from core.workflow.graph_engine.execution_scheduler import WorkflowExecutionGroup, workflow_execution_scheduler
 from core.workflow.nodes import NodeType
 from core.workflow.nodes.agent.agent_node import AgentNode
 from core.workflow.nodes.agent.entities import AgentNodeData
@@ -59,35 +60,8 @@ from models.workflow import WorkflowNodeExecutionStatus, WorkflowType
 logger = logging.getLogger(__name__)
 
 
-class GraphEngineThreadPool(ThreadPoolExecutor):
-    def __init__(
-        self,
-        max_workers=None,
-        thread_name_prefix="",
-        initializer=None,
-        initargs=(),
-        max_submit_count=dify_config.MAX_SUBMIT_COUNT,
-    ) -> None:
-        super().__init__(max_workers, thread_name_prefix, initializer, initargs)
-        self.max_submit_count = max_submit_count
-        self.submit_count = 0
-
-    def submit(self, fn, /, *args, **kwargs):
-        self.submit_count += 1
-        self.check_is_full()
-
-        return super().submit(fn, *args, **kwargs)
-
-    def task_done_callback(self, future):
-        self.submit_count -= 1
-
-    def check_is_full(self) -> None:
-        if self.submit_count > self.max_submit_count:
-            raise ValueError(f"Max submit count {self.max_submit_count} of workflow thread pool reached.")
-
-
 class GraphEngine:
-    workflow_thread_pool_mapping: dict[str, GraphEngineThreadPool] = {}
+    workflow_thread_pool_mapping: dict[str, WorkflowExecutionGroup] = {}
 
     def __init__(
         self,
@@ -107,23 +81,24 @@ class GraphEngine:
         thread_pool_id: Optional[str] = None,
     ) -> None:
         thread_pool_max_submit_count = dify_config.MAX_SUBMIT_COUNT
-        thread_pool_max_workers = 10
 
-        # init thread pool
+        # init execution group, nested engines share the group of the workflow run
         if thread_pool_id:
             if thread_pool_id not in GraphEngine.workflow_thread_pool_mapping:
                 raise ValueError(f"Max submit count {thread_pool_max_submit_count} of workflow thread pool reached.")
 
             self.thread_pool_id = thread_pool_id
-            self.thread_pool = GraphEngine.workflow_thread_pool_mapping[thread_pool_id]
+            self.execution_group = GraphEngine.workflow_thread_pool_mapping[thread_pool_id]
             self.is_main_thread_pool = False
         else:
-            self.thread_pool = GraphEngineThreadPool(
-                max_workers=thread_pool_max_workers, max_submit_count=thread_pool_max_submit_count
+            self.execution_group = workflow_execution_scheduler.create_group(
+                tenant_id=tenant_id,
+                max_workers=dify_config.WORKFLOW_SCHEDULER_MAX_WORKERS_PER_RUN,
+                max_submit_count=thread_pool_max_submit_count,
             )
             self.thread_pool_id = str(uuid.uuid4())
             self.is_main_thread_pool = True
-            GraphEngine.workflow_thread_pool_mapping[self.thread_pool_id] = self.thread_pool
+            GraphEngine.workflow_thread_pool_mapping[self.thread_pool_id] = self.execution_group
 
         self.graph = graph
         self.init_params = GraphInitParams(
@@ -477,7 +452,7 @@ class GraphEngine:
             ):
                 continue
 
-            future = self.thread_pool.submit(
+            future = self.execution_group.submit(
                 self._run_parallel_node,
                 **{
                     "flask_app": current_app._get_current_object(),  # type: ignore[attr-defined]
@@ -491,8 +466,6 @@ class GraphEngine:
                 },
             )
 
-            future.add_done_callback(self.thread_pool.task_done_callback)
-
             futures.append(future)
 
         succeeded_count = 0
@@ -872,14 +845,17 @@ class GraphEngine:
         """
         return time.perf_counter() - start_at > max_execution_time
 
-    def create_copy(self):
+    def create_copy(self, variable_pool_snapshot: Optional[VariablePool] = None):
         """
         create a graph engine copy
+        :param variable_pool_snapshot: snapshot of the variable pool shared by the copies, taken now when not given
         :return: graph engine with a new variable pool and initialized total tokens
         """
         new_instance = copy(self)
         new_instance.graph_runtime_state = copy(self.graph_runtime_state)
-        new_instance.graph_runtime_state.variable_pool = deepcopy(self.graph_runtime_state.variable_pool)
+        new_instance.graph_runtime_state.variable_pool = self.graph_runtime_state.variable_pool.create_overlay(
+            variable_pool_snapshot
+        )
         new_instance.graph_runtime_state.total_tokens = 0
         return new_instance
 
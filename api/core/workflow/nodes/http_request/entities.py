@@ -96,9 +96,11 @@ class Response:
     headers: dict[str, str]
     response: httpx.Response
 
-    def __init__(self, response: httpx.Response):
+    def __init__(self, response: httpx.Response, content: Optional[bytes] = None):
         self.response = response
         self.headers = dict(response.headers)
+        # body read from a streamed response, the response itself holds no content then
+        self._content = content
 
     @property
     def is_file(self):
@@ -134,7 +136,7 @@ class Response:
             # Try to detect if content is text-based by sampling first few bytes
             try:
                 # Sample first 1024 bytes for text detection
-                content_sample = self.response.content[:1024]
+                content_sample = self.content[:1024]
                 content_sample.decode("utf-8")
                 # If we can decode as UTF-8 and find common text patterns, likely not a file
                 text_markers = (b"{", b"[", b"<", b"function", b"var ", b"const ", b"let ")
@@ -158,10 +160,14 @@ class Response:
 
     @property
     def text(self) -> str:
+        if self._content is not None:
+            return self._content.decode(self.response.encoding or "utf-8", errors="replace")
         return self.response.text
 
     @property
     def content(self) -> bytes:
+        if self._content is not None:
+            return self._content
         return self.response.content
 
     @property
@@ -36,6 +36,9 @@ BODY_TYPE_TO_CONTENT_TYPE = {
     "raw-text": "text/plain",
 }
 
+# number of leading response bytes sampled to tell text from files
+CONTENT_SAMPLE_SIZE = 1024
+
 
 class Executor:
     method: Literal[
@@ -266,21 +269,41 @@ class Executor:
         return headers
 
     def _validate_and_parse_response(self, response: httpx.Response) -> Response:
-        executor_response = Response(response)
-
-        threshold_size = (
-            dify_config.HTTP_REQUEST_NODE_MAX_BINARY_SIZE
-            if executor_response.is_file
-            else dify_config.HTTP_REQUEST_NODE_MAX_TEXT_SIZE
-        )
-        if executor_response.size > threshold_size:
-            raise ResponseSizeError(
-                f"{'File' if executor_response.is_file else 'Text'} size is too large,"
-                f" max size is {threshold_size / 1024 / 1024:.2f} MB,"
-                f" but current size is {executor_response.readable_size}."
+        """
+        Read the streamed response body, aborting as soon as it exceeds the max size of its kind.
+        """
+        try:
+            chunks = response.iter_bytes()
+            # the first bytes tell text from files, see Response.is_file
+            content = bytearray()
+            for chunk in chunks:
+                content += chunk
+                if len(content) >= CONTENT_SAMPLE_SIZE:
+                    break
+
+            is_file = Response(response, content=bytes(content)).is_file
+            threshold_size = (
+                dify_config.HTTP_REQUEST_NODE_MAX_BINARY_SIZE
+                if is_file
+                else dify_config.HTTP_REQUEST_NODE_MAX_TEXT_SIZE
             )
+            content_length = response.headers.get("content-length", "")
+            if content_length.isdigit() and int(content_length) > threshold_size:
+                raise _response_size_error(is_file, threshold_size, int(content_length))
+
+            if len(content) <= threshold_size:
+                for chunk in chunks:
+                    content += chunk
+                    if len(content) > threshold_size:
+                        break
+            if len(content) > threshold_size:
+                raise _response_size_error(is_file, threshold_size, len(content), partial=True)
+        except httpx.RequestError as e:
+            raise HttpRequestNodeError(str(e))
+        finally:
+            response.close()
 
-        return executor_response
+        return Response(response, content=bytes(content))
 
     def _do_http_request(self, headers: dict[str, Any]) -> httpx.Response:
         """
@@ -315,6 +338,7 @@ class Executor:
             "timeout": (self.timeout.connect, self.timeout.read, self.timeout.write),
             "follow_redirects": True,
             "max_retries": self.max_retries,
+            "stream": True,
         }
         # request_args = {k: v for k, v in request_args.items() if v is not None}
         try:
@@ -405,6 +429,14 @@ class Executor:
         return raw
 
 
+def _response_size_error(is_file: bool, threshold_size: int, size: int, partial: bool = False) -> ResponseSizeError:
+    return ResponseSizeError(
+        f"{'File' if is_file else 'Text'} size is too large,"
+        f" max size is {threshold_size / 1024 / 1024:.2f} MB,"
+        f" but current size is {'more than ' if partial else ''}{size / 1024 / 1024:.2f} MB."
+    )
+
+
 def _generate_random_string(n: int) -> str:
     """
     Generate a random string of lowercase ASCII letters.
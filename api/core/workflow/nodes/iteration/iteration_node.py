@@ -120,7 +120,7 @@ class IterationNode(BaseNode[IterationNodeData]):
         variable_pool.add([self.node_id, "item"], iterator_list_value[0])
 
         # init graph engine
-        from core.workflow.graph_engine.graph_engine import GraphEngine, GraphEngineThreadPool
+        from core.workflow.graph_engine.graph_engine import GraphEngine
 
         graph_engine = GraphEngine(
             tenant_id=self.tenant_id,
@@ -167,11 +167,13 @@ class IterationNode(BaseNode[IterationNodeData]):
             if self.node_data.is_parallel:
                 futures: list[Future] = []
                 q: Queue = Queue()
-                thread_pool = GraphEngineThreadPool(
-                    max_workers=self.node_data.parallel_nums, max_submit_count=dify_config.MAX_SUBMIT_COUNT
+                execution_group = graph_engine.execution_group.create_child(
+                    max_workers=max(self.node_data.parallel_nums, 1)
                 )
+                # one snapshot shared by the items, each item copies only the variables it writes
+                variable_pool_snapshot = variable_pool.snapshot()
                 for index, item in enumerate(iterator_list_value):
-                    future: Future = thread_pool.submit(
+                    future: Future = execution_group.submit(
                         self._run_single_iter_parallel,
                         flask_app=current_app._get_current_object(),  # type: ignore
                         q=q,
@@ -185,8 +187,8 @@ class IterationNode(BaseNode[IterationNodeData]):
                         index=index,
                         item=item,
                         iter_run_map=iter_run_map,
+                        variable_pool_snapshot=variable_pool_snapshot,
                     )
-                    future.add_done_callback(thread_pool.task_done_callback)
                     futures.append(future)
                 succeeded_count = 0
                 while True:
@@ -581,6 +583,7 @@ class IterationNode(BaseNode[IterationNodeData]):
         index: int,
         item: Any,
         iter_run_map: dict[str, float],
+        variable_pool_snapshot: Optional[VariablePool] = None,
     ):
         """
         run single iteration in parallel mode
@@ -589,7 +592,7 @@ class IterationNode(BaseNode[IterationNodeData]):
             var.set(val)
         with flask_app.app_context():
             parallel_mode_run_id = uuid.uuid4().hex
-            graph_engine_copy = graph_engine.create_copy()
+            graph_engine_copy = graph_engine.create_copy(variable_pool_snapshot)
             variable_pool_copy = graph_engine_copy.graph_runtime_state.variable_pool
             variable_pool_copy.add([self.node_id, "index"], index)
             variable_pool_copy.add([self.node_id, "item"], item)
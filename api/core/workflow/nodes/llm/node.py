@@ -1,7 +1,6 @@
 import json
 import logging
 from collections.abc import Generator, Mapping, Sequence
-from datetime import UTC, datetime
 from typing import TYPE_CHECKING, Any, Optional, cast
 
 from configs import dify_config
@@ -11,6 +10,7 @@ from core.entities.provider_entities import QuotaUnit
 from core.errors.error import ModelCurrentlyNotSupportError, ProviderTokenNotInitError, QuotaExceededError
 from core.file import FileType, file_manager
 from core.helper.code_executor import CodeExecutor, CodeLanguage
+from core.helper.provider_quota_ledger import provider_quota_ledger
 from core.memory.token_buffer_memory import TokenBufferMemory
 from core.model_manager import ModelInstance, ModelManager
 from core.model_runtime.entities import (
@@ -60,7 +60,7 @@ from core.workflow.nodes.event import (
 from core.workflow.utils.variable_template_parser import VariableTemplateParser
 from extensions.ext_database import db
 from models.model import Conversation
-from models.provider import Provider, ProviderType
+from models.provider import ProviderType
 from models.workflow import WorkflowNodeExecutionStatus
 
 from .entities import (
@@ -758,20 +758,13 @@ class LLMNode(BaseNode[LLMNodeData]):
                 used_quota = 1
 
         if used_quota is not None and system_configuration.current_quota_type is not None:
-            db.session.query(Provider).filter(
-                Provider.tenant_id == tenant_id,
+            provider_quota_ledger.deduct(
+                tenant_id=tenant_id,
                 # TODO: Use provider name with prefix after the data migration.
-                Provider.provider_name == ModelProviderID(model_instance.provider).provider_name,
-                Provider.provider_type == ProviderType.SYSTEM.value,
-                Provider.quota_type == system_configuration.current_quota_type.value,
-                Provider.quota_limit > Provider.quota_used,
-            ).update(
-                {
-                    "quota_used": Provider.quota_used + used_quota,
-                    "last_used": datetime.now(tz=UTC).replace(tzinfo=None),
-                }
+                provider_name=ModelProviderID(model_instance.provider).provider_name,
+                quota_type=system_configuration.current_quota_type.value,
+                used_quota=used_quota,
             )
-            db.session.commit()
 
     @classmethod
     def _extract_variable_selector_to_variable_mapping(
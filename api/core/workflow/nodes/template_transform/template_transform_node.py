@@ -2,7 +2,9 @@ import os
 from collections.abc import Mapping, Sequence
 from typing import Any, Optional
 
+from configs import dify_config
 from core.helper.code_executor.code_executor import CodeExecutionError, CodeExecutor, CodeLanguage
+from core.helper.code_executor.jinja2.jinja2_sandbox import jinja2_sandbox
 from core.workflow.entities.node_entities import NodeRunResult
 from core.workflow.nodes.base import BaseNode
 from core.workflow.nodes.enums import NodeType
@@ -37,9 +39,18 @@ class TemplateTransformNode(BaseNode[TemplateTransformNodeData]):
             variables[variable_name] = value.to_object() if value else None
         # Run code
         try:
-            result = CodeExecutor.execute_workflow_code_template(
-                language=CodeLanguage.JINJA2, code=self.node_data.template, inputs=variables
-            )
+            if dify_config.TEMPLATE_TRANSFORM_IN_PROCESS_ENABLED:
+                result = {
+                    "result": jinja2_sandbox.render(
+                        template=self.node_data.template,
+                        inputs=variables,
+                        max_output_length=MAX_TEMPLATE_TRANSFORM_OUTPUT_LENGTH,
+                    )
+                }
+            else:
+                result = CodeExecutor.execute_workflow_code_template(
+                    language=CodeLanguage.JINJA2, code=self.node_data.template, inputs=variables
+                )
         except CodeExecutionError as e:
             return NodeRunResult(inputs=variables, status=WorkflowNodeExecutionStatus.FAILED, error=str(e))
 
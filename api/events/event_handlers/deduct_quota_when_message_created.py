@@ -1,12 +1,10 @@
-from datetime import UTC, datetime
-
 from configs import dify_config
 from core.app.entities.app_invoke_entities import AgentChatAppGenerateEntity, ChatAppGenerateEntity
 from core.entities.provider_entities import QuotaUnit
+from core.helper.provider_quota_ledger import provider_quota_ledger
 from core.plugin.entities.plugin import ModelProviderID
 from events.message_event import message_was_created
-from extensions.ext_database import db
-from models.provider import Provider, ProviderType
+from models.provider import ProviderType
 
 
 @message_was_created.connect
@@ -49,17 +47,10 @@ def handle(sender, **kwargs):
             used_quota = 1
 
     if used_quota is not None and system_configuration.current_quota_type is not None:
-        db.session.query(Provider).filter(
-            Provider.tenant_id == application_generate_entity.app_config.tenant_id,
+        provider_quota_ledger.deduct(
+            tenant_id=application_generate_entity.app_config.tenant_id,
             # TODO: Use provider name with prefix after the data migration.
-            Provider.provider_name == ModelProviderID(model_config.provider).provider_name,
-            Provider.provider_type == ProviderType.SYSTEM.value,
-            Provider.quota_type == system_configuration.current_quota_type.value,
-            Provider.quota_limit > Provider.quota_used,
-        ).update(
-            {
-                "quota_used": Provider.quota_used + used_quota,
-                "last_used": datetime.now(tz=UTC).replace(tzinfo=None),
-            }
+            provider_name=ModelProviderID(model_config.provider).provider_name,
+            quota_type=system_configuration.current_quota_type.value,
+            used_quota=used_quota,
         )
-        db.session.commit()
@@ -65,3 +65,22 @@ def init_app(app: DifyApp):
             "connection_timeout": engine.pool.timeout(),  # type: ignore
             "recycle_time": db.engine.pool._recycle,  # type: ignore
         }
+
+    @app.route("/plugin-daemon-pool-stat")
+    def plugin_daemon_pool_stat():
+        from core.plugin.manager.http_client import plugin_daemon_pool_metrics
+
+        return {
+            "pid": os.getpid(),
+            "max_connections": dify_config.PLUGIN_DAEMON_MAX_CONNECTIONS,
+            **plugin_daemon_pool_metrics.snapshot(),
+        }
+
+    @app.route("/vector-pool-stat")
+    def vector_pool_stat():
+        from core.rag.datasource.vdb.vector_client_registry import vector_client_registry
+
+        return {
+            "pid": os.getpid(),
+            **vector_client_registry.metrics(),
+        }
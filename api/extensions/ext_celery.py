@@ -70,6 +70,7 @@ def init_app(app: DifyApp) -> Celery:
         "schedule.update_tidb_serverless_status_task",
         "schedule.clean_messages",
         "schedule.mail_clean_document_notify_task",
+        "schedule.flush_provider_quota_task",
     ]
     day = dify_config.CELERY_BEAT_SCHEDULER_TIME
     beat_schedule = {
@@ -98,6 +99,11 @@ def init_app(app: DifyApp) -> Celery:
             "task": "schedule.mail_clean_document_notify_task.mail_clean_document_notify_task",
             "schedule": crontab(minute="0", hour="10", day_of_week="1"),
         },
+        # write quota usage still buffered for providers without recent model calls
+        "flush_provider_quota_task": {
+            "task": "schedule.flush_provider_quota_task.flush_provider_quota_task",
+            "schedule": timedelta(minutes=1),
+        },
     }
     celery_app.conf.update(beat_schedule=beat_schedule, imports=imports)
 
@@ -3,6 +3,7 @@ from dify_app import DifyApp
 
 def init_app(app: DifyApp):
     from commands import (
+        add_pgvector_document_id_column,
         add_qdrant_index,
         clear_free_plan_tenant_expired_logs,
         convert_to_agent_apps,
@@ -12,6 +13,7 @@ def init_app(app: DifyApp):
         fix_app_site_missing,
         install_plugins,
         migrate_data_for_plugin,
+        migrate_embedding_format,
         old_metadata_migration,
         reset_email,
         reset_encrypt_key_pair,
@@ -36,6 +38,8 @@ def init_app(app: DifyApp):
         install_plugins,
         old_metadata_migration,
         clear_free_plan_tenant_expired_logs,
+        migrate_embedding_format,
+        add_pgvector_document_id_column,
     ]
     for cmd in cmds_to_register:
         app.cli.add_command(cmd)
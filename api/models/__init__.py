@@ -14,6 +14,7 @@ from .dataset import (
     Dataset,
     DatasetCollectionBinding,
     DatasetKeywordTable,
+    DatasetKeywordTableLog,
     DatasetPermission,
     DatasetPermissionEnum,
     DatasetProcessRule,
@@ -118,6 +119,7 @@ __all__ = [
     "Dataset",
     "DatasetCollectionBinding",
     "DatasetKeywordTable",
+    "DatasetKeywordTableLog",
     "DatasetPermission",
     "DatasetPermissionEnum",
     "DatasetProcessRule",
@@ -5,17 +5,18 @@ import hmac
 import json
 import logging
 import os
-import pickle
 import re
 import time
 from json import JSONDecodeError
-from typing import Any, cast
+from typing import Any, Union, cast
 
+import numpy as np
 from sqlalchemy import func
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped
 
 from configs import dify_config
+from core.rag.embedding.embedding_codec import encode_embedding, load_embedding
 from core.rag.index_processor.constant.built_in_field import BuiltInField, MetadataDataSource
 from core.rag.retrieval.retrieval_methods import RetrievalMethod
 from extensions.ext_storage import storage
@@ -889,6 +890,25 @@ class DatasetKeywordTable(db.Model):  # type: ignore[name-defined]
                 return None
 
 
+class DatasetKeywordTableLog(db.Model):  # type: ignore[name-defined]
+    """
+    Append-only keyword table changes, folded into the dataset keyword table on compaction.
+    """
+
+    __tablename__ = "dataset_keyword_table_logs"
+    __table_args__ = (
+        db.PrimaryKeyConstraint("id", name="dataset_keyword_table_log_pkey"),
+        db.Index("dataset_keyword_table_log_dataset_id_idx", "dataset_id", "id"),
+    )
+
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    dataset_id = db.Column(StringUUID, nullable=False)
+    node_id = db.Column(db.String(255), nullable=False)
+    action = db.Column(db.String(16), nullable=False)
+    keywords = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=func.current_timestamp())
+
+
 class Embedding(db.Model):  # type: ignore[name-defined]
     __tablename__ = "embeddings"
     __table_args__ = (
@@ -906,11 +926,15 @@ class Embedding(db.Model):  # type: ignore[name-defined]
     created_at = db.Column(db.DateTime, nullable=False, server_default=func.current_timestamp())
     provider_name = db.Column(db.String(255), nullable=False, server_default=db.text("''::character varying"))
 
-    def set_embedding(self, embedding_data: list[float]):
-        self.embedding = pickle.dumps(embedding_data, protocol=pickle.HIGHEST_PROTOCOL)
+    def set_embedding(self, embedding_data: Union[list[float], np.ndarray]):
+        self.embedding = encode_embedding(embedding_data, dify_config.EMBEDDING_CACHE_STORAGE_DTYPE)
 
     def get_embedding(self) -> list[float]:
-        return cast(list[float], pickle.loads(self.embedding))  # noqa: S301
+        return cast(list[float], self.get_embedding_array().tolist())
+
+    def get_embedding_array(self) -> np.ndarray:
+        # rows written before the binary format are still stored as pickled lists
+        return load_embedding(self.embedding)
 
 
 class DatasetCollectionBinding(db.Model):  # type: ignore[name-defined]
@@ -0,0 +1,15 @@
+import time
+
+import click
+
+import app
+from core.helper.provider_quota_ledger import provider_quota_ledger
+
+
+@app.celery.task(queue="dataset")
+def flush_provider_quota_task():
+    click.echo(click.style("Start flush provider quota usage.", fg="green"))
+    start_at = time.perf_counter()
+    provider_quota_ledger.flush_all()
+    end_at = time.perf_counter()
+    click.echo(click.style("Flushed provider quota usage latency: {}".format(end_at - start_at), fg="green"))
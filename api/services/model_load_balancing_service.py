@@ -8,6 +8,7 @@ from constants import HIDDEN_VALUE
 from core.entities.provider_configuration import ProviderConfiguration
 from core.helper import encrypter
 from core.helper.model_provider_cache import ProviderCredentialsCache, ProviderCredentialsCacheType
+from core.helper.provider_configurations_cache import provider_configurations_cache
 from core.model_manager import LBModelManager
 from core.model_runtime.entities.model_entities import ModelType
 from core.model_runtime.entities.provider_entities import (
@@ -276,6 +277,7 @@ class ModelLoadBalancingService:
         )
         db.session.add(inherit_config)
         db.session.commit()
+        provider_configurations_cache.invalidate(tenant_id)
 
         return inherit_config
 
@@ -373,6 +375,7 @@ class ModelLoadBalancingService:
                 load_balancing_config.enabled = enabled
                 load_balancing_config.updated_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
                 db.session.commit()
+                provider_configurations_cache.invalidate(tenant_id)
 
                 self._clear_credentials_cache(tenant_id, config_id)
             else:
@@ -413,12 +416,14 @@ class ModelLoadBalancingService:
 
                 db.session.add(load_balancing_model_config)
                 db.session.commit()
+                provider_configurations_cache.invalidate(tenant_id)
 
         # get deleted config ids
         deleted_config_ids = set(current_load_balancing_configs_dict.keys()) - updated_config_ids
         for config_id in deleted_config_ids:
             db.session.delete(current_load_balancing_configs_dict[config_id])
             db.session.commit()
+            provider_configurations_cache.invalidate(tenant_id)
 
             self._clear_credentials_cache(tenant_id, config_id)
 
@@ -9,6 +9,7 @@ from configs import dify_config
 from core.helper import marketplace
 from core.helper.download import download_with_size_limit
 from core.helper.marketplace import download_plugin_pkg
+from core.helper.provider_configurations_cache import provider_configurations_cache
 from core.plugin.entities.bundle import PluginBundleDependency
 from core.plugin.entities.plugin import (
     GenericProviderID,
@@ -17,7 +18,7 @@ from core.plugin.entities.plugin import (
     PluginInstallation,
     PluginInstallationSource,
 )
-from core.plugin.entities.plugin_daemon import PluginInstallTask, PluginUploadResponse
+from core.plugin.entities.plugin_daemon import PluginInstallTask, PluginInstallTaskStatus, PluginUploadResponse
 from core.plugin.manager.asset import PluginAssetManager
 from core.plugin.manager.debugging import PluginDebuggingManager
 from core.plugin.manager.plugin import PluginInstallationManager
@@ -164,7 +165,11 @@ class PluginService:
     @staticmethod
     def fetch_install_task(tenant_id: str, task_id: str) -> PluginInstallTask:
         manager = PluginInstallationManager()
-        return manager.fetch_plugin_installation_task(tenant_id, task_id)
+        task = manager.fetch_plugin_installation_task(tenant_id, task_id)
+        if task.status == PluginInstallTaskStatus.Success:
+            # installed plugins may add model providers
+            provider_configurations_cache.invalidate(tenant_id)
+        return task
 
     @staticmethod
     def delete_install_task(tenant_id: str, task_id: str) -> bool:
@@ -214,7 +219,7 @@ class PluginService:
             pkg = download_plugin_pkg(new_plugin_unique_identifier)
             manager.upload_pkg(tenant_id, pkg, verify_signature=False)
 
-        return manager.upgrade_plugin(
+        response = manager.upgrade_plugin(
             tenant_id,
             original_plugin_unique_identifier,
             new_plugin_unique_identifier,
@@ -223,6 +228,9 @@ class PluginService:
                 "plugin_unique_identifier": new_plugin_unique_identifier,
             },
         )
+        # upgrades replace the model providers declared by the original plugin
+        provider_configurations_cache.invalidate(tenant_id)
+        return response
 
     @staticmethod
     def upgrade_plugin_with_github(
@@ -237,7 +245,7 @@ class PluginService:
         Upgrade plugin with github
         """
         manager = PluginInstallationManager()
-        return manager.upgrade_plugin(
+        response = manager.upgrade_plugin(
             tenant_id,
             original_plugin_unique_identifier,
             new_plugin_unique_identifier,
@@ -248,6 +256,9 @@ class PluginService:
                 "package": package,
             },
         )
+        # upgrades replace the model providers declared by the original plugin
+        provider_configurations_cache.invalidate(tenant_id)
+        return response
 
     @staticmethod
     def upload_pkg(tenant_id: str, pkg: bytes, verify_signature: bool = False) -> PluginUploadResponse:
@@ -291,12 +302,16 @@ class PluginService:
     @staticmethod
     def install_from_local_pkg(tenant_id: str, plugin_unique_identifiers: Sequence[str]):
         manager = PluginInstallationManager()
-        return manager.install_from_identifiers(
+        response = manager.install_from_identifiers(
             tenant_id,
             plugin_unique_identifiers,
             PluginInstallationSource.Package,
             [{}],
         )
+        # plugins installed right away may add model providers
+        if response.all_installed:
+            provider_configurations_cache.invalidate(tenant_id)
+        return response
 
     @staticmethod
     def install_from_github(tenant_id: str, plugin_unique_identifier: str, repo: str, version: str, package: str):
@@ -305,7 +320,7 @@ class PluginService:
         returns plugin_unique_identifier
         """
         manager = PluginInstallationManager()
-        return manager.install_from_identifiers(
+        response = manager.install_from_identifiers(
             tenant_id,
             [plugin_unique_identifier],
             PluginInstallationSource.Github,
@@ -317,6 +332,10 @@ class PluginService:
                 }
             ],
         )
+        # plugins installed right away may add model providers
+        if response.all_installed:
+            provider_configurations_cache.invalidate(tenant_id)
+        return response
 
     @staticmethod
     def install_from_marketplace_pkg(
@@ -338,7 +357,7 @@ class PluginService:
                 pkg = download_plugin_pkg(plugin_unique_identifier)
                 manager.upload_pkg(tenant_id, pkg, verify_signature)
 
-        return manager.install_from_identifiers(
+        response = manager.install_from_identifiers(
             tenant_id,
             plugin_unique_identifiers,
             PluginInstallationSource.Marketplace,
@@ -349,11 +368,17 @@ class PluginService:
                 for plugin_unique_identifier in plugin_unique_identifiers
             ],
         )
+        # plugins installed right away may add model providers
+        if response.all_installed:
+            provider_configurations_cache.invalidate(tenant_id)
+        return response
 
     @staticmethod
     def uninstall(tenant_id: str, plugin_installation_id: str) -> bool:
         manager = PluginInstallationManager()
-        return manager.uninstall(tenant_id, plugin_installation_id)
+        result = manager.uninstall(tenant_id, plugin_installation_id)
+        provider_configurations_cache.invalidate(tenant_id)
+        return result
 
     @staticmethod
     def check_tools_existence(tenant_id: str, provider_ids: Sequence[GenericProviderID]) -> Sequence[bool]:
@@ -0,0 +1,34 @@
+import logging
+import time
+
+import click
+from celery import shared_task  # type: ignore
+
+from core.rag.datasource.keyword.jieba.jieba import Jieba
+from extensions.ext_database import db
+from models.dataset import Dataset
+
+
+@shared_task(queue="dataset")
+def compact_keyword_table_task(dataset_id: str):
+    """
+    Async fold the keyword table logs of a dataset into its keyword table
+    :param dataset_id:
+
+    Usage: compact_keyword_table_task.delay(dataset_id)
+    """
+    logging.info(click.style("Start compact keyword table: {}".format(dataset_id), fg="green"))
+    start_at = time.perf_counter()
+    try:
+        dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
+        if not dataset:
+            return
+
+        Jieba(dataset).compact_keyword_table()
+
+        end_at = time.perf_counter()
+        logging.info(
+            click.style("Compacted keyword table: {} latency: {}".format(dataset_id, end_at - start_at), fg="green")
+        )
+    except Exception:
+        logging.exception("compact keyword table failed")
@@ -62,6 +62,20 @@ def retry_document_indexing_task(dataset_id: str, document_ids: list[str]):
             logging.info(click.style("Document not found: {}".format(document_id), fg="yellow"))
             return
         try:
+            indexing_runner = IndexingRunner()
+            if indexing_runner.has_checkpoint(document_id):
+                # continue after the last indexed batch instead of starting over
+                document.indexing_status = "parsing"
+                document.error = None
+                document.stopped_at = None
+                document.processing_started_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+                db.session.add(document)
+                db.session.commit()
+
+                indexing_runner.resume(document)
+                redis_client.delete(retry_indexing_cache_key)
+                continue
+
             # clean old data
             index_processor = IndexProcessorFactory(document.doc_form).init_index_processor()
 
@@ -76,11 +90,11 @@ def retry_document_indexing_task(dataset_id: str, document_ids: list[str]):
             db.session.commit()
 
             document.indexing_status = "parsing"
+            document.stopped_at = None
             document.processing_started_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
             db.session.add(document)
             db.session.commit()
 
-            indexing_runner = IndexingRunner()
             indexing_runner.run([document])
             redis_client.delete(retry_indexing_cache_key)
         except Exception as ex:
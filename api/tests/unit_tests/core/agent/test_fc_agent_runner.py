@@ -0,0 +1,115 @@
+import contextvars
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.agent.fc_agent_runner import FunctionCallAgentRunner
+from core.tools.entities.tool_entities import ToolInvokeMeta
+
+request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id")
+
+
+def _runner(max_concurrent_tool_calls: int, tool_call_timeout=None) -> FunctionCallAgentRunner:
+    runner = FunctionCallAgentRunner.__new__(FunctionCallAgentRunner)
+    runner.app_config = SimpleNamespace(
+        agent=SimpleNamespace(max_concurrent_tool_calls=max_concurrent_tool_calls, tool_call_timeout=tool_call_timeout)
+    )
+    runner.message = MagicMock()
+    runner.conversation = MagicMock()
+    return runner
+
+
+def _tool_calls(*names: str) -> list:
+    return [(f"call-{name}", name, {}) for name in names]
+
+
+def test_results_are_in_call_order_and_see_the_context():
+    runner = _runner(max_concurrent_tool_calls=3)
+    delays = {"slow": 0.3, "medium": 0.2, "fast": 0.1}
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def invoke(tool_call_name, tool_call_args, tool_instances, trace_manager, keep_result=None):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(delays[tool_call_name])
+        with lock:
+            running -= 1
+        assert keep_result()
+        return f"{tool_call_name} {request_id.get()}", [f"file-{tool_call_name}"], ToolInvokeMeta.empty()
+
+    runner._invoke_tool_call = invoke
+    request_id.set("request")
+    results = runner._invoke_tool_calls(_tool_calls("slow", "medium", "fast"), {}, None)
+
+    assert [response for response, _, _ in results] == ["slow request", "medium request", "fast request"]
+    assert [files for _, files, _ in results] == [["file-slow"], ["file-medium"], ["file-fast"]]
+    assert max_running == 3
+
+
+def test_timeout_runs_from_the_start_of_each_call():
+    runner = _runner(max_concurrent_tool_calls=2, tool_call_timeout=0.5)
+    delays = {"quick": 0.3, "late": 0.8}
+    kept = {}
+    returned = threading.Event()
+
+    def invoke(tool_call_name, tool_call_args, tool_instances, trace_manager, keep_result=None):
+        time.sleep(delays[tool_call_name])
+        kept[tool_call_name] = keep_result()
+        if tool_call_name == "late":
+            returned.set()
+        return tool_call_name, [f"file-{tool_call_name}"] if kept[tool_call_name] else [], ToolInvokeMeta.empty()
+
+    runner._invoke_tool_call = invoke
+    results = runner._invoke_tool_calls(_tool_calls("quick", "late"), {}, None)
+
+    assert results[0][0] == "quick"
+    assert results[1][0] == "tool invoke error: late timed out after 0.5 seconds"
+    assert results[1][1] == []
+    assert results[1][2].error == results[1][0]
+
+    # the timed out call finishes in the background without keeping its files
+    assert returned.wait(timeout=5)
+    assert kept == {"quick": True, "late": False}
+
+
+def test_sequential_calls_keep_running_after_a_timeout():
+    runner = _runner(max_concurrent_tool_calls=1, tool_call_timeout=0.2)
+    started = []
+
+    def invoke(tool_call_name, tool_call_args, tool_instances, trace_manager, keep_result=None):
+        started.append(tool_call_name)
+        if tool_call_name == "hanging":
+            time.sleep(1)
+        return tool_call_name, [], ToolInvokeMeta.empty()
+
+    runner._invoke_tool_call = invoke
+    results = runner._invoke_tool_calls(_tool_calls("hanging", "next"), {}, None)
+
+    assert started == ["hanging", "next"]
+    assert results[0][0].endswith("timed out after 0.2 seconds")
+    assert results[1][0] == "next"
+
+
+def test_tool_errors():
+    runner = _runner(max_concurrent_tool_calls=2)
+
+    # a missing tool is reported to the model like in the sequential path
+    results = runner._invoke_tool_calls(_tool_calls("missing", "other"), {}, None)
+    assert [response for response, _, _ in results] == [
+        "there is not a tool named missing",
+        "there is not a tool named other",
+    ]
+
+    def invoke(tool_call_name, tool_call_args, tool_instances, trace_manager, keep_result=None):
+        raise ValueError(f"{tool_call_name} failed")
+
+    runner._invoke_tool_call = invoke
+    with pytest.raises(ValueError, match="failed"):
+        runner._invoke_tool_calls(_tool_calls("first", "second"), {}, None)
@@ -0,0 +1,78 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.app.apps.base_app_queue_manager import AppQueueManager, PublishFrom, _fields_to_check
+from core.app.apps.task_stop_listener import task_stop_listener
+from core.app.entities.app_invoke_entities import InvokeFrom
+from core.app.entities.queue_entities import QueueTextChunkEvent, QueueWorkflowSucceededEvent
+
+
+class _QueueManager(AppQueueManager):
+    def __init__(self):
+        with (
+            patch("core.app.apps.base_app_queue_manager.redis_client", new=MagicMock()),
+            patch.object(task_stop_listener, "_ensure_started"),
+        ):
+            super().__init__(task_id="task", user_id="user", invoke_from=InvokeFrom.SERVICE_API)
+        self.published = []
+
+    def _publish(self, event, pub_from):
+        self.published.append(event)
+
+
+class _FakeModel:
+    _sa_instance_state = MagicMock()
+
+
+def test_typed_fields_are_not_walked():
+    assert _fields_to_check(QueueTextChunkEvent) == ()
+    assert _fields_to_check(QueueWorkflowSucceededEvent) == ("outputs",)
+
+
+def test_publish_checks_untyped_fields():
+    manager = _QueueManager()
+    manager.publish(QueueTextChunkEvent(text="hi"), PublishFrom.APPLICATION_MANAGER)
+    manager.publish(QueueWorkflowSucceededEvent(outputs={"a": [1, "b"]}), PublishFrom.APPLICATION_MANAGER)
+    assert len(manager.published) == 2
+
+    with pytest.raises(TypeError):
+        manager.publish(
+            QueueWorkflowSucceededEvent(outputs={"a": [{"b": _FakeModel()}]}), PublishFrom.APPLICATION_MANAGER
+        )
+    assert len(manager.published) == 2
+
+
+def test_publish_check_sampling():
+    manager = _QueueManager()
+    event = QueueWorkflowSucceededEvent(outputs={"a": _FakeModel()})
+    with patch("core.app.apps.base_app_queue_manager.dify_config.APP_QUEUE_EVENT_CHECK_SAMPLE_RATE", 0.0):
+        manager.publish(event, PublishFrom.APPLICATION_MANAGER)
+    assert manager.published == [event]
+
+
+def test_stop_flag_polling_is_throttled():
+    manager = _QueueManager()
+    with patch("core.app.apps.base_app_queue_manager.redis_client", new=MagicMock()) as mock_redis:
+        mock_redis.get.return_value = None
+
+        assert not manager._is_stopped()
+        assert not manager._is_stopped()
+        assert mock_redis.get.call_count == 1
+
+        manager._last_stop_check_time = 0
+        mock_redis.get.return_value = b"1"
+        assert manager._is_stopped()
+        assert mock_redis.get.call_count == 2
+
+
+def test_stop_signal_is_pushed():
+    manager = _QueueManager()
+    with patch("core.app.apps.base_app_queue_manager.redis_client", new=MagicMock()) as mock_redis:
+        mock_redis.get.return_value = None
+        assert not manager._is_stopped()
+
+        with task_stop_listener._lock:
+            task_stop_listener._events["task"].set()
+        assert manager._is_stopped()
+        assert mock_redis.get.call_count == 1
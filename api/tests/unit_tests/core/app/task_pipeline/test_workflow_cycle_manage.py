@@ -0,0 +1,30 @@
+import time
+from unittest.mock import MagicMock
+
+from core.app.task_pipeline.workflow_cycle_manage import WorkflowCycleManage
+from models.workflow import WorkflowRun, WorkflowRunStatus
+
+
+def test_workflow_run_is_finished_when_node_executions_fail_to_flush():
+    workflow_cycle_manage = WorkflowCycleManage(application_generate_entity=MagicMock(), workflow_system_variables={})
+    workflow_cycle_manage._workflow_node_execution_recorder = MagicMock()
+    workflow_cycle_manage._workflow_node_execution_recorder.flush.side_effect = Exception("database is unavailable")
+    session = MagicMock()
+    session.scalar.return_value = WorkflowRun(id="run-1")
+
+    workflow_run = workflow_cycle_manage._handle_workflow_run_failed(
+        session=session,
+        workflow_run_id="run-1",
+        start_at=time.perf_counter(),
+        total_tokens=0,
+        total_steps=1,
+        status=WorkflowRunStatus.FAILED,
+        error="node failed",
+    )
+    assert workflow_run.status == WorkflowRunStatus.FAILED.value
+    assert workflow_run.finished_at is not None
+
+    workflow_run = workflow_cycle_manage._handle_workflow_run_success(
+        session=session, workflow_run_id="run-1", start_at=time.perf_counter(), total_tokens=0, total_steps=1
+    )
+    assert workflow_run.status == WorkflowRunStatus.SUCCEEDED.value
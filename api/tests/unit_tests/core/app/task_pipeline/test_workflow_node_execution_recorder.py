@@ -0,0 +1,59 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.app.task_pipeline.workflow_node_execution_recorder import WorkflowNodeExecutionRecorder
+from models.workflow import WorkflowNodeExecution, WorkflowNodeExecutionStatus
+
+
+def _statements(mock_session_class):
+    session = mock_session_class.return_value.__enter__.return_value
+    return [(str(call.args[0]).split()[0], call.args[1]) for call in session.execute.call_args_list]
+
+
+@patch("core.app.task_pipeline.workflow_node_execution_recorder.Session")
+@patch("core.app.task_pipeline.workflow_node_execution_recorder.db")
+def test_saves_are_coalesced_and_written_on_flush(mock_db, mock_session_class):
+    recorder = WorkflowNodeExecutionRecorder()
+    workflow_node_execution = WorkflowNodeExecution()
+    workflow_node_execution.id = "execution-1"
+    workflow_node_execution.node_id = "llm"
+    workflow_node_execution.status = WorkflowNodeExecutionStatus.RUNNING.value
+
+    recorder.save(workflow_node_execution)
+    workflow_node_execution.status = WorkflowNodeExecutionStatus.SUCCEEDED.value
+    recorder.save(workflow_node_execution)
+    recorder.flush()
+
+    assert _statements(mock_session_class) == [
+        ("INSERT", [{"id": "execution-1", "node_id": "llm", "status": WorkflowNodeExecutionStatus.SUCCEEDED.value}])
+    ]
+
+    mock_session_class.reset_mock()
+    workflow_node_execution.error = "error"
+    recorder.save(workflow_node_execution)
+    recorder.close()
+
+    statements = _statements(mock_session_class)
+    assert [statement for statement, _ in statements] == ["UPDATE"]
+    assert statements[0][1][0]["error"] == "error"
+
+
+@patch("core.app.task_pipeline.workflow_node_execution_recorder.Session")
+@patch("core.app.task_pipeline.workflow_node_execution_recorder.db")
+def test_failed_flush_keeps_pending_executions(mock_db, mock_session_class):
+    recorder = WorkflowNodeExecutionRecorder()
+    workflow_node_execution = WorkflowNodeExecution()
+    workflow_node_execution.id = "execution-1"
+
+    session = MagicMock()
+    session.execute.side_effect = [ConnectionError("database is down"), None]
+    mock_session_class.return_value.__enter__.return_value = session
+
+    recorder.save(workflow_node_execution)
+    with pytest.raises(ConnectionError):
+        recorder.flush()
+
+    recorder.close()
+    assert session.execute.call_count == 2
+    assert session.commit.call_count == 1
@@ -0,0 +1,68 @@
+import pytest
+
+from core.helper.code_executor.code_executor import CodeExecutionError
+from core.helper.code_executor.jinja2.jinja2_sandbox import Jinja2Sandbox
+from core.helper.code_executor.jinja2.jinja2_sandbox_worker import TemplateRenderer
+
+
+@pytest.fixture
+def sandbox():
+    sandbox = Jinja2Sandbox(cache_size=10, time_limit=1.0, memory_limit=128 * 1024 * 1024, max_workers=2)
+    yield sandbox
+    sandbox.close()
+
+
+def test_renderer_caches_compiled_templates():
+    renderer = TemplateRenderer(cache_size=1)
+
+    assert renderer.render("Hello {{ name }}!", {"name": "Dify"}) == "Hello Dify!"
+    assert renderer.render("Hello {{ name }}!", {"name": "World"}) == "Hello World!"
+    assert len(renderer._templates) == 1
+
+    assert renderer.render("{{ items | join(',') }}", {"items": [1, 2]}) == "1,2"
+    assert len(renderer._templates) == 1
+
+
+def test_render_reuses_workers(sandbox):
+    assert sandbox.render("Hello {{ name }}!", {"name": "Dify"}) == "Hello Dify!"
+    worker = sandbox._idle_workers[0]
+
+    assert sandbox.render("{{ items | join(',') }}", {"items": [1, 2]}) == "1,2"
+    assert sandbox._idle_workers == [worker]
+
+
+def test_render_is_sandboxed(sandbox):
+    with pytest.raises(CodeExecutionError):
+        sandbox.render("{{ ''.__class__.__mro__[1].__subclasses__() }}", {})
+
+    with pytest.raises(CodeExecutionError):
+        sandbox.render("{{ items.append(3) }}", {"items": [1, 2]})
+
+
+def test_render_limits_output_length(sandbox):
+    with pytest.raises(CodeExecutionError, match="Output length"):
+        sandbox.render("{% for i in range(100) %}{{ text }}{% endfor %}", {"text": "a" * 10}, max_output_length=100)
+
+    with pytest.raises(CodeExecutionError, match="Invalid template"):
+        sandbox.render("{{ name ", {})
+
+
+def test_render_kills_loops_past_the_time_limit(sandbox):
+    # the loops make no calls, only a limit outside the template can stop them
+    with pytest.raises(CodeExecutionError, match="time limit"):
+        sandbox.render("{% set r = 'a'*1000000 %}{% for a in r %}{% for b in r %}{% endfor %}{% endfor %}", {})
+    assert sandbox._idle_workers == []
+
+    assert sandbox.render("{{ 1 + 1 }}", {}) == "2"
+
+
+def test_render_limits_memory(sandbox):
+    # 1 MB doubled nine times, each step is a single cheap concatenation
+    template = "{% set a = 'a' * 1000000 %}" + "{% set a = a + a %}{% set a = a ~ '' %}" * 9
+    with pytest.raises(CodeExecutionError, match="memory limit"):
+        sandbox.render(template + "{{ a | length }}", {})
+
+    with pytest.raises(CodeExecutionError, match="memory limit"):
+        sandbox.render("{{ 'a' * 10**10 }}", {})
+
+    assert sandbox.render("{{ 'ab' * 3 }} {{ 2 ** 10 }}", {}) == "ababab 1024"
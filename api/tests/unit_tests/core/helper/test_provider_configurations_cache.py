@@ -0,0 +1,59 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.helper.provider_configurations_cache import ProviderConfigurationsCache
+
+
+@pytest.fixture
+def mock_redis():
+    # the client wrapper is not initialized in unit tests, patch() would probe it without an explicit mock
+    with patch("core.helper.provider_configurations_cache.redis_client", new=MagicMock()) as mock:
+        yield mock
+
+
+def test_entries_are_reused_until_the_version_changes(mock_redis):
+    cache = ProviderConfigurationsCache(max_size=10, ttl=60)
+    build = MagicMock(side_effect=lambda tenant_id: object())
+    mock_redis.get.return_value = b"1"
+
+    first = cache.get("tenant", build)
+    assert cache.get("tenant", build) is first
+    assert build.call_count == 1
+
+    # bumped by a write in another process
+    mock_redis.get.return_value = b"2"
+    second = cache.get("tenant", build)
+    assert second is not first
+    assert cache.get("tenant", build) is second
+    assert build.call_count == 2
+
+    cache.invalidate("tenant")
+    mock_redis.incr.assert_called_once_with("provider_configurations_version:tenant")
+    assert cache.get("tenant", build) is not second
+    assert build.call_count == 3
+
+
+@patch("core.helper.provider_configurations_cache.time")
+def test_entries_expire_and_are_evicted(mock_time, mock_redis):
+    cache = ProviderConfigurationsCache(max_size=1, ttl=60)
+    build = MagicMock(side_effect=lambda tenant_id: object())
+    mock_redis.get.return_value = None
+    mock_time.monotonic.return_value = 0
+
+    first = cache.get("tenant", build)
+    mock_time.monotonic.return_value = 61
+    assert cache.get("tenant", build) is not first
+
+    cache.get("other_tenant", build)
+    cache.get("tenant", build)
+    assert build.call_count == 4
+
+
+def test_builds_without_caching_when_redis_is_unavailable(mock_redis):
+    cache = ProviderConfigurationsCache(max_size=10, ttl=60)
+    build = MagicMock(side_effect=lambda tenant_id: object())
+    mock_redis.get.side_effect = ConnectionError("redis is down")
+
+    assert cache.get("tenant", build) is not cache.get("tenant", build)
+    assert build.call_count == 2
@@ -0,0 +1,142 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.entities.provider_configuration import ProviderConfiguration
+from core.entities.provider_entities import (
+    CustomConfiguration,
+    ProviderQuotaType,
+    QuotaConfiguration,
+    QuotaUnit,
+    SystemConfiguration,
+    SystemConfigurationStatus,
+)
+from core.helper.provider_quota_ledger import ProviderQuotaLedger
+from core.model_runtime.entities.common_entities import I18nObject
+from core.model_runtime.entities.model_entities import ModelType
+from core.model_runtime.entities.provider_entities import ConfigurateMethod, ProviderEntity
+from models.provider import ProviderType
+
+KEY = "provider_quota_pending:tenant:openai:trial"
+
+
+@pytest.fixture
+def mock_redis():
+    # the client wrapper is not initialized in unit tests, patch() would probe it without an explicit mock
+    with patch("core.helper.provider_quota_ledger.redis_client", new=MagicMock()) as mock:
+        yield mock
+
+
+def _flushing_key(mock_redis) -> str:
+    return mock_redis.eval.call_args.args[3]
+
+
+@patch.object(ProviderQuotaLedger, "_update_provider")
+def test_deduct_writes_buffered_usage_once_per_interval(mock_update_provider, mock_redis):
+    ledger = ProviderQuotaLedger()
+    pipeline = mock_redis.pipeline.return_value
+    mock_redis.lock.return_value.acquire.return_value = True
+    mock_redis.eval.return_value = b"30"
+
+    pipeline.execute.return_value = [10, 1, None]
+    ledger.deduct(tenant_id="tenant", provider_name="openai", quota_type="trial", used_quota=10)
+    pipeline.incrby.assert_called_once_with(KEY, 10)
+    mock_update_provider.assert_not_called()
+
+    pipeline.execute.return_value = [30, 0, True]
+    ledger.deduct(tenant_id="tenant", provider_name="openai", quota_type="trial", used_quota=20)
+    mock_update_provider.assert_called_once_with("tenant", "openai", "trial", 30)
+    assert mock_redis.eval.call_args.args[2] == KEY
+    assert _flushing_key(mock_redis).startswith(f"{KEY}:flushing:")
+    mock_redis.delete.assert_called_once_with(_flushing_key(mock_redis))
+
+
+@patch.object(ProviderQuotaLedger, "_update_provider")
+def test_failed_write_keeps_usage_buffered(mock_update_provider, mock_redis):
+    ledger = ProviderQuotaLedger()
+    pipeline = mock_redis.pipeline.return_value
+    mock_redis.lock.return_value.acquire.return_value = True
+    mock_redis.eval.return_value = b"30"
+    mock_update_provider.side_effect = ConnectionError("database is down")
+
+    ledger.flush(KEY)
+
+    pipeline.incrby.assert_called_once_with(KEY, 30)
+    pipeline.delete.assert_called_once_with(_flushing_key(mock_redis))
+    mock_redis.lock.return_value.release.assert_called_once()
+
+
+@patch.object(ProviderQuotaLedger, "_update_provider")
+def test_failed_cleanup_after_write_does_not_write_usage_twice(mock_update_provider, mock_redis):
+    ledger = ProviderQuotaLedger()
+    mock_redis.lock.return_value.acquire.return_value = True
+    mock_redis.eval.return_value = b"30"
+    mock_redis.delete.side_effect = ConnectionError("redis is down")
+
+    ledger.flush(KEY)
+    mock_update_provider.assert_called_once_with("tenant", "openai", "trial", 30)
+    mock_redis.pipeline.return_value.incrby.assert_not_called()
+
+    # the written usage left the counter before the write, the next flush finds nothing
+    mock_redis.eval.return_value = None
+    ledger.flush(KEY)
+    mock_update_provider.assert_called_once()
+
+
+@patch.object(ProviderQuotaLedger, "_update_provider")
+def test_deduct_falls_back_to_direct_write(mock_update_provider, mock_redis):
+    mock_redis.pipeline.return_value.execute.side_effect = ConnectionError("redis is down")
+
+    ProviderQuotaLedger().deduct(tenant_id="tenant", provider_name="openai", quota_type="trial", used_quota=10)
+
+    mock_update_provider.assert_called_once_with("tenant", "openai", "trial", 10)
+
+
+def test_get_pending_usage(mock_redis):
+    records = [
+        SimpleNamespace(id="provider-1", tenant_id="tenant", provider_name="openai", quota_type="trial"),
+        SimpleNamespace(id="provider-2", tenant_id="tenant", provider_name="openai", quota_type="paid"),
+    ]
+    mock_redis.mget.return_value = [b"42", None]
+
+    assert ProviderQuotaLedger().get_pending_usage(records) == {"provider-1": 42}
+    mock_redis.mget.assert_called_once_with([KEY, "provider_quota_pending:tenant:openai:paid"])
+
+
+def test_quota_check_reads_pending_usage_at_check_time(mock_redis):
+    # built with 60 used, 20 of them still buffered
+    configuration = ProviderConfiguration(
+        tenant_id="tenant",
+        provider=ProviderEntity(
+            provider="langgenius/openai/openai",
+            label=I18nObject(en_US="OpenAI"),
+            supported_model_types=[ModelType.LLM],
+            configurate_methods=[ConfigurateMethod.PREDEFINED_MODEL],
+        ),
+        preferred_provider_type=ProviderType.SYSTEM,
+        using_provider_type=ProviderType.SYSTEM,
+        system_configuration=SystemConfiguration(
+            enabled=True,
+            current_quota_type=ProviderQuotaType.TRIAL,
+            quota_configurations=[
+                QuotaConfiguration(
+                    quota_type=ProviderQuotaType.TRIAL,
+                    quota_unit=QuotaUnit.TOKENS,
+                    quota_limit=100,
+                    quota_used=60,
+                    pending_quota_used=20,
+                    is_valid=True,
+                )
+            ],
+        ),
+        custom_configuration=CustomConfiguration(provider=None),
+        model_settings=[],
+    )
+
+    mock_redis.get.return_value = b"50"
+    assert configuration.get_system_configuration_status() == SystemConfigurationStatus.ACTIVE
+    mock_redis.get.assert_called_with(KEY)
+
+    mock_redis.get.return_value = b"60"
+    assert configuration.get_system_configuration_status() == SystemConfigurationStatus.QUOTA_EXCEEDED
@@ -1,10 +1,20 @@
+import os
 import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import MagicMock, patch
 
+import httpx
 import pytest
 
+from core.helper import ssrf_proxy
+from core.helper.lru_cache import LRUCache
 from core.helper.ssrf_proxy import SSRF_DEFAULT_MAX_RETRIES, STATUS_FORCELIST, make_request
 
+RUN_BENCHMARKS = os.getenv("RUN_BENCHMARKS", "false").lower() == "true"
+
 
 @patch("httpx.Client.request")
 def test_successful_request(mock_request):
@@ -50,3 +60,161 @@ def test_retry_logic_success(mock_request):
     assert response.status_code == 200
     assert mock_request.call_count == SSRF_DEFAULT_MAX_RETRIES + 1
     assert mock_request.call_args_list[0][1].get("method") == "GET"
+
+
+def _serve_keep_alive(request_headers=None):
+    connections = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # headers and body are written separately, delayed ACKs would stall the body
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            connections.append(self.client_address)
+
+        def do_GET(self):  # noqa: N802
+            if request_headers is not None:
+                request_headers.append(dict(self.headers))
+            self.send_response(200)
+            self.send_header("Set-Cookie", "session=tenant-a")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, connections
+
+
+def test_connections_are_reused():
+    server, connections = _serve_keep_alive()
+    url = f"http://127.0.0.1:{server.server_port}/"
+    try:
+        for _ in range(10):
+            assert make_request("GET", url).status_code == 200
+    finally:
+        server.shutdown()
+
+    assert len(connections) == 1
+
+
+def test_response_cookies_are_not_sent_with_later_requests():
+    request_headers = []
+    server, _ = _serve_keep_alive(request_headers)
+    url = f"http://127.0.0.1:{server.server_port}/"
+    try:
+        make_request("GET", url)
+        make_request("GET", url)
+        make_request("GET", url, cookies={"explicit": "1"})
+    finally:
+        server.shutdown()
+
+    assert "Cookie" not in request_headers[1]
+    assert request_headers[2]["Cookie"] == "explicit=1"
+
+
+def test_cached_dns_transport():
+    server, connections = _serve_keep_alive()
+    url = f"http://localhost:{server.server_port}/"
+    with (
+        patch.object(ssrf_proxy.dify_config, "SSRF_DNS_CACHE_TTL", 60),
+        patch.object(ssrf_proxy, "_dns_cache", LRUCache(16)) as dns_cache,
+    ):
+        client = ssrf_proxy._build_client(None, None, None)
+        try:
+            for _ in range(3):
+                response = client.get(url)
+                assert response.status_code == 200
+                assert response.text == "ok"
+        finally:
+            server.shutdown()
+
+        assert len(connections) == 1
+        assert ("localhost", server.server_port) in dns_cache.cache
+        client.close()
+
+        # nothing listens on the port of a closed socket
+        with socket.socket() as closed:
+            closed.bind(("127.0.0.1", 0))
+            port = closed.getsockname()[1]
+        with ssrf_proxy._build_client(None, None, None) as client, pytest.raises(httpx.ConnectError):
+            client.get(f"http://localhost:{port}/")
+
+
+def test_host_semaphores_are_bounded():
+    with (
+        patch.object(ssrf_proxy.dify_config, "SSRF_POOL_MAX_CONNECTIONS_PER_HOST", 2),
+        patch.object(ssrf_proxy, "_host_semaphores", LRUCache(2)) as host_semaphores,
+    ):
+        semaphore = ssrf_proxy._get_host_semaphore("http://a.example.com/")
+        for host in ["b", "c", "d"]:
+            ssrf_proxy._get_host_semaphore(f"http://{host}.example.com/")
+
+        assert len(host_semaphores.cache) == 2
+        assert ssrf_proxy._get_host_semaphore("http://a.example.com/") is not semaphore
+
+
+def test_unresolvable_host_is_retried():
+    with (
+        patch.object(ssrf_proxy.dify_config, "SSRF_DNS_CACHE_TTL", 60),
+        patch.object(ssrf_proxy, "_dns_cache", LRUCache(16)),
+        patch.object(ssrf_proxy, "_clients", {}),
+        patch.object(ssrf_proxy, "_clients_pid", None),
+        patch("socket.getaddrinfo", side_effect=socket.gaierror("Name or service not known")) as getaddrinfo,
+        patch("time.sleep"),
+    ):
+        with pytest.raises(ssrf_proxy.MaxRetriesExceededError):
+            make_request("GET", "http://no-such-host.invalid/", max_retries=1)
+        assert getaddrinfo.call_count == 2
+
+        with pytest.raises(httpx.ConnectError):
+            make_request("GET", "http://no-such-host.invalid/", max_retries=0)
+
+
+def test_streamed_response_holds_its_host_slot_until_closed():
+    server, _ = _serve_keep_alive()
+    url = f"http://127.0.0.1:{server.server_port}/"
+    with (
+        patch.object(ssrf_proxy.dify_config, "SSRF_POOL_MAX_CONNECTIONS_PER_HOST", 1),
+        patch.object(ssrf_proxy, "_host_semaphores", LRUCache(2)),
+    ):
+        try:
+            response = make_request("GET", url, stream=True)
+            semaphore = ssrf_proxy._get_host_semaphore(url)
+            assert not semaphore.acquire(blocking=False)
+
+            assert response.read() == b"ok"
+            assert semaphore.acquire(blocking=False)
+            semaphore.release()
+
+            # closing without reading the body releases it too
+            make_request("GET", url, stream=True).close()
+            assert semaphore.acquire(blocking=False)
+        finally:
+            server.shutdown()
+
+
+@pytest.mark.skipif(not RUN_BENCHMARKS, reason="benchmark, set RUN_BENCHMARKS=true to run it")
+def test_pooled_client_latency_benchmark():
+    server, _ = _serve_keep_alive()
+    url = f"http://127.0.0.1:{server.server_port}/"
+    try:
+        start = time.perf_counter()
+        for _ in range(1000):
+            with httpx.Client() as client:
+                client.get(url)
+        unpooled = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(1000):
+            make_request("GET", url)
+        pooled = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    print(f"1000 sequential requests: new client per request {unpooled:.3f}s, pooled client {pooled:.3f}s")
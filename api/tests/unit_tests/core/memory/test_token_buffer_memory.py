@@ -0,0 +1,115 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.memory.token_buffer_memory import MESSAGE_TOKENS_CACHE_TTL, TokenBufferMemory
+from core.model_runtime.entities import AssistantPromptMessage, UserPromptMessage
+from models.model import AppMode
+
+
+def _message(index: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=f"message-{index}",
+        query=f"query {index}",
+        answer=f"answer {index}",
+        workflow_run_id=None,
+        parent_message_id=f"message-{index - 1}" if index else None,
+    )
+
+
+def _model_instance() -> MagicMock:
+    model_instance = MagicMock()
+    model_instance.provider = "openai"
+    model_instance.model = "gpt-4o"
+    # 10 tokens per chat message
+    model_instance.get_llm_num_tokens.side_effect = lambda prompt_messages: 5 * len(prompt_messages)
+    return model_instance
+
+
+def _mock_messages(mock_db, messages: list[SimpleNamespace]) -> None:
+    mock_db.session.query.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = (
+        messages
+    )
+    mock_db.session.query.return_value.filter.return_value.all.return_value = []
+
+
+@pytest.fixture
+def mock_redis():
+    # the client wrapper is not initialized in unit tests, patch() would probe it without an explicit mock
+    with patch("core.memory.token_buffer_memory.redis_client", new=MagicMock()) as mock:
+        yield mock
+
+
+@patch("core.memory.token_buffer_memory.db")
+def test_prunes_oldest_messages_with_cached_token_counts(mock_db, mock_redis):
+    # newest first, like the query
+    _mock_messages(mock_db, [_message(index) for index in reversed(range(4))])
+    # message-1 is cached, the others are counted together, then once each as the history is pruned
+    mock_redis.mget.return_value = [None, b"10", None, None]
+
+    model_instance = _model_instance()
+    conversation = MagicMock()
+    conversation.mode = AppMode.CHAT
+
+    memory = TokenBufferMemory(conversation=conversation, model_instance=model_instance)
+    prompt_messages = memory.get_history_prompt_messages(max_token_limit=25)
+
+    assert model_instance.get_llm_num_tokens.call_count == 4
+    assert [prompt_message.content for prompt_message in prompt_messages] == [
+        "query 2",
+        "answer 2",
+        "query 3",
+        "answer 3",
+    ]
+    assert isinstance(prompt_messages[0], UserPromptMessage)
+    assert isinstance(prompt_messages[1], AssistantPromptMessage)
+
+    cache_keys = mock_redis.mget.call_args.args[0]
+    assert cache_keys[1] == "message_tokens_openai_gpt-4o_message-1"
+    cached = {call.args[0] for call in mock_redis.pipeline.return_value.setex.call_args_list}
+    assert cached == {cache_keys[0], cache_keys[2], cache_keys[3]}
+
+
+@patch("core.memory.token_buffer_memory.db")
+def test_keeps_latest_answer_when_over_limit(mock_db, mock_redis):
+    _mock_messages(mock_db, [_message(0)])
+    mock_redis.mget.return_value = [b"100"]
+
+    model_instance = MagicMock()
+    memory = TokenBufferMemory(conversation=MagicMock(), model_instance=model_instance)
+    prompt_messages = memory.get_history_prompt_messages(max_token_limit=10)
+
+    assert [prompt_message.content for prompt_message in prompt_messages] == ["answer 0"]
+    model_instance.get_llm_num_tokens.assert_not_called()
+
+
+@patch("core.memory.token_buffer_memory.db")
+def test_counts_uncached_history_once_when_it_fits(mock_db, mock_redis):
+    _mock_messages(mock_db, [_message(index) for index in reversed(range(4))])
+    mock_redis.mget.return_value = [None, b"10", None, None]
+
+    model_instance = _model_instance()
+    memory = TokenBufferMemory(conversation=MagicMock(), model_instance=model_instance)
+    prompt_messages = memory.get_history_prompt_messages(max_token_limit=2000)
+
+    assert len(prompt_messages) == 8
+    model_instance.get_llm_num_tokens.assert_called_once()
+    assert len(model_instance.get_llm_num_tokens.call_args.args[0]) == 6
+    # a shared count is not cached per message
+    mock_redis.pipeline.return_value.setex.assert_not_called()
+
+
+@patch("core.memory.token_buffer_memory.db")
+def test_caches_the_count_of_a_single_uncached_message(mock_db, mock_redis):
+    _mock_messages(mock_db, [_message(index) for index in reversed(range(3))])
+    mock_redis.mget.return_value = [b"10", b"10", None]
+
+    model_instance = _model_instance()
+    memory = TokenBufferMemory(conversation=MagicMock(), model_instance=model_instance)
+    memory.get_history_prompt_messages(max_token_limit=2000)
+
+    model_instance.get_llm_num_tokens.assert_called_once()
+    mock_redis.pipeline.return_value.setex.assert_called_once_with(
+        mock_redis.mget.call_args.args[0][2], MESSAGE_TOKENS_CACHE_TTL, 10
+    )
@@ -0,0 +1,104 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import httpx
+
+from core.plugin.manager import http_client
+from core.plugin.manager.base import BasePluginManager
+from core.plugin.manager.http_client import (
+    PluginDaemonPoolMetrics,
+    get_plugin_daemon_async_client,
+    get_plugin_daemon_session,
+)
+
+
+def test_session_is_shared_per_process():
+    session = get_plugin_daemon_session()
+    assert get_plugin_daemon_session() is session
+
+    adapter = session.get_adapter("http://127.0.0.1:5002")
+    assert adapter._pool_maxsize == 100
+
+    with patch.object(http_client.os, "getpid", return_value=-1):
+        assert get_plugin_daemon_session() is not session
+
+
+def test_pool_metrics():
+    metrics = PluginDaemonPoolMetrics()
+    metrics.record(0.5)
+    metrics.record(1.5)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["requests"] == 2
+    assert snapshot["slow_waits"] == 1
+    assert snapshot["avg_wait"] == 1.0
+    assert snapshot["max_wait"] == 1.5
+    assert snapshot["wait_histogram"] == {"le_0.001": 0, "le_0.01": 0, "le_0.1": 0, "le_1.0": 1, "le_10.0": 1, "inf": 0}
+
+
+def test_stream_request_closes_response_when_consumer_stops_early():
+    response = MagicMock()
+    response.iter_lines.return_value = iter([b'data: {"text": "a"}', b'data: {"text": "b"}'])
+
+    with patch.object(BasePluginManager, "_request", return_value=response):
+        stream = BasePluginManager()._stream_request_with_model("POST", "plugin/tenant/dispatch/llm/invoke", dict)
+        assert next(stream) == {"text": "a"}
+        response.close.assert_not_called()
+        stream.close()
+
+    response.close.assert_called_once()
+
+
+def test_async_client_is_shared_per_event_loop():
+    async def get_client():
+        client = get_plugin_daemon_async_client()
+        assert get_plugin_daemon_async_client() is client
+        return client
+
+    assert asyncio.run(get_client()) is not asyncio.run(get_client())
+
+
+def test_astream_request_with_model():
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.headers["X-Api-Key"]
+        assert request.content == b'{"prompt": "hi"}'
+        return httpx.Response(200, content=b'data: {"text": "a"}\n\ndata: {"text": "b"}\n\n')
+
+    async def collect():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with patch("core.plugin.manager.base.get_plugin_daemon_async_client", return_value=client):
+            return [
+                item
+                async for item in BasePluginManager()._astream_request_with_model(
+                    "POST",
+                    "plugin/tenant/dispatch/llm/invoke",
+                    dict,
+                    headers={"Content-Type": "application/json"},
+                    data={"prompt": "hi"},
+                )
+            ]
+
+    assert asyncio.run(collect()) == [{"text": "a"}, {"text": "b"}]
+
+
+def test_astream_request_closes_response_when_consumer_stops_early():
+    closed = asyncio.Event()
+
+    class Stream(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            yield b'data: {"text": "a"}\n\n'
+            yield b'data: {"text": "b"}\n\n'
+
+        async def aclose(self) -> None:
+            closed.set()
+
+    async def first_item():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, stream=Stream())))
+        with patch("core.plugin.manager.base.get_plugin_daemon_async_client", return_value=client):
+            stream = BasePluginManager()._astream_request_with_model("POST", "plugin/tenant/dispatch/llm/invoke", dict)
+            item = await anext(stream)
+            assert not closed.is_set()
+            await stream.aclose()
+        return item, closed.is_set()
+
+    assert asyncio.run(first_item()) == ({"text": "a"}, True)
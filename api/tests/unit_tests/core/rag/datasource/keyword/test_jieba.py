@@ -0,0 +1,236 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+from core.rag.datasource.keyword.jieba.jieba import Jieba
+from models.dataset import DatasetKeywordTableLog
+
+
+def _log(node_id: str, action: str, keywords=None) -> DatasetKeywordTableLog:
+    return DatasetKeywordTableLog(dataset_id="dataset-1", node_id=node_id, action=action, keywords=keywords)
+
+
+def test_apply_keyword_table_logs_in_order():
+    jieba = Jieba(MagicMock(id="dataset-1"))
+    keyword_table = {"apple": {"node-1"}, "banana": {"node-1", "node-2"}}
+
+    keyword_table = jieba._apply_keyword_table_logs(
+        keyword_table,
+        [
+            _log("node-3", "add", ["apple", "cherry"]),
+            _log("node-1", "delete"),
+            _log("node-2", "delete"),
+            _log("node-2", "add", ["durian"]),
+        ],
+    )
+
+    assert keyword_table == {"apple": {"node-3"}, "cherry": {"node-3"}, "durian": {"node-2"}}
+
+
+def test_apply_keyword_table_logs_without_logs():
+    jieba = Jieba(MagicMock(id="dataset-1"))
+
+    assert jieba._apply_keyword_table_logs({"apple": {"node-1"}}, []) == {"apple": {"node-1"}}
+
+
+def test_unapplied_keyword_table_logs_are_above_the_folded_max_log_id():
+    jieba = Jieba(MagicMock(id="dataset-1"))
+
+    with patch("core.rag.datasource.keyword.jieba.jieba.db") as mock_db:
+        log_query = mock_db.session.query.return_value.filter.return_value
+        jieba._get_unapplied_keyword_table_logs(3)
+
+    (dataset_filter, applied_filter) = mock_db.session.query.return_value.filter.call_args.args
+    assert applied_filter.compare(DatasetKeywordTableLog.id > 3)
+    log_query.order_by.return_value.all.assert_called_once()
+
+
+class _KeywordTableLogSession:
+    """
+    A session holding the advisory locks of its thread like a Postgres transaction, with logs visible once
+    committed.
+    """
+
+    def __init__(self) -> None:
+        self.committed: list[DatasetKeywordTableLog] = []
+        self._next_log_id = 1
+        self._shared_holders = 0
+        self._exclusive_held = False
+        self._condition = threading.Condition()
+        self._transaction = threading.local()
+
+    def execute(self, statement) -> None:
+        shared = "pg_advisory_xact_lock_shared" in str(statement)
+        with self._condition:
+            if shared:
+                self._condition.wait_for(lambda: not self._exclusive_held)
+                self._shared_holders += 1
+            else:
+                self._condition.wait_for(lambda: not self._exclusive_held and not self._shared_holders)
+                self._exclusive_held = True
+        self._transaction.lock = "shared" if shared else "exclusive"
+
+    def add_all(self, logs: list[DatasetKeywordTableLog]) -> None:
+        with self._condition:
+            for log in logs:
+                log.id, self._next_log_id = self._next_log_id, self._next_log_id + 1
+        self._transaction.pending = logs
+
+    def commit(self) -> None:
+        lock = getattr(self._transaction, "lock", None)
+        with self._condition:
+            self.committed.extend(getattr(self._transaction, "pending", None) or [])
+            if lock == "shared":
+                self._shared_holders -= 1
+            elif lock == "exclusive":
+                self._exclusive_held = False
+            self._condition.notify_all()
+        self._transaction.lock = self._transaction.pending = None
+
+    def query(self, *args):
+        return MagicMock()
+
+
+def test_compaction_waits_for_logs_committed_late_with_lower_ids():
+    dataset = MagicMock(id="dataset-1")
+    dataset.dataset_keyword_table.keyword_table_dict = {"__data__": {"table": {}, "max_log_id": 0}}
+    jieba = Jieba(dataset)
+    session = _KeywordTableLogSession()
+    log_allocated = threading.Event()
+    commit_late = threading.Event()
+
+    def stall_commit(logs):
+        _KeywordTableLogSession.add_all(session, logs)
+        if logs[0].node_id == "node-1":
+            log_allocated.set()
+            commit_late.wait()
+
+    with (
+        patch("core.rag.datasource.keyword.jieba.jieba.db") as mock_db,
+        patch("core.rag.datasource.keyword.jieba.jieba.redis_client", new=MagicMock()) as mock_redis,
+        patch("core.rag.datasource.keyword.jieba.jieba.keyword_index_cache"),
+        patch.object(Jieba, "_dataset_keyword_table_exists", return_value=True),
+        patch.object(
+            Jieba,
+            "_get_max_keyword_table_log_id",
+            side_effect=lambda: max((log.id for log in session.committed), default=None),
+        ),
+        patch.object(
+            Jieba,
+            "_get_unapplied_keyword_table_logs",
+            side_effect=lambda applied_max_log_id, max_log_id: sorted(
+                (log for log in session.committed if applied_max_log_id < log.id <= max_log_id),
+                key=lambda log: log.id,
+            ),
+        ),
+        patch.object(Jieba, "_save_dataset_keyword_table") as mock_save,
+    ):
+        mock_db.session = session
+        mock_db.session.add_all = stall_commit  # type: ignore[method-assign]
+        mock_redis.incrby.return_value = 1
+        mock_redis.lock.return_value.acquire.return_value = True
+
+        # log 1 is allocated first and committed after log 2
+        late_writer = threading.Thread(target=jieba.update_segment_keywords_index, args=("node-1", ["apple"]))
+        late_writer.start()
+        assert log_allocated.wait(5)
+        jieba.update_segment_keywords_index("node-2", ["banana"])
+        assert [log.id for log in session.committed] == [2]
+
+        compaction = threading.Thread(target=jieba.compact_keyword_table)
+        compaction.start()
+        compaction.join(0.2)
+        assert compaction.is_alive()
+
+        commit_late.set()
+        late_writer.join(5)
+        compaction.join(5)
+
+    mock_save.assert_called_once_with({"apple": {"node-1"}, "banana": {"node-2"}}, max_log_id=2)
+
+
+def test_append_keyword_table_logs_queues_compaction_past_the_threshold():
+    jieba = Jieba(MagicMock(id="dataset-1"))
+
+    with (
+        patch("core.rag.datasource.keyword.jieba.jieba.db") as mock_db,
+        patch("core.rag.datasource.keyword.jieba.jieba.redis_client", new=MagicMock()) as mock_redis,
+        patch("core.rag.datasource.keyword.jieba.jieba.keyword_index_cache"),
+        patch("tasks.compact_keyword_table_task.compact_keyword_table_task") as mock_task,
+        patch.object(Jieba, "compact_keyword_table") as mock_compact,
+    ):
+        mock_db.session.query.return_value.filter.return_value.first.return_value = ("table-1",)
+        mock_redis.incrby.return_value = 1000
+        mock_redis.set.return_value = True
+        jieba.delete_by_ids(["node-1", "node-2"])
+
+    # the shared lock is taken before the logs are inserted
+    assert [call[0] for call in mock_db.session.mock_calls if call[0] in {"execute", "add_all", "commit"}] == [
+        "execute",
+        "add_all",
+        "commit",
+    ]
+    (lock_statement,) = mock_db.session.execute.call_args.args
+    assert "pg_advisory_xact_lock_shared" in str(lock_statement)
+    # compaction runs in a task, not in the indexing path
+    mock_compact.assert_not_called()
+    mock_task.delay.assert_called_once_with("dataset-1")
+
+
+def test_compact_keyword_table_folds_logs_up_to_max_log_id():
+    dataset = MagicMock(id="dataset-1")
+    dataset.dataset_keyword_table.keyword_table_dict = {
+        "__data__": {"table": {"apple": {"node-1"}}, "max_log_id": 3},
+    }
+    jieba = Jieba(dataset)
+
+    with (
+        patch("core.rag.datasource.keyword.jieba.jieba.db") as mock_db,
+        patch("core.rag.datasource.keyword.jieba.jieba.redis_client", new=MagicMock()) as mock_redis,
+        patch.object(Jieba, "_get_max_keyword_table_log_id", return_value=7),
+        patch.object(Jieba, "_get_unapplied_keyword_table_logs") as mock_get_logs,
+        patch.object(Jieba, "_save_dataset_keyword_table") as mock_save,
+    ):
+        mock_redis.lock.return_value.acquire.return_value = True
+        mock_get_logs.return_value = [_log("node-2", "add", ["banana"])]
+        jieba.compact_keyword_table()
+
+    (lock_statement,) = mock_db.session.execute.call_args.args
+    assert "pg_advisory_xact_lock(" in str(lock_statement)
+    mock_get_logs.assert_called_once_with(3, 7)
+    mock_save.assert_called_once_with({"apple": {"node-1"}, "banana": {"node-2"}}, max_log_id=7)
+    # the logs folded by the previous compaction are pruned
+    (dataset_filter, pruned_filter) = mock_db.session.query.return_value.filter.call_args.args
+    assert pruned_filter.compare(DatasetKeywordTableLog.id <= 3)
+    mock_redis.decrby.assert_called_once_with("keyword_table_pending_logs_dataset-1", 1)
+
+
+def test_compact_keyword_table_skips_folded_logs():
+    dataset = MagicMock(id="dataset-1")
+    dataset.dataset_keyword_table.keyword_table_dict = {"__data__": {"table": {}, "max_log_id": 7}}
+    jieba = Jieba(dataset)
+
+    with (
+        patch("core.rag.datasource.keyword.jieba.jieba.db"),
+        patch("core.rag.datasource.keyword.jieba.jieba.redis_client", new=MagicMock()) as mock_redis,
+        patch.object(Jieba, "_get_max_keyword_table_log_id", return_value=7),
+        patch.object(Jieba, "_get_unapplied_keyword_table_logs") as mock_get_logs,
+    ):
+        mock_redis.lock.return_value.acquire.return_value = True
+        jieba.compact_keyword_table()
+
+    mock_get_logs.assert_not_called()
+    mock_redis.lock.return_value.release.assert_called_once()
+
+
+def test_create_dataset_keyword_table_skips_existing_table():
+    dataset = MagicMock(id="dataset-1")
+    jieba = Jieba(dataset)
+
+    with (
+        patch("core.rag.datasource.keyword.jieba.jieba.db") as mock_db,
+        patch("core.rag.datasource.keyword.jieba.jieba.redis_client", new=MagicMock()) as mock_redis,
+    ):
+        jieba._create_dataset_keyword_table()
+
+    mock_redis.lock.assert_called_once_with("keyword_indexing_lock_dataset-1", timeout=600)
+    mock_db.session.add.assert_not_called()
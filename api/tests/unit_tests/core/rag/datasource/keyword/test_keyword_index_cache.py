@@ -0,0 +1,60 @@
+from unittest.mock import patch
+
+import redis
+
+from core.rag.datasource.keyword.jieba.keyword_index_cache import KeywordIndex, KeywordIndexCache
+from extensions.ext_redis import redis_client
+
+
+def test_keyword_index_retrieve_ids():
+    index = KeywordIndex(
+        {
+            "apple": {"node-1", "node-2"},
+            "banana": {"node-2", "node-3"},
+            "cherry": {"node-2"},
+        }
+    )
+
+    assert len(index) == 3
+    assert "node-3" in index
+    assert "node-4" not in index
+    assert index.retrieve_ids({"apple", "banana", "cherry"}, k=1) == ["node-2"]
+    assert set(index.retrieve_ids({"apple", "banana"}, k=3)) == {"node-1", "node-2", "node-3"}
+    assert index.retrieve_ids({"durian"}, k=3) == []
+    assert KeywordIndex({}).retrieve_ids({"apple"}, k=3) == []
+
+
+def test_keyword_index_cache_versioning():
+    cache = KeywordIndexCache(capacity=2)
+    index = KeywordIndex({"apple": {"node-1"}})
+
+    cache.put("dataset-1", b"1", index)
+    assert cache.get("dataset-1", b"1") is index
+    assert cache.get("dataset-1", b"2") is None
+    assert cache.get("dataset-2", b"1") is None
+
+    redis_client.initialize(redis.Redis())
+    with patch.object(redis_client, "set") as set_version:
+        cache.bump_version("dataset-1")
+        cache.bump_version("dataset-1")
+    first_version, second_version = (call.args[1] for call in set_version.call_args_list)
+    assert set_version.call_args.args[0] == "keyword_table_version_dataset-1"
+    assert set_version.call_args.kwargs["ex"] == 86400
+    assert first_version != second_version
+
+
+def test_keyword_index_cache_replaces_expired_version():
+    cache = KeywordIndexCache(capacity=2)
+    redis_client.initialize(redis.Redis())
+    with (
+        patch.object(redis_client, "get", side_effect=[None, b"new"]),
+        patch.object(redis_client, "set") as set_version,
+    ):
+        assert cache.get_version("dataset-1") == b"new"
+    assert set_version.call_args.kwargs == {"ex": 86400, "nx": True}
+
+
+def test_keyword_index_cache_disabled():
+    cache = KeywordIndexCache(capacity=0)
+    cache.put("dataset-1", b"1", KeywordIndex({"apple": {"node-1"}}))
+    assert cache.get("dataset-1", b"1") is None
@@ -0,0 +1,55 @@
+import math
+from unittest.mock import patch
+
+import pytest
+
+from core.rag.datasource.keyword.jieba.keyword_scorer import KeywordScorer
+from core.rag.models.document import Document
+
+
+def _reference_scores(query_keywords: set[str], documents_keywords: list[set[str]]) -> list[float]:
+    total_documents = len(documents_keywords)
+    all_keywords = set().union(*documents_keywords)
+    keyword_idf = {
+        keyword: math.log((1 + total_documents) / (1 + sum(1 for doc in documents_keywords if keyword in doc))) + 1
+        for keyword in all_keywords
+    }
+    query_tfidf = {keyword: keyword_idf.get(keyword, 0) for keyword in query_keywords}
+    scores = []
+    for doc in documents_keywords:
+        doc_tfidf = {keyword: keyword_idf[keyword] for keyword in doc}
+        numerator = sum(query_tfidf[x] * doc_tfidf[x] for x in set(query_tfidf) & set(doc_tfidf))
+        denominator = math.sqrt(sum(v**2 for v in query_tfidf.values())) * math.sqrt(
+            sum(v**2 for v in doc_tfidf.values())
+        )
+        scores.append(numerator / denominator if denominator else 0.0)
+    return scores
+
+
+@patch("core.rag.datasource.keyword.jieba.jieba_keyword_table_handler.JiebaKeywordTableHandler.extract_keywords")
+def test_score_matches_reference(mock_extract_keywords):
+    mock_extract_keywords.side_effect = lambda text, max_keywords_per_chunk=10: set(text.split())
+    contents = ["apple banana", "banana cherry durian", "egg", "apple cherry banana"]
+    documents = [
+        Document(page_content=content, metadata={"doc_id": str(i), "doc_hash": f"hash-{i}"})
+        for i, content in enumerate(contents)
+    ]
+
+    scores = KeywordScorer().score("apple cherry fig", documents)
+
+    expected = _reference_scores({"apple", "cherry", "fig"}, [set(content.split()) for content in contents])
+    assert scores == pytest.approx(expected)
+    assert scores[2] == 0.0
+    assert documents[0].metadata["keywords"] == {"apple", "banana"}
+
+
+@patch("core.rag.datasource.keyword.jieba.jieba_keyword_table_handler.JiebaKeywordTableHandler.extract_keywords")
+def test_document_keywords_cached_by_doc_hash(mock_extract_keywords):
+    mock_extract_keywords.side_effect = lambda text, max_keywords_per_chunk=10: set(text.split())
+    document = Document(page_content="apple banana", metadata={"doc_id": "1", "doc_hash": "cached-hash"})
+
+    KeywordScorer().score("apple", [document])
+    KeywordScorer().score("banana", [document])
+
+    extracted_texts = [call.args[0] for call in mock_extract_keywords.call_args_list]
+    assert extracted_texts.count("apple banana") == 1
@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from core.rag.datasource.retrieval_service import RetrievalService
+from core.rag.index_processor.constant.index_type import IndexType
+from core.rag.models.document import Document
+from models.dataset import ChildChunk, DocumentSegment
+from models.dataset import Document as DatasetDocument
+
+
+def _mock_session(mocker, rows_by_model: dict) -> MagicMock:
+    mock_db = mocker.patch("core.rag.datasource.retrieval_service.db")
+
+    def query(model):
+        result = MagicMock()
+        result.filter.return_value.all.return_value = rows_by_model[model]
+        result.filter.return_value.options.return_value.all.return_value = rows_by_model[model]
+        return result
+
+    mock_db.session.query.side_effect = query
+    return mock_db
+
+
+def _segment(segment_id: str, index_node_id: str, dataset_id: str = "dataset-1") -> DocumentSegment:
+    return DocumentSegment(
+        id=segment_id, index_node_id=index_node_id, dataset_id=dataset_id, content=f"content of {segment_id}"
+    )
+
+
+def test_format_retrieval_documents_uses_constant_queries(mocker):
+    top_k = 50
+    dataset_documents = [
+        SimpleNamespace(id="doc-parent", doc_form=IndexType.PARENT_CHILD_INDEX, dataset_id="dataset-1"),
+        SimpleNamespace(id="doc-normal", doc_form=IndexType.PARAGRAPH_INDEX, dataset_id="dataset-1"),
+    ]
+    child_chunks = [
+        ChildChunk(
+            id=f"child-{i}", index_node_id=f"child-node-{i}", segment_id=f"parent-{i % 5}", content="c", position=i
+        )
+        for i in range(top_k)
+    ]
+    parent_segments = [_segment(f"parent-{i}", f"parent-node-{i}") for i in range(5)]
+    normal_segments = [_segment(f"segment-{i}", f"node-{i}") for i in range(top_k)]
+
+    mock_db = _mock_session(
+        mocker,
+        {
+            DatasetDocument: dataset_documents,
+            ChildChunk: child_chunks,
+            DocumentSegment: parent_segments + normal_segments,
+        },
+    )
+
+    documents = []
+    for i in reversed(range(top_k)):
+        documents.append(
+            Document(page_content="", metadata={"document_id": "doc-normal", "doc_id": f"node-{i}", "score": i / 100})
+        )
+        documents.append(
+            Document(
+                page_content="", metadata={"document_id": "doc-parent", "doc_id": f"child-node-{i}", "score": i / 100}
+            )
+        )
+
+    records = RetrievalService.format_retrieval_documents(documents)
+
+    # dataset documents, child chunks, parent segments and normal segments
+    assert mock_db.session.query.call_count == 4
+    assert len(records) == top_k + 5
+    # records keep the order of the retrieved documents
+    assert [record.segment.id for record in records[:4]] == ["segment-49", "parent-4", "segment-48", "parent-3"]
+    parent_record = records[1]
+    assert parent_record.score == 0.49
+    assert len(parent_record.child_chunks) == top_k // 5
+    assert parent_record.child_chunks[0].id == "child-49"
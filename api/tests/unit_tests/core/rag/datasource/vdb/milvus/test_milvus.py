@@ -1,7 +1,10 @@
+import json
+from unittest.mock import MagicMock, patch
+
 import pytest
 from pydantic.error_wrappers import ValidationError
 
-from core.rag.datasource.vdb.milvus.milvus_vector import MilvusConfig
+from core.rag.datasource.vdb.milvus.milvus_vector import MilvusConfig, MilvusVector
 
 
 def test_default_value():
@@ -16,3 +19,20 @@ def test_default_value():
 
     config = MilvusConfig(**valid_config)
     assert config.database == "default"
+
+
+def test_texts_exist_quotes_ids_in_the_filter():
+    client = MagicMock()
+    client.describe_collection.return_value = {"fields": []}
+    client.query.return_value = [{"metadata": {"doc_id": 'doc-"1'}}]
+    config = MilvusConfig(uri="http://localhost:19530", user="root", password="Milvus")
+    with patch.object(MilvusVector, "_init_client", return_value=client):
+        vector = MilvusVector("collection", config)
+
+    ids = ['doc-"1', "doc-\\2", "doc-'3"]
+    assert vector.texts_exist(ids) == {'doc-"1'}
+
+    query_kwargs = client.query.call_args.kwargs
+    assert query_kwargs["filter"] == 'metadata["doc_id"] in ["doc-\\"1", "doc-\\\\2", "doc-\'3"]'
+    assert json.loads(query_kwargs["filter"].removeprefix('metadata["doc_id"] in ')) == ids
+    assert query_kwargs["limit"] == 3
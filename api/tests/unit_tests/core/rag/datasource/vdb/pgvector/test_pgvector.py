@@ -0,0 +1,163 @@
+import json
+import os
+import struct
+import time
+import uuid
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import psycopg2.extras
+import psycopg2.pool
+import pytest
+
+from core.rag.datasource.vdb.pgvector.pgvector import (
+    SQL_CREATE_INDEX_DOCUMENT_ID,
+    SQL_CREATE_TABLE,
+    PGVector,
+    PGVectorConnectionPool,
+    PGVectorFactory,
+    _encode_copy_rows,
+)
+from core.rag.models.document import Document
+
+RUN_BENCHMARKS = os.getenv("RUN_BENCHMARKS", "false").lower() == "true"
+
+
+def test_encode_copy_rows():
+    doc_id = str(uuid.uuid4())
+    meta = {"doc_id": doc_id, "document_id": "document"}
+
+    data = _encode_copy_rows([(doc_id, "text", meta, [0.5, 1.0])]).getvalue()
+
+    assert data.startswith(b"PGCOPY\n\xff\r\n\x00")
+    offset = 19
+    assert struct.unpack_from("!h", data, offset) == (4,)
+    offset += 2
+    fields = []
+    for _ in range(4):
+        (length,) = struct.unpack_from("!i", data, offset)
+        offset += 4
+        fields.append(data[offset : offset + length])
+        offset += length
+    assert data[offset:] == struct.pack("!h", -1)
+
+    assert uuid.UUID(bytes=fields[0]) == uuid.UUID(doc_id)
+    assert fields[1] == b"text"
+    assert fields[2][:1] == b"\x01"
+    assert json.loads(fields[2][1:]) == meta
+    assert struct.unpack("!hh2f", fields[3]) == (2, 0, 0.5, 1.0)
+
+
+def test_connection_pool_waits_for_a_free_connection_until_the_timeout():
+    with patch("psycopg2.connect", side_effect=lambda *args, **kwargs: MagicMock(closed=False)):
+        pool = PGVectorConnectionPool(1, 1, timeout=0.1)
+        conn = pool.getconn()
+        assert pool.get_metrics() == {"in_use": 1, "idle": 0, "max": 1}
+
+        with pytest.raises(psycopg2.pool.PoolError, match="within 0.1 seconds"):
+            pool.getconn()
+
+        pool.putconn(conn)
+        assert pool.get_metrics() == {"in_use": 0, "idle": 1, "max": 1}
+        assert pool.getconn() is conn
+
+
+def test_connection_pool_metrics_count_open_connections():
+    def connect(*args, **kwargs):
+        conn = MagicMock(closed=False)
+        conn.close.side_effect = lambda: setattr(conn, "closed", True)
+        return conn
+
+    with patch("psycopg2.connect", side_effect=connect):
+        pool = PGVectorConnectionPool(1, 3, timeout=0.1)
+        assert pool.get_metrics() == {"in_use": 0, "idle": 1, "max": 3}
+
+        first, second = pool.getconn(), pool.getconn()
+        assert pool.get_metrics() == {"in_use": 2, "idle": 0, "max": 3}
+
+        # only minconn connections are kept open
+        pool.putconn(first)
+        pool.putconn(second)
+        assert pool.get_metrics() == {"in_use": 0, "idle": 1, "max": 3}
+
+
+@pytest.mark.skipif(not RUN_BENCHMARKS, reason="benchmark, set RUN_BENCHMARKS=true to run it")
+def test_filtered_search_benchmark():
+    # needs a PostgreSQL server with pgvector, configured through the PGVECTOR_* settings
+    rows, batch_size, dimension, documents = 1_000_000, 10_000, 128, 1_000
+    rng = np.random.default_rng(0)
+    vector = PGVector(f"benchmark_{uuid.uuid4().hex}", PGVectorFactory.get_config())
+    legacy_table_name = f"{vector.table_name}_json"
+
+    with vector._get_cursor() as cur:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        cur.execute(SQL_CREATE_TABLE.format(table_name=vector.table_name, dimension=dimension))
+        index_name = vector._document_id_index_name()
+        cur.execute(SQL_CREATE_INDEX_DOCUMENT_ID.format(index_name=index_name, table_name=vector.table_name))
+        # the schema before the document_id column, without the hnsw index on either table so that both
+        # searches scan the rows that pass the filter
+        cur.execute(
+            f"CREATE TABLE {legacy_table_name} (id UUID PRIMARY KEY, text TEXT NOT NULL, meta JSONB NOT NULL,"
+            f" embedding vector({dimension}) NOT NULL)"
+        )
+    try:
+        json_insert_time = copy_time = 0.0
+        for start in range(0, rows, batch_size):
+            embeddings = rng.random((batch_size, dimension), dtype=np.float32).tolist()
+            docs = [
+                Document(
+                    page_content=f"chunk {i}",
+                    metadata={"doc_id": str(uuid.uuid4()), "document_id": f"document-{i % documents}"},
+                )
+                for i in range(start, start + batch_size)
+            ]
+
+            insert_start = time.perf_counter()
+            with vector._get_cursor() as cur:
+                psycopg2.extras.execute_values(
+                    cur,
+                    f"INSERT INTO {legacy_table_name} (id, text, meta, embedding) VALUES %s",
+                    [
+                        (doc.metadata["doc_id"], doc.page_content, json.dumps(doc.metadata), embedding)
+                        for doc, embedding in zip(docs, embeddings)
+                    ],
+                )
+            json_insert_time += time.perf_counter() - insert_start
+
+            copy_start = time.perf_counter()
+            vector.add_texts(docs, embeddings)
+            copy_time += time.perf_counter() - copy_start
+
+        with vector._get_cursor() as cur:
+            cur.execute(f"ANALYZE {legacy_table_name}")
+            cur.execute(f"ANALYZE {vector.table_name}")
+
+        queries = [
+            (rng.random(dimension).tolist(), [f"document-{i}" for i in rng.choice(documents, 10, replace=False)])
+            for _ in range(20)
+        ]
+        meta_filter_start = time.perf_counter()
+        for query_vector, document_ids in queries:
+            with vector._get_cursor() as cur:
+                cur.execute(
+                    f"SELECT meta, text, embedding <=> %s::vector AS distance FROM {legacy_table_name}"
+                    " WHERE meta->>'document_id' IN %s ORDER BY distance LIMIT 4",
+                    (json.dumps(query_vector), tuple(document_ids)),
+                )
+                cur.fetchall()
+        meta_filter_time = time.perf_counter() - meta_filter_start
+
+        column_filter_start = time.perf_counter()
+        for query_vector, document_ids in queries:
+            assert vector.search_by_vector(query_vector, top_k=4, document_ids_filter=document_ids)
+        column_filter_time = time.perf_counter() - column_filter_start
+    finally:
+        with vector._get_cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {legacy_table_name}")
+        vector.delete()
+
+    print(
+        f"insert {rows} rows: JSON text {json_insert_time:.1f}s, binary COPY {copy_time:.1f}s; "
+        f"{len(queries)} searches filtered by 10 of {documents} documents: "
+        f"meta->>'document_id' IN {meta_filter_time:.3f}s, document_id = ANY {column_filter_time:.3f}s"
+    )
@@ -0,0 +1,61 @@
+from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.models.document import Document
+
+
+class _InMemoryVector(BaseVector):
+    def __init__(self, existing_ids: set[str]):
+        super().__init__("collection")
+        self.existing_ids = existing_ids
+        self.text_exists_calls = 0
+
+    def get_type(self) -> str:
+        return "in_memory"
+
+    def create(self, texts, embeddings, **kwargs):
+        pass
+
+    def add_texts(self, documents, embeddings, **kwargs):
+        pass
+
+    def text_exists(self, id: str) -> bool:
+        self.text_exists_calls += 1
+        return id in self.existing_ids
+
+    def delete_by_ids(self, ids):
+        pass
+
+    def delete_by_metadata_field(self, key, value):
+        pass
+
+    def search_by_vector(self, query_vector, **kwargs):
+        return []
+
+    def search_by_full_text(self, query, **kwargs):
+        return []
+
+    def delete(self):
+        pass
+
+
+def test_texts_exist_falls_back_to_text_exists():
+    vector = _InMemoryVector({"a", "c"})
+
+    assert vector.texts_exist(["a", "b", "c"]) == {"a", "c"}
+    assert vector.text_exists_calls == 3
+
+
+def test_filter_duplicate_texts_checks_the_batch_at_once():
+    vector = _InMemoryVector({"a"})
+    texts_exist_calls = []
+    original_texts_exist = vector.texts_exist
+    vector.texts_exist = lambda ids: texts_exist_calls.append(ids) or original_texts_exist(ids)
+    documents = [
+        Document(page_content="a", metadata={"doc_id": "a"}),
+        Document(page_content="b", metadata={"doc_id": "b"}),
+        Document(page_content="no metadata"),
+    ]
+
+    result = vector._filter_duplicate_texts(documents)
+
+    assert [document.page_content for document in result] == ["b", "no metadata"]
+    assert texts_exist_calls == [["a", "b"]]
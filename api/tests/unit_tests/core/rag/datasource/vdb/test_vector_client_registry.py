@@ -0,0 +1,100 @@
+import gc
+import threading
+
+from pydantic import BaseModel
+
+from core.rag.datasource.vdb.vector_client_registry import VectorClientRegistry
+
+
+class _Config(BaseModel):
+    endpoint: str
+
+
+class _Client:
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class _Owner:
+    pass
+
+
+def _get_client(registry: VectorClientRegistry, endpoint: str, owner=None) -> _Client:
+    config = _Config(endpoint=endpoint)
+    return registry.get_client(
+        "test",
+        config,
+        create=lambda: _Client(config.endpoint),
+        close=lambda client: client.close(),
+        metrics=lambda client: {"open": int(not client.closed)},
+        owner=owner,
+    )
+
+
+def test_client_is_shared_until_config_changes():
+    registry = VectorClientRegistry()
+
+    client = _get_client(registry, "http://a")
+    assert _get_client(registry, "http://a") is client
+    assert registry.metrics() == {"created": 1, "reused": 1, "retired_in_use": 0, "test": {"users": 0, "open": 1}}
+
+    new_client = _get_client(registry, "http://b")
+    assert new_client is not client
+    assert client.closed
+    assert not new_client.closed
+
+
+def test_reset_after_fork_drops_clients_without_closing():
+    registry = VectorClientRegistry()
+    client = _get_client(registry, "http://a")
+
+    registry.reset_after_fork()
+
+    assert _get_client(registry, "http://a") is not client
+    assert not client.closed
+
+
+def test_replaced_client_is_closed_after_its_users():
+    registry = VectorClientRegistry()
+    owner = _Owner()
+    client = _get_client(registry, "http://a", owner=owner)
+
+    with registry.lease("test", _Config(endpoint="http://a"), create=lambda: _Client("unused")) as leased:
+        assert leased is client
+        new_client = _get_client(registry, "http://b")
+        assert not client.closed
+        assert registry.metrics()["retired_in_use"] == 1
+
+    # the owner still uses the client after the lease ended
+    assert not client.closed
+
+    del owner
+    gc.collect()
+    assert client.closed
+    assert not new_client.closed
+    assert registry.metrics()["retired_in_use"] == 0
+
+
+def test_slow_client_creation_does_not_block_other_backends():
+    registry = VectorClientRegistry()
+    creating = threading.Event()
+    release = threading.Event()
+
+    def create_slowly() -> _Client:
+        creating.set()
+        release.wait(5)
+        return _Client("slow")
+
+    thread = threading.Thread(target=registry.get_client, args=("slow", _Config(endpoint="http://slow"), create_slowly))
+    thread.start()
+    try:
+        assert creating.wait(5)
+        # created while the other backend is still being created
+        assert _get_client(registry, "http://a").endpoint == "http://a"
+    finally:
+        release.set()
+        thread.join()
@@ -0,0 +1,93 @@
+import os
+import time
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from core.rag.embedding.cached_embedding import CacheEmbedding
+from libs import helper
+from models.dataset import Embedding
+
+RUN_BENCHMARKS = os.getenv("RUN_BENCHMARKS", "false").lower() == "true"
+
+
+def _model_instance(dimension: int = 8) -> MagicMock:
+    model_instance = MagicMock()
+    model_instance.provider = "openai"
+    model_instance.model = "text-embedding-3-small"
+    model_instance.model_type_instance.get_model_schema.return_value = None
+
+    def invoke_text_embedding(texts, user=None, input_type=None):
+        return MagicMock(embeddings=[np.ones(dimension).tolist() for _ in texts])
+
+    model_instance.invoke_text_embedding.side_effect = invoke_text_embedding
+    return model_instance
+
+
+def _cached_row(text: str) -> Embedding:
+    embedding = Embedding(model_name="text-embedding-3-small", hash=helper.generate_text_hash(text))
+    embedding.set_embedding([0.5] * 8)
+    return embedding
+
+
+def test_embed_documents_uses_batched_cache_lookup(mocker):
+    texts = [f"chunk {i}" for i in range(10_000)]
+    cached_rows = [_cached_row(text) for text in texts[:5_000]]
+
+    mock_db = mocker.patch("core.rag.embedding.cached_embedding.db")
+    query = mock_db.session.query.return_value.filter.return_value
+    query.all.side_effect = [cached_rows] + [[] for _ in range(9)]
+
+    model_instance = _model_instance()
+    embeddings = CacheEmbedding(model_instance).embed_documents(texts)
+
+    # one IN query per 1000 hashes and one bulk insert per 1000 new rows
+    assert mock_db.session.query.call_count == 10
+    assert mock_db.session.execute.call_count == 5
+    assert mock_db.session.add.call_count == 0
+    mock_db.session.commit.assert_called_once()
+    assert len(embeddings) == 10_000
+    assert embeddings[0] == [0.5] * 8
+    assert np.isclose(np.linalg.norm(embeddings[-1]), 1.0)
+    # the 5k cache hits are not embedded again, only the 5k misses reach the model
+    embedded_texts = [
+        text for call in model_instance.invoke_text_embedding.call_args_list for text in call.kwargs["texts"]
+    ]
+    assert embedded_texts == texts[5_000:]
+
+
+def test_embed_documents_deduplicates_texts(mocker):
+    mock_db = mocker.patch("core.rag.embedding.cached_embedding.db")
+    mock_db.session.query.return_value.filter.return_value.all.return_value = []
+
+    embeddings = CacheEmbedding(_model_instance()).embed_documents(["same", "same", "other"])
+
+    assert len(embeddings) == 3
+    mock_db.session.query.assert_called_once()
+    insert_stmt = mock_db.session.execute.call_args.args[0]
+    assert len(insert_stmt.compile().params) // 4 == 2
+
+
+@pytest.mark.skipif(not RUN_BENCHMARKS, reason="benchmark, set RUN_BENCHMARKS=true to run it")
+def test_embed_documents_benchmark(mocker):
+    # every statement costs a simulated database round trip, so the wall time follows the query count
+    round_trip = 0.001
+    texts = [f"chunk {i}" for i in range(10_000)]
+    cached_rows = [_cached_row(text) for text in texts[:5_000]]
+    batches = iter([cached_rows])
+
+    def all_rows():
+        time.sleep(round_trip)
+        return next(batches, [])
+
+    mock_db = mocker.patch("core.rag.embedding.cached_embedding.db")
+    mock_db.session.query.return_value.filter.return_value.all.side_effect = all_rows
+    mock_db.session.execute.side_effect = lambda *args, **kwargs: time.sleep(round_trip)
+
+    start = time.perf_counter()
+    CacheEmbedding(_model_instance()).embed_documents(texts)
+    elapsed = time.perf_counter() - start
+
+    queries = mock_db.session.query.call_count + mock_db.session.execute.call_count
+    print(f"embed_documents for 10k chunks, 5k cached: {queries} queries, {elapsed:.3f}s")
@@ -0,0 +1,54 @@
+import base64
+import pickle
+
+import numpy as np
+import pytest
+
+from core.rag.embedding.embedding_codec import (
+    EmbeddingDecodeError,
+    decode_embedding,
+    encode_embedding,
+    is_encoded_embedding,
+    load_embedding,
+)
+
+
+def test_encode_decode_float32():
+    vector = np.random.default_rng(0).random(1536)
+    data = encode_embedding(vector)
+
+    assert is_encoded_embedding(data)
+    assert len(data) == 12 + 1536 * 4
+    decoded = decode_embedding(data)
+    assert decoded.dtype == np.float32
+    assert not decoded.flags.writeable  # zero-copy view over the payload
+    np.testing.assert_allclose(decoded, vector, rtol=1e-6)
+
+
+def test_encode_decode_float16():
+    vector = [0.25, -0.5, 0.125]
+    data = encode_embedding(vector, "float16")
+
+    assert len(data) == 12 + 3 * 2
+    decoded = decode_embedding(data)
+    assert decoded.dtype == np.float32
+    assert decoded.tolist() == vector
+
+
+def test_load_legacy_formats():
+    vector = [0.1, 0.2, 0.3]
+
+    pickled = pickle.dumps(vector, protocol=pickle.HIGHEST_PROTOCOL)
+    assert not is_encoded_embedding(pickled)
+    assert load_embedding(pickled).tolist() == vector
+
+    encoded_str = base64.b64encode(np.array(vector).tobytes()).decode("utf-8")
+    assert load_embedding(encoded_str).tolist() == vector
+    assert load_embedding(encoded_str.encode("utf-8")).tolist() == vector
+
+
+def test_decode_rejects_unknown_data():
+    with pytest.raises(EmbeddingDecodeError):
+        decode_embedding(pickle.dumps([0.1]))
+    with pytest.raises(EmbeddingDecodeError):
+        load_embedding(b"\x93not an embedding")
@@ -0,0 +1,98 @@
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from core.rag.models.document import Document
+from core.rag.retrieval.dataset_retrieval import DatasetRetrieval
+
+
+def _dataset(dataset_id: str, embedding_model: str = "model-a", **kwargs) -> SimpleNamespace:
+    values = {
+        "id": dataset_id,
+        "provider": "vendor",
+        "indexing_technique": "high_quality",
+        "embedding_model_provider": "provider",
+        "embedding_model": embedding_model,
+        "retrieval_model": None,
+    }
+    values.update(kwargs)
+    return SimpleNamespace(**values)
+
+
+@patch("core.rag.retrieval.dataset_retrieval.CacheEmbedding")
+@patch("core.rag.retrieval.dataset_retrieval.ModelManager")
+def test_embed_query_once_per_embedding_model(mock_model_manager, mock_cache_embedding):
+    mock_cache_embedding.return_value.embed_query.side_effect = lambda query: [len(query)]
+    datasets = [
+        _dataset("a-1"),
+        _dataset("a-2"),
+        _dataset("b-1", embedding_model="model-b"),
+        _dataset("keyword", indexing_technique="economy"),
+        _dataset("external", provider="external"),
+        _dataset("full-text", retrieval_model={"search_method": "full_text_search"}),
+    ]
+
+    query_embeddings = DatasetRetrieval()._embed_query("tenant", datasets, "query")
+
+    assert set(query_embeddings) == {("provider", "model-a"), ("provider", "model-b")}
+    assert query_embeddings[("provider", "model-a")][1] == [5]
+    assert mock_model_manager.return_value.get_model_instance.call_count == 2
+    assert mock_cache_embedding.return_value.embed_query.call_count == 2
+
+
+@patch("core.rag.retrieval.dataset_retrieval.CacheEmbedding")
+@patch("core.rag.retrieval.dataset_retrieval.ModelManager")
+def test_embed_query_failure_is_left_to_the_datasets(mock_model_manager, mock_cache_embedding):
+    mock_model_manager.return_value.get_model_instance.side_effect = [ValueError("no credentials"), MagicMock()]
+    mock_cache_embedding.return_value.embed_query.return_value = [1.0]
+
+    query_embeddings = DatasetRetrieval()._embed_query(
+        "tenant", [_dataset("a-1"), _dataset("b-1", embedding_model="model-b")], "query"
+    )
+
+    assert len(query_embeddings) == 1
+
+
+@patch("core.rag.retrieval.dataset_retrieval.dify_config.DATASET_RETRIEVAL_TIMEOUT", 0.5)
+def test_multiple_retrieve_skips_failed_and_timed_out_datasets(app):
+    retrieval = DatasetRetrieval()
+    slow_done = threading.Event()
+
+    def retrieve_dataset(flask_app, dataset_id, all_documents, query_vector, **kwargs):
+        assert query_vector == [0.5]
+        if dataset_id == "broken":
+            raise ConnectionError("vector store is down")
+        if dataset_id == "slow":
+            time.sleep(1)
+            all_documents.append(Document(page_content="late", metadata={"score": 1.0}))
+            slow_done.set()
+            return
+        all_documents.append(Document(page_content=dataset_id, metadata={"score": 0.9}))
+
+    with (
+        patch.object(retrieval, "_embed_query", return_value={("provider", "model-a"): (MagicMock(), [0.5])}),
+        patch.object(retrieval, "_retrieve_dataset", side_effect=retrieve_dataset),
+        patch.object(retrieval, "_on_query"),
+        patch.object(retrieval, "_on_retrieval_end") as on_retrieval_end,
+    ):
+        documents = retrieval.multiple_retrieve(
+            app_id="app",
+            tenant_id="tenant",
+            user_id="user",
+            user_from="account",
+            available_datasets=[_dataset("ok"), _dataset("broken"), _dataset("slow")],
+            query="query",
+            top_k=4,
+            score_threshold=0.0,
+            reranking_mode="reranking_model",
+            reranking_enable=False,
+        )
+
+    assert [document.page_content for document in documents] == ["ok"]
+    timings = on_retrieval_end.call_args.args[3]
+    assert {timing["dataset_id"] for timing in timings} == {"ok", "broken"}
+
+    # the timed out dataset finishes in the background without changing the result
+    assert slow_done.wait(timeout=5)
+    assert [document.page_content for document in documents] == ["ok"]
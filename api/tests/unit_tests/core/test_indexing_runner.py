@@ -0,0 +1,46 @@
+from unittest.mock import MagicMock, patch
+
+from core.indexing_runner import IndexingRunner
+from core.rag.models.document import Document
+
+
+def _run_pipeline(checkpoint=None):
+    runner = IndexingRunner.__new__(IndexingRunner)
+    pages = [Document(page_content=f"page {i}", metadata={}) for i in range(5)]
+    dataset = MagicMock(indexing_technique="economy")
+    dataset_document = MagicMock(id="document", doc_form="text_model", doc_language="English")
+    with (
+        patch("core.indexing_runner.dify_config.INDEXING_PIPELINE_BATCH_SIZE", 2),
+        patch.object(runner, "_extract", return_value=pages),
+        patch.object(runner, "_transform", side_effect=lambda _processor, _dataset, docs, *_args: list(docs)),
+        patch.object(runner, "_load_segments"),
+        patch.object(
+            runner, "_load_batch", side_effect=lambda _processor, _dataset, _doc, docs, _model: len(docs)
+        ) as load_batch,
+        patch.object(runner, "_save_checkpoint") as save_checkpoint,
+        patch.object(runner, "_clear_checkpoint") as clear_checkpoint,
+        patch.object(runner, "_complete_document") as complete_document,
+    ):
+        runner._run_pipeline(MagicMock(), dataset, dataset_document, {"mode": "automatic"}, checkpoint)
+
+    batches = [[page.page_content for page in call.args[3]] for call in load_batch.call_args_list]
+    checkpointed_pages = [call.args[1] for call in save_checkpoint.call_args_list]
+    tokens = complete_document.call_args.args[1]
+    clear_checkpoint.assert_called_once_with("document")
+    return batches, checkpointed_pages, tokens
+
+
+def test_pipeline_indexes_and_checkpoints_pages_in_batches():
+    batches, checkpointed_pages, tokens = _run_pipeline()
+
+    assert batches == [["page 0", "page 1"], ["page 2", "page 3"], ["page 4"]]
+    assert checkpointed_pages == [0, 2, 4, 5]
+    assert tokens == 5
+
+
+def test_pipeline_resumes_after_the_checkpointed_pages():
+    batches, checkpointed_pages, tokens = _run_pipeline({"pages": 2, "position": 4, "tokens": 2, "latency": 1.0})
+
+    assert batches == [["page 2", "page 3"], ["page 4"]]
+    assert checkpointed_pages == [4, 5]
+    assert tokens == 5
@@ -0,0 +1,84 @@
+import threading
+
+from core.workflow.graph_engine.execution_scheduler import WorkflowExecutionScheduler
+
+
+def test_group_limit_queues_tasks():
+    scheduler = WorkflowExecutionScheduler(max_workers=10, max_workers_per_tenant=10)
+    group = scheduler.create_group(tenant_id="tenant", max_workers=2, max_submit_count=100)
+    release = threading.Event()
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+
+    def task():
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        release.wait(timeout=5)
+        with lock:
+            running -= 1
+
+    futures = [group.submit(task) for _ in range(5)]
+    assert scheduler.metrics()["waiting"] == 3
+
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+
+    assert max_running == 2
+    metrics = scheduler.metrics()
+    assert metrics["running"] == 0
+    assert metrics["waiting"] == 0
+    assert metrics["queued"] == 3
+
+
+def test_waiting_tasks_are_started_round_robin_across_tenants():
+    scheduler = WorkflowExecutionScheduler(max_workers=1, max_workers_per_tenant=1)
+    release = threading.Event()
+    order = []
+
+    blocker = scheduler.create_group(tenant_id="tenant_a", max_workers=10, max_submit_count=100).submit(release.wait, 5)
+    group_a = scheduler.create_group(tenant_id="tenant_a", max_workers=10, max_submit_count=100)
+    group_b = scheduler.create_group(tenant_id="tenant_b", max_workers=10, max_submit_count=100)
+    futures = [group_a.submit(order.append, "a1"), group_a.submit(order.append, "a2")]
+    futures.append(group_b.submit(order.append, "b1"))
+
+    release.set()
+    blocker.result(timeout=5)
+    for future in futures:
+        future.result(timeout=5)
+
+    assert order == ["a1", "b1", "a2"]
+
+
+def test_nested_submit_runs_inline_instead_of_deadlocking():
+    scheduler = WorkflowExecutionScheduler(max_workers=1, max_workers_per_tenant=1)
+    group = scheduler.create_group(tenant_id="tenant", max_workers=1, max_submit_count=100)
+
+    def parent():
+        child = group.create_child(max_workers=1).submit(threading.current_thread)
+        return child.result(timeout=5) is threading.current_thread()
+
+    assert group.submit(parent).result(timeout=5)
+    assert scheduler.metrics()["inlined"] == 1
+
+
+def test_cancelled_waiting_task_is_skipped():
+    scheduler = WorkflowExecutionScheduler(max_workers=1, max_workers_per_tenant=1)
+    group = scheduler.create_group(tenant_id="tenant", max_workers=1, max_submit_count=100)
+    release = threading.Event()
+    calls = []
+
+    blocker = group.submit(release.wait, 5)
+    cancelled = group.submit(calls.append, "cancelled")
+    assert cancelled.cancel()
+    remaining = group.submit(calls.append, "remaining")
+
+    release.set()
+    blocker.result(timeout=5)
+    remaining.result(timeout=5)
+
+    assert calls == ["remaining"]
+    assert group.submit_count == 0
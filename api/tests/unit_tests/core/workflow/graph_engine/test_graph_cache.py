@@ -0,0 +1,43 @@
+import json
+
+from core.workflow.graph_engine.graph_cache import WorkflowGraphCache
+from models.workflow import Workflow
+
+
+def _workflow(workflow_id: str, answer: str) -> Workflow:
+    workflow = Workflow()
+    workflow.id = workflow_id
+    workflow.graph = json.dumps(
+        {
+            "edges": [{"id": "start-source-answer-target", "source": "start", "target": "answer"}],
+            "nodes": [
+                {"data": {"type": "start"}, "id": "start"},
+                {"data": {"type": "answer", "title": "answer", "answer": answer}, "id": "answer"},
+            ],
+        }
+    )
+    return workflow
+
+
+def test_compiled_graph_is_reused_per_workflow_version():
+    cache = WorkflowGraphCache(max_size=2)
+
+    compiled = cache.get(_workflow("workflow-1", "1"))
+    assert compiled.graph.root_node_id == "start"
+    assert cache.get(_workflow("workflow-1", "1")) is compiled
+
+    # an edited draft keeps its id but gets a new entry
+    assert cache.get(_workflow("workflow-1", "2")) is not compiled
+    assert cache.metrics() == {"size": 2, "hits": 1, "misses": 2, "evictions": 0}
+
+
+def test_least_recently_used_graph_is_evicted():
+    cache = WorkflowGraphCache(max_size=2)
+    first = cache.get(_workflow("workflow-1", "1"))
+    cache.get(_workflow("workflow-2", "1"))
+    cache.get(_workflow("workflow-1", "1"))
+    cache.get(_workflow("workflow-3", "1"))
+
+    assert cache.get(_workflow("workflow-1", "1")) is first
+    assert cache.metrics()["evictions"] == 1
+    assert cache.metrics()["misses"] == 3
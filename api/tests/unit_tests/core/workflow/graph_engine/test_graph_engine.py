@@ -515,6 +515,8 @@ def test_run_branch(mock_close, mock_remove):
     # print(graph_engine.graph_runtime_state.model_dump_json(indent=2))
 
 
+# run the parallel branches one at a time, so the answers are streamed in branch order
+@patch("core.workflow.graph_engine.graph_engine.dify_config.WORKFLOW_SCHEDULER_MAX_WORKERS_PER_RUN", 1)
 @patch("extensions.ext_database.db.session.remove")
 @patch("extensions.ext_database.db.session.close")
 def test_condition_parallel_correct_output(mock_close, mock_remove, app):
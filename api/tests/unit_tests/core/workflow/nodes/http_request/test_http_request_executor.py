@@ -1,3 +1,7 @@
+import httpx
+import pytest
+
+from configs import dify_config
 from core.workflow.entities.variable_pool import VariablePool
 from core.workflow.nodes.http_request import (
     BodyData,
@@ -6,6 +10,7 @@ from core.workflow.nodes.http_request import (
     HttpRequestNodeData,
 )
 from core.workflow.nodes.http_request.entities import HttpRequestNodeTimeout
+from core.workflow.nodes.http_request.exc import ResponseSizeError
 from core.workflow.nodes.http_request.executor import Executor
 
 
@@ -334,3 +339,35 @@ def test_init_params():
     executor = create_executor("key1:value1\n\nkey2:value2\n\n")
     executor._init_params()
     assert executor.params == [("key1", "value1"), ("key2", "value2")]
+
+
+def test_response_exceeding_max_size_is_aborted(monkeypatch):
+    monkeypatch.setattr(dify_config, "HTTP_REQUEST_NODE_MAX_TEXT_SIZE", 2048)
+    node_data = HttpRequestNodeData(
+        title="test",
+        method="get",
+        url="http://example.com",
+        headers="",
+        params="",
+        authorization=HttpRequestNodeAuthorization(type="no-auth"),
+    )
+    timeout = HttpRequestNodeTimeout(connect=10, read=30, write=30)
+    executor = Executor(node_data=node_data, timeout=timeout, variable_pool=VariablePool())
+
+    def stream(size: int):
+        yield from (b"a" * 512 for _ in range(size // 512))
+
+    response = executor._validate_and_parse_response(
+        httpx.Response(200, headers={"content-type": "text/plain"}, content=stream(2048))
+    )
+    assert response.text == "a" * 2048
+
+    with pytest.raises(ResponseSizeError, match="more than"):
+        executor._validate_and_parse_response(
+            httpx.Response(200, headers={"content-type": "text/plain"}, content=stream(10240))
+        )
+
+    with pytest.raises(ResponseSizeError):
+        executor._validate_and_parse_response(
+            httpx.Response(200, headers={"content-type": "text/plain", "content-length": "4096"}, content=b"a")
+        )
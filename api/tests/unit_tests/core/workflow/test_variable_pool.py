@@ -44,3 +44,63 @@ def test_use_long_selector(pool):
     result = pool.get(("node_1", "part_1", "part_2"))
     assert result is not None
     assert result.value == "test_value"
+
+
+def test_overlay_reads_through_and_keeps_own_writes(pool):
+    pool.add(("node_1", "shared"), StringSegment(value="parent"))
+    pool.add(("node_1", "removed"), StringSegment(value="parent"))
+    pool.add(("node_2", "cleared"), StringSegment(value="parent"))
+
+    overlay = pool.create_overlay()
+    overlay.add(("node_1", "own"), StringSegment(value="overlay"))
+    overlay.remove(("node_1", "removed"))
+    overlay.remove(("node_2",))
+    # writes to the parent after the overlay was created are not visible to it
+    pool.add(("node_1", "late"), StringSegment(value="parent"))
+
+    assert overlay.get(("node_1", "shared")).value == "parent"
+    assert overlay.get(("node_1", "own")).value == "overlay"
+    assert overlay.get(("node_1", "removed")) is None
+    assert overlay.get(("node_2", "cleared")) is None
+    assert overlay.get(("node_1", "late")) is None
+
+    assert pool.get(("node_1", "own")) is None
+    assert pool.get(("node_1", "removed")).value == "parent"
+    assert pool.get(("node_2", "cleared")).value == "parent"
+
+
+def test_nested_overlay(pool):
+    pool.add(("node_1", "var"), StringSegment(value="parent"))
+    overlay = pool.create_overlay()
+    overlay.remove(("node_1", "var"))
+    overlay.add(("node_2", "var"), StringSegment(value="overlay"))
+
+    nested = overlay.create_overlay()
+    assert nested.get(("node_1", "var")) is None
+    assert nested.get(("node_2", "var")).value == "overlay"
+
+    nested.add(("node_1", "var"), StringSegment(value="nested"))
+    assert nested.get(("node_1", "var")).value == "nested"
+    assert overlay.get(("node_1", "var")) is None
+
+
+def test_overlays_share_one_snapshot(pool):
+    pool.add(("node_1", "var"), StringSegment(value="parent"))
+    snapshot = pool.snapshot()
+    pool.add(("node_1", "late"), StringSegment(value="parent"))
+
+    overlays = [pool.create_overlay(snapshot) for _ in range(3)]
+    for index, overlay in enumerate(overlays):
+        overlay.add(("iteration", "index"), index)
+
+    for index, overlay in enumerate(overlays):
+        assert overlay._parent is snapshot
+        assert overlay.get(("node_1", "var")).value == "parent"
+        assert overlay.get(("node_1", "late")) is None
+        assert overlay.get(("iteration", "index")).value == index
+    assert snapshot.get(("iteration", "index")) is None
+
+    with pytest.raises(ValueError):
+        snapshot.add(("node_1", "var"), StringSegment(value="snapshot"))
+    with pytest.raises(ValueError):
+        snapshot.remove(("node_1",))
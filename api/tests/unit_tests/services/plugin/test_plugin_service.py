@@ -0,0 +1,15 @@
+from unittest.mock import patch
+
+from services.plugin.plugin_service import PluginService
+
+
+@patch("services.plugin.plugin_service.marketplace")
+@patch("services.plugin.plugin_service.provider_configurations_cache")
+@patch("services.plugin.plugin_service.PluginInstallationManager")
+def test_upgrades_invalidate_provider_configurations(mock_manager, mock_cache, mock_marketplace):
+    PluginService.upgrade_plugin_with_marketplace("tenant", "plugin:0.0.1", "plugin:0.0.2")
+    PluginService.upgrade_plugin_with_github("tenant", "plugin:0.0.1", "plugin:0.0.2", "org/repo", "0.0.2", "a.difypkg")
+
+    assert mock_manager.return_value.upgrade_plugin.call_count == 2
+    assert mock_cache.invalidate.call_count == 2
+    mock_cache.invalidate.assert_called_with("tenant")